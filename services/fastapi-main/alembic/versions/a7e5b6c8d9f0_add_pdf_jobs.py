@@ -0,0 +1,52 @@
+"""Add pdf_jobs table
+
+Revision ID: a7e5b6c8d9f0
+Revises: f6d4a5b7c8e9
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e5b6c8d9f0'
+down_revision: Union[str, None] = 'f6d4a5b7c8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('pdf_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('kantei_record_id', sa.Integer(), nullable=False),
+    sa.Column('template_settings', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('next_run_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('pdf_path', sa.String(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['kantei_record_id'], ['kantei_records.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pdf_jobs_id'), 'pdf_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_pdf_jobs_user_id'), 'pdf_jobs', ['user_id'], unique=False)
+    op.create_index(op.f('ix_pdf_jobs_kantei_record_id'), 'pdf_jobs', ['kantei_record_id'], unique=False)
+    op.create_index('ix_pdf_jobs_status_next_run_at', 'pdf_jobs', ['status', 'next_run_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pdf_jobs_status_next_run_at', table_name='pdf_jobs')
+    op.drop_index(op.f('ix_pdf_jobs_kantei_record_id'), table_name='pdf_jobs')
+    op.drop_index(op.f('ix_pdf_jobs_user_id'), table_name='pdf_jobs')
+    op.drop_index(op.f('ix_pdf_jobs_id'), table_name='pdf_jobs')
+    op.drop_table('pdf_jobs')
@@ -0,0 +1,47 @@
+"""Add generated_artifacts table
+
+Revision ID: b8f6c7d9e0a1
+Revises: a7e5b6c8d9f0
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f6c7d9e0a1'
+down_revision: Union[str, None] = 'a7e5b6c8d9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('generated_artifacts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('kantei_record_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('last_accessed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['kantei_record_id'], ['kantei_records.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('path')
+    )
+    op.create_index(op.f('ix_generated_artifacts_id'), 'generated_artifacts', ['id'], unique=False)
+    op.create_index(op.f('ix_generated_artifacts_user_id'), 'generated_artifacts', ['user_id'], unique=False)
+    op.create_index(op.f('ix_generated_artifacts_kantei_record_id'), 'generated_artifacts', ['kantei_record_id'], unique=False)
+    op.create_index(op.f('ix_generated_artifacts_last_accessed_at'), 'generated_artifacts', ['last_accessed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_generated_artifacts_last_accessed_at'), table_name='generated_artifacts')
+    op.drop_index(op.f('ix_generated_artifacts_kantei_record_id'), table_name='generated_artifacts')
+    op.drop_index(op.f('ix_generated_artifacts_user_id'), table_name='generated_artifacts')
+    op.drop_index(op.f('ix_generated_artifacts_id'), table_name='generated_artifacts')
+    op.drop_table('generated_artifacts')
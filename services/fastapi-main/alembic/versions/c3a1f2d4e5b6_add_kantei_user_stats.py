@@ -0,0 +1,53 @@
+"""Add kantei_user_stats counter table
+
+Revision ID: c3a1f2d4e5b6
+Revises: ba07018db0e3
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a1f2d4e5b6'
+down_revision: Union[str, None] = 'ba07018db0e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('kantei_user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_records', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('pdf_generated_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('email_sent_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('reconciled_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # 既存データからカウンターを初期化
+    op.execute("""
+        INSERT INTO kantei_user_stats (user_id, total_records, pdf_generated_count, email_sent_count, reconciled_at)
+        SELECT
+            r.user_id,
+            COUNT(*),
+            COUNT(*) FILTER (WHERE r.pdf_generated IS TRUE),
+            COALESCE((
+                SELECT COUNT(*)
+                FROM email_history e
+                JOIN kantei_records r2 ON r2.id = e.kantei_record_id
+                WHERE r2.user_id = r.user_id AND e.status = 'sent'
+            ), 0),
+            now()
+        FROM kantei_records r
+        GROUP BY r.user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('kantei_user_stats')
@@ -0,0 +1,26 @@
+"""Add content_hash to generated_artifacts
+
+Revision ID: c9a7d8e0f1b2
+Revises: b8f6c7d9e0a1
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9a7d8e0f1b2'
+down_revision: Union[str, None] = 'b8f6c7d9e0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('generated_artifacts', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('generated_artifacts', 'content_hash')
@@ -0,0 +1,27 @@
+"""Reset pre-serialized kantei response bodies (client_info shape change)
+
+Revision ID: d0a8b9c1e2f3
+Revises: c9a7d8e0f1b2
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd0a8b9c1e2f3'
+down_revision: Union[str, None] = 'c9a7d8e0f1b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 詳細取得時に新しい形式で再生成される
+    op.execute("UPDATE kantei_records SET response_body = NULL")
+
+
+def downgrade() -> None:
+    op.execute("UPDATE kantei_records SET response_body = NULL")
@@ -0,0 +1,27 @@
+"""Add pre-serialized response_body to kantei_records
+
+Revision ID: d4b2e3f5a6c7
+Revises: c3a1f2d4e5b6
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b2e3f5a6c7'
+down_revision: Union[str, None] = 'c3a1f2d4e5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 既存レコードは初回の詳細取得時に生成される
+    op.add_column('kantei_records', sa.Column('response_body', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('kantei_records', 'response_body')
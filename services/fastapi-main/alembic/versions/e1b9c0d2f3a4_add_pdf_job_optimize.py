@@ -0,0 +1,26 @@
+"""Add optimize to pdf_jobs
+
+Revision ID: e1b9c0d2f3a4
+Revises: d0a8b9c1e2f3
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b9c0d2f3a4'
+down_revision: Union[str, None] = 'd0a8b9c1e2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('pdf_jobs', sa.Column('optimize', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('pdf_jobs', 'optimize')
@@ -0,0 +1,50 @@
+"""Add kantei_lookups unique index table
+
+Revision ID: f6d4a5b7c8e9
+Revises: e5c3f4a6b7d8
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6d4a5b7c8e9'
+down_revision: Union[str, None] = 'e5c3f4a6b7d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('kantei_lookups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('client_surname', sa.String(), nullable=False),
+    sa.Column('client_given_name', sa.String(), nullable=False),
+    sa.Column('client_birth_date', sa.String(), nullable=False),
+    sa.Column('kantei_record_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['kantei_record_id'], ['kantei_records.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'client_surname', 'client_given_name', 'client_birth_date', name='uq_kantei_lookups_client')
+    )
+    op.create_index(op.f('ix_kantei_lookups_id'), 'kantei_lookups', ['id'], unique=False)
+
+    # 既存データから最新の完全な鑑定結果を登録
+    op.execute("""
+        INSERT INTO kantei_lookups (user_id, client_surname, client_given_name, client_birth_date, kantei_record_id)
+        SELECT DISTINCT ON (user_id, TRIM(client_surname), TRIM(client_given_name), TRIM(client_birth_date))
+            user_id, TRIM(client_surname), TRIM(client_given_name), TRIM(client_birth_date), id
+        FROM kantei_records
+        WHERE kyusei_result IS NOT NULL AND seimei_result IS NOT NULL
+        ORDER BY user_id, TRIM(client_surname), TRIM(client_given_name), TRIM(client_birth_date), id DESC
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_kantei_lookups_id'), table_name='kantei_lookups')
+    op.drop_table('kantei_lookups')
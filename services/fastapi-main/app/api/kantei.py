@@ -1,18 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.http_cache import (
+    make_etag, etag_matches, content_addressed_url, is_current_version, PRIVATE_REVALIDATE
+)
 from app.api.auth import get_current_user
 from app.models import User, KanteiRecord, EmailHistory
 from app.schemas import (
-    KanteiRequest, KanteiResponse, PDFGenerateRequest, PDFGenerateResponse,
-    PDFGenerationRequest, PDFGenerationResponse, TemplateSettings,
+    KanteiRequest, KanteiResponse, KanteiLookupResponse, PDFGenerateRequest, PDFGenerateResponse,
+    PDFGenerationRequest, PDFGenerationResponse, PDFJobResponse, BulkExportRequest,
     EmailSendRequest, EmailSendResponse, KanteiHistoryResponse, KanteiHistoryItem,
     CommentUpdateRequest, CommentUpdateResponse
 )
-from app.services import kyusei_service, seimei_service, pdf_service
-from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
+from app.services import (
+    kyusei_service, seimei_service, pdf_service, kantei_stats_service, kantei_response_serializer,
+    idempotency_service, kantei_lookup_service, render_pool, RenderPoolBusy,
+    pdf_job_service, build_pdf_data, bulk_export_service, artifact_lifecycle_service,
+    artifact_response
+)
+from app.services.kantei_response import LIST_DEFAULT_FIELDS, RESPONSE_VERSION
+from typing import Optional, Dict, Any
+from datetime import datetime
+from urllib.parse import quote
+import asyncio
+import hashlib
 import json
 import os
 
@@ -33,6 +47,17 @@ def write_kantei_log(message: str):
 router = APIRouter()
 
 
+def _parse_fields(fields: Optional[str]) -> Optional[Dict[str, Any]]:
+    """fields= パラメータを解析（不正な指定は400）"""
+    try:
+        return kantei_response_serializer.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 @router.post("/test-calculate", response_model=KanteiResponse)
 async def test_calculate_kantei(
     request: KanteiRequest,
@@ -67,7 +92,7 @@ async def test_calculate_kantei(
 
     return KanteiResponse(
         id=999,  # テスト用ID
-        client_info=client_info,
+        client_info=client_info.model_dump(),
         kyusei_result=kyusei_result,
         seimei_result=seimei_result,
         combined_result=combined_result,
@@ -80,8 +105,30 @@ async def test_calculate_kantei(
 @router.post("/calculate", response_model=KanteiResponse)
 async def calculate_kantei(
     request: KanteiRequest,
+    fields: Optional[str] = Query(None, description="返却フィールド（例: seimei_result.total,id または compact）"),
+    idempotency_key: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
+):
+    """統合鑑定計算を実行（Idempotency-Key対応）"""
+
+    field_tree = _parse_fields(fields)
+
+    return await idempotency_service.run(
+        db,
+        scope=f"user:{current_user.id}",
+        idempotency_key=idempotency_key,
+        endpoint="POST /api/kantei/calculate",
+        payload={"request": request, "fields": fields},
+        handler=lambda: _calculate_kantei(request, field_tree, current_user, db)
+    )
+
+
+async def _calculate_kantei(
+    request: KanteiRequest,
+    field_tree: Optional[Dict[str, Any]],
+    current_user: User,
+    db: Session
 ):
     """統合鑑定計算を実行"""
 
@@ -89,6 +136,15 @@ async def calculate_kantei(
     full_name = f"{client_info.surname}{client_info.given_name}"
     write_kantei_log(f"鑑定計算開始 - ユーザー: {current_user.email}, クライアント: {full_name}, 生年月日: {client_info.birth_date}")
 
+    # 既存鑑定の再利用（外部サービスを呼び出さない）
+    if request.reuse:
+        existing_record = kantei_lookup_service.find(
+            db, current_user.id, client_info.surname, client_info.given_name, client_info.birth_date
+        )
+        if existing_record:
+            return _reuse_kantei(existing_record, request.reuse, field_tree, current_user, db)
+        write_kantei_log(f"再利用可能な鑑定なし - 新規計算: {full_name}")
+
     try:
         # 九星気学計算
         write_kantei_log(f"九星気学計算開始 - {full_name}, {client_info.birth_date}")
@@ -129,6 +185,13 @@ async def calculate_kantei(
         )
 
         db.add(kantei_record)
+        kantei_stats_service.increment(db, current_user.id, total_records=1)
+        db.flush()
+        db.refresh(kantei_record)
+
+        # 詳細取得用のレスポンスを書き込み時に一度だけシリアライズ
+        kantei_response_serializer.refresh(kantei_record)
+        kantei_lookup_service.register(db, kantei_record)
         db.commit()
         db.refresh(kantei_record)
         write_kantei_log(f"データベース保存成功 - 鑑定ID: {kantei_record.id}")
@@ -142,9 +205,27 @@ async def calculate_kantei(
             detail="計算処理でエラーが発生しました。もう一度お試しください。"
         )
 
+    if field_tree is not None:
+        # 指定フィールドだけを抽出してからシリアライズ
+        source = {
+            "id": kantei_record.id,
+            "client_info": kantei_response_serializer.client_info(kantei_record),
+            "kyusei_result": kyusei_result,
+            "seimei_result": seimei_result,
+            "combined_result": combined_result,
+            "kantei_comment": kantei_record.kantei_comment,
+            "pdf_generated": kantei_record.pdf_generated,
+            "pdf_path": kantei_record.pdf_path,
+            "created_at": kantei_record.created_at
+        }
+        return Response(
+            content=kantei_response_serializer.serialize_fields(source, field_tree),
+            media_type=kantei_response_serializer.media_type
+        )
+
     return KanteiResponse(
         id=kantei_record.id,
-        client_info=client_info,
+        client_info=kantei_response_serializer.client_info(kantei_record),
         kyusei_result=kyusei_result,
         seimei_result=seimei_result,
         combined_result=combined_result,
@@ -155,44 +236,115 @@ async def calculate_kantei(
     )
 
 
+def _reuse_kantei(
+    source_record: KanteiRecord,
+    reuse: str,
+    field_tree: Optional[Dict[str, Any]],
+    current_user: User,
+    db: Session
+) -> Response:
+    """既存鑑定を再利用してレスポンスを返す"""
+
+    if reuse == "copy":
+        try:
+            # 結果をコピーした新規記録を作成
+            kantei_record = kantei_lookup_service.copy_record(db, source_record)
+            kantei_stats_service.increment(db, current_user.id, total_records=1)
+            db.refresh(kantei_record)
+            kantei_response_serializer.refresh(kantei_record)
+            kantei_lookup_service.register(db, kantei_record)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            write_kantei_log(f"鑑定再利用エラー - 元鑑定ID: {source_record.id}, エラー: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="計算処理でエラーが発生しました。もう一度お試しください。"
+            )
+    else:
+        # 既存記録をそのまま返す
+        kantei_record = source_record
+
+    write_kantei_log(f"鑑定再利用 - モード: {reuse}, 元鑑定ID: {source_record.id}, 鑑定ID: {kantei_record.id}")
+
+    if field_tree is not None:
+        content = kantei_response_serializer.serialize_record_fields(kantei_record, field_tree)
+    else:
+        content = _get_response_body(db, kantei_record.id, current_user.id)
+
+    return Response(content=content, media_type=kantei_response_serializer.media_type)
+
+
+def _render_busy_error() -> HTTPException:
+    """レンダリング待ち行列が満杯の場合のエラー"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="PDF generation is busy. Please retry later.",
+        headers={"Retry-After": "5"}
+    )
+
+
 @router.post("/generate-pdf", response_model=PDFGenerationResponse)
 async def generate_pdf_v2(
     request: PDFGenerationRequest,
+    idempotency_key: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """統合PDF生成（新版・Idempotency-Key対応）"""
+    return await idempotency_service.run(
+        db,
+        scope=f"user:{current_user.id}",
+        idempotency_key=idempotency_key,
+        endpoint="POST /api/kantei/generate-pdf",
+        payload=request,
+        handler=lambda: _generate_pdf_v2(request, current_user, db)
+    )
+
+
+async def _generate_pdf_v2(
+    request: PDFGenerationRequest,
+    current_user: User,
+    db: Session
+) -> PDFGenerationResponse:
     """統合PDF生成（新版）"""
 
     try:
-        # PDF生成（新しいサービスメソッドを使用）
-        pdf_buffer = pdf_service.generate_kantei_report(
+        # PDF生成（レンダリングワーカーで実行し、イベントループをブロックしない）
+        pdf_bytes = await render_pool.render_pdf(
             kantei_data=request.kantei_data,
-            template_settings=request.template_settings.dict()
+            template_settings=request.template_settings.dict(),
+            optimize=request.optimize
         )
 
         # ファイル名生成
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         client_name = request.kantei_data.get("client_info", {}).get("name", "unknown")
         filename = f"kantei_{client_name}_{timestamp}.pdf"
-        filepath = os.path.join(pdf_service.output_dir, filename)
 
-        # ファイル保存
-        with open(filepath, 'wb') as f:
-            f.write(pdf_buffer.getvalue())
+        # ファイル保存（ストレージへの書き込み・問い合わせはイベントループ外で行う）
+        filepath = await asyncio.to_thread(pdf_service.storage.save, filename, pdf_bytes)
+        content_hash = artifact_lifecycle_service.register(
+            db, filepath, user_id=current_user.id,
+            content_hash=hashlib.sha256(pdf_bytes).hexdigest(), size_bytes=len(pdf_bytes)
+        )
+        db.commit()
 
         # PDFファイル情報取得
-        pdf_info = pdf_service.get_pdf_info(filepath)
+        pdf_info = await asyncio.to_thread(pdf_service.get_pdf_info, filepath)
 
         return PDFGenerationResponse(
             success=True,
-            pdf_url=f"/api/kantei/download/{filename}",
-            file_size=pdf_info.get("size", 0),
+            pdf_url=content_addressed_url(f"/api/kantei/download/{filename}", content_hash),
+            file_size=len(pdf_bytes),
             page_count=1,  # 実際のページ数計算は省略
             generated_at=pdf_info.get("created_at"),
             expires_at=pdf_info.get("expires_at"),
             message="PDF generated successfully"
         )
 
+    except RenderPoolBusy:
+        raise _render_busy_error()
     except Exception as e:
         return PDFGenerationResponse(
             success=False,
@@ -200,12 +352,87 @@ async def generate_pdf_v2(
         )
 
 
+@router.post("/generate-pdf/stream")
+async def stream_pdf(
+    request: PDFGenerationRequest,
+    persist: bool = Query(False),
+    current_user: User = Depends(get_current_user)
+):
+    """統合PDF生成（ストリーミング版）
+
+    生成したPDFをそのままレスポンスとして返す。persist=trueの場合は送信完了後に
+    バックグラウンドで保存し、ダウンロードURLをX-PDF-URLヘッダーで通知する。
+    """
+
+    try:
+        pdf_bytes = await render_pool.render_pdf(
+            kantei_data=request.kantei_data,
+            template_settings=request.template_settings.dict(),
+            optimize=request.optimize
+        )
+    except RenderPoolBusy:
+        raise _render_busy_error()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"PDF generation failed: {str(e)}"
+        )
+
+    # 送信中のPDFは一時バッファに保持（大きい場合はディスクに退避）
+    file_size = len(pdf_bytes)
+    content_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    spool = pdf_service.spool_pdf(pdf_bytes)
+    del pdf_bytes
+
+    filename = pdf_service.make_pdf_filename(request.kantei_data)
+    headers = {
+        "Content-Length": str(file_size),
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"
+    }
+
+    if persist:
+        headers["X-PDF-URL"] = content_addressed_url(f"/api/kantei/download/{quote(filename)}", content_hash)
+        background = BackgroundTask(_persist_streamed_pdf, spool, filename, current_user.id, content_hash)
+    else:
+        background = BackgroundTask(spool.close)
+
+    return StreamingResponse(
+        pdf_service.iter_spooled_pdf(spool),
+        media_type="application/pdf",
+        headers=headers,
+        background=background
+    )
+
+
+def _persist_streamed_pdf(spool, filename: str, user_id: int, content_hash: str) -> None:
+    """送信済みPDFを保存してストレージインデックスに登録（送信完了後のバックグラウンド処理）"""
+    pdf_path = pdf_service.persist_spooled_pdf(spool, filename)
+    artifact_lifecycle_service.register_file(pdf_path, user_id=user_id, content_hash=content_hash)
+
+
 @router.post("/generate-pdf-legacy", response_model=PDFGenerateResponse)
 async def generate_pdf_legacy(
     request: PDFGenerateRequest,
+    idempotency_key: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """PDF生成（レガシー版：互換性のため・Idempotency-Key対応）"""
+    return await idempotency_service.run(
+        db,
+        scope=f"user:{current_user.id}",
+        idempotency_key=idempotency_key,
+        endpoint="POST /api/kantei/generate-pdf-legacy",
+        payload=request,
+        handler=lambda: _generate_pdf_legacy(request, current_user, db)
+    )
+
+
+async def _generate_pdf_legacy(
+    request: PDFGenerateRequest,
+    current_user: User,
+    db: Session
+) -> PDFGenerateResponse:
     """PDF生成（レガシー版：互換性のため）"""
 
     # 鑑定記録取得
@@ -222,38 +449,41 @@ async def generate_pdf_legacy(
 
     try:
         # PDF生成用データ準備
-        pdf_data = {
-            "client_info": {
-                "surname": kantei_record.client_surname,
-            "given_name": kantei_record.client_given_name,
-                "birth_date": kantei_record.client_birth_date,
-            },
-            "kyusei_kigaku": json.loads(kantei_record.kyusei_result) if kantei_record.kyusei_result else None,
-            "seimei_handan": json.loads(kantei_record.seimei_result) if kantei_record.seimei_result else None,
-            "combined_result": json.loads(kantei_record.combined_result) if kantei_record.combined_result else None
-        }
+        pdf_data = build_pdf_data(kantei_record)
 
         # テンプレート設定のデフォルト値
         template_settings = request.template_settings or {}
 
-        # PDF生成
-        pdf_path = pdf_service.generate_kantei_pdf(
+        # PDF生成（レンダリングワーカーで実行）
+        pdf_bytes = await render_pool.render_pdf(
             kantei_data=pdf_data,
-            template_settings=template_settings
+            template_settings=pdf_service.build_template_settings(template_settings),
+            optimize=request.optimize
         )
+        pdf_path = await asyncio.to_thread(pdf_service.save_kantei_pdf, pdf_data, pdf_bytes)
 
         # データベース更新
+        newly_generated = not kantei_record.pdf_generated
         kantei_record.pdf_path = pdf_path
         kantei_record.pdf_generated = True
+        kantei_response_serializer.refresh(kantei_record)
+        if newly_generated:
+            kantei_stats_service.increment(db, current_user.id, pdf_generated_count=1)
+        content_hash = artifact_lifecycle_service.register(
+            db, pdf_path, kantei_record_id=kantei_record.id, user_id=current_user.id,
+            content_hash=hashlib.sha256(pdf_bytes).hexdigest(), size_bytes=len(pdf_bytes)
+        )
         db.commit()
 
         return PDFGenerateResponse(
             success=True,
             pdf_path=pdf_path,
-            pdf_url=f"/api/kantei/pdf/{kantei_record.id}",
+            pdf_url=content_addressed_url(f"/api/kantei/pdf/{kantei_record.id}", content_hash),
             message="PDF generated successfully"
         )
 
+    except RenderPoolBusy:
+        raise _render_busy_error()
     except Exception as e:
         return PDFGenerateResponse(
             success=False,
@@ -261,13 +491,177 @@ async def generate_pdf_legacy(
         )
 
 
+@router.post("/pdf-jobs", response_model=PDFJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_pdf_job(
+    request: PDFGenerateRequest,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """PDF生成ジョブ登録（非同期生成・Idempotency-Key対応）"""
+    return await idempotency_service.run(
+        db,
+        scope=f"user:{current_user.id}",
+        idempotency_key=idempotency_key,
+        endpoint="POST /api/kantei/pdf-jobs",
+        payload=request,
+        handler=lambda: _create_pdf_job(request, current_user, db)
+    )
+
+
+async def _create_pdf_job(
+    request: PDFGenerateRequest,
+    current_user: User,
+    db: Session
+) -> JSONResponse:
+    """PDF生成ジョブ登録"""
+
+    kantei_record = db.query(KanteiRecord).filter(
+        KanteiRecord.id == request.kantei_id,
+        KanteiRecord.user_id == current_user.id
+    ).first()
+
+    if not kantei_record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Kantei record not found"
+        )
+
+    template_settings = request.template_settings.model_dump() if request.template_settings else {}
+    if request.custom_message:
+        template_settings["custom_message"] = request.custom_message
+
+    job = pdf_job_service.enqueue(
+        db, kantei_record, template_settings, user_id=current_user.id, optimize=request.optimize
+    )
+    write_kantei_log(f"PDF生成ジョブ登録 - ジョブID: {job.id}, 鑑定ID: {kantei_record.id}")
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(_pdf_job_response(job)),
+        headers={"Location": f"/api/kantei/pdf-jobs/{job.id}"}
+    )
+
+
+@router.get("/pdf-jobs/{job_id}", response_model=PDFJobResponse)
+async def get_pdf_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """PDF生成ジョブの状態取得"""
+
+    # 再起動後に残っているジョブを処理できるようワーカーを起動
+    pdf_job_service.ensure_started()
+
+    job = pdf_job_service.get_job(db, job_id, user_id=current_user.id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="PDF job not found"
+        )
+
+    return _pdf_job_response(job)
+
+
+def _pdf_job_response(job) -> PDFJobResponse:
+    """ジョブの状態をレスポンスに変換"""
+    return PDFJobResponse(
+        job_id=job.id,
+        kantei_id=job.kantei_record_id,
+        status=job.status,
+        attempts=job.attempts,
+        pdf_url=f"/api/kantei/pdf/{job.kantei_record_id}" if job.status == "completed" else None,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+
+@router.post("/bulk-export")
+async def bulk_export(
+    request: BulkExportRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """複数の鑑定書の一括エクスポート
+
+    output=booklet: しおり付きの1冊のPDF / output=zip: PDFまたはWordファイルを格納したZIP。
+    どちらも生成しながら（冊子は一時ファイルから）チャンク単位で送信する。
+    """
+
+    if not request.kantei_ids and not (request.date_from or request.date_to):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Specify kantei_ids or a date range"
+        )
+    if request.output == "booklet" and request.file_format != "pdf":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Booklet output supports PDF only"
+        )
+
+    record_ids = bulk_export_service.select_record_ids(
+        db, current_user.id, request.kantei_ids, request.date_from, request.date_to
+    )
+    if not record_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No kantei records found"
+        )
+    if len(record_ids) > bulk_export_service.max_records:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many records. Maximum is {bulk_export_service.max_records}."
+        )
+
+    template_settings = pdf_service.build_template_settings(
+        request.template_settings.dict() if request.template_settings else None
+    )
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    if request.output == "booklet":
+        try:
+            booklet, page_count = await bulk_export_service.build_booklet(record_ids, template_settings)
+        except RenderPoolBusy:
+            raise _render_busy_error()
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Booklet generation failed: {str(e)}"
+            )
+
+        # 送信が中断・省略された場合もファイルを閉じる（パスは削除済みのため閉じれば領域が解放される）
+        return StreamingResponse(
+            bulk_export_service.iter_file(booklet),
+            media_type="application/pdf",
+            headers={
+                "Content-Length": str(os.fstat(booklet.fileno()).st_size),
+                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(f'kantei_booklet_{timestamp}.pdf')}",
+                "X-Page-Count": str(page_count)
+            },
+            background=BackgroundTask(booklet.close)
+        )
+
+    return StreamingResponse(
+        bulk_export_service.iter_zip(record_ids, template_settings, request.file_format),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(f'kantei_export_{timestamp}.zip')}",
+            "X-Record-Count": str(len(record_ids))
+        }
+    )
+
+
 @router.get("/pdf/{kantei_id}")
 async def get_pdf(
     kantei_id: int,
+    request: Request,
+    v: Optional[str] = Query(None, description="内容のハッシュ（生成時に返したURLに含まれる）"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """PDFプレビュー/ダウンロード"""
+    """PDFプレビュー/ダウンロード（ETag・If-Modified-Since・Range対応）"""
 
     # 鑑定記録取得
     kantei_record = db.query(KanteiRecord).filter(
@@ -287,47 +681,65 @@ async def get_pdf(
             detail="PDF not generated yet"
         )
 
-    if not pdf_service.pdf_exists(kantei_record.pdf_path):
+    if not await asyncio.to_thread(pdf_service.pdf_exists, kantei_record.pdf_path):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="PDF file not found"
         )
 
-    return FileResponse(
-        path=kantei_record.pdf_path,
+    artifact_lifecycle_service.touch(db, kantei_record.pdf_path)
+    content_hash = artifact_lifecycle_service.get_content_hash(db, kantei_record.pdf_path)
+    client_name = f"{kantei_record.client_surname}{kantei_record.client_given_name}"
+
+    return await asyncio.to_thread(
+        artifact_response,
+        kantei_record.pdf_path,
         media_type="application/pdf",
-        filename=f"kantei_{f"{kantei_record.client_surname}{kantei_record.client_given_name}"}_{kantei_record.id}.pdf"
+        filename=f"kantei_{client_name}_{kantei_record.id}.pdf",
+        request_headers=request.headers,
+        content_hash=content_hash,
+        immutable=is_current_version(v, content_hash)
     )
 
 
 @router.get("/download/{filename}")
 async def download_pdf(
     filename: str,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    v: Optional[str] = Query(None, description="内容のハッシュ（生成時に返したURLに含まれる）"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
-    """PDFファイル直接ダウンロード"""
+    """PDFファイル直接ダウンロード（ETag・If-Modified-Since・Range対応）"""
 
-    # ファイルパス構築
-    filepath = os.path.join(pdf_service.output_dir, filename)
+    # セキュリティ：パストラバーサル攻撃を防ぐ
+    if ".." in filename or "/" in filename or "\\" in filename:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid filename"
+        )
+
+    # 保存先の構築
+    filepath = pdf_service.get_pdf_path(filename)
 
     # ファイル存在チェック
-    if not pdf_service.pdf_exists(filepath):
+    if not await asyncio.to_thread(pdf_service.pdf_exists, filepath):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="PDF file not found"
         )
 
-    # セキュリティ：パストラバーサル攻撃を防ぐ
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid filename"
-        )
+    artifact_lifecycle_service.touch(db, filepath)
+    content_hash = artifact_lifecycle_service.get_content_hash(db, filepath)
 
-    return FileResponse(
-        path=filepath,
+    return await asyncio.to_thread(
+        artifact_response,
+        filepath,
         media_type="application/pdf",
-        filename=filename
+        filename=filename,
+        request_headers=request.headers,
+        content_hash=content_hash,
+        immutable=is_current_version(v, content_hash)
     )
 
 
@@ -361,6 +773,7 @@ async def send_email(
         )
 
         db.add(email_history)
+        kantei_stats_service.increment(db, current_user.id, email_sent_count=1)
 
         # 鑑定記録を更新
         kantei_record.email_sent = True
@@ -384,19 +797,34 @@ async def send_email(
 async def get_history(
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=100),
+    with_results: bool = Query(False, description="各項目に鑑定結果を含める"),
+    fields: Optional[str] = Query(None, description="with_results時の返却フィールド（省略時は compact）"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """鑑定履歴取得"""
 
+    # 一覧では詳細解説を含まない compact を既定にする
+    field_tree = _parse_fields(fields or LIST_DEFAULT_FIELDS) if with_results else None
+
     # ページネーション計算
     offset = (page - 1) * per_page
 
-    # 総数取得
-    total = db.query(KanteiRecord).filter(KanteiRecord.user_id == current_user.id).count()
-
-    # データ取得
-    records = db.query(KanteiRecord).filter(
+    # 総数取得（カウンターテーブルから取得し、テーブルサイズに依存しない）
+    total = kantei_stats_service.get_total(db, current_user.id)
+
+    # データ取得（一覧に必要なカラムだけを読み込む）
+    columns = [
+        KanteiRecord.client_surname,
+        KanteiRecord.client_given_name,
+        KanteiRecord.client_birth_date,
+        KanteiRecord.created_at,
+        KanteiRecord.pdf_generated,
+        KanteiRecord.email_sent
+    ]
+    records = db.query(KanteiRecord).options(
+        *kantei_response_serializer.load_options(field_tree or {}, columns)
+    ).filter(
         KanteiRecord.user_id == current_user.id
     ).order_by(KanteiRecord.created_at.desc()).offset(offset).limit(per_page).all()
 
@@ -408,7 +836,8 @@ async def get_history(
             client_birth_date=record.client_birth_date,
             created_at=record.created_at,
             pdf_generated=record.pdf_generated,
-            email_sent=record.email_sent
+            email_sent=record.email_sent,
+            results=kantei_response_serializer.project_record(record, field_tree) if field_tree is not None else None
         )
         for record in records
     ]
@@ -421,56 +850,66 @@ async def get_history(
     )
 
 
-@router.get("/{kantei_id}", response_model=KanteiResponse)
-async def get_kantei(
-    kantei_id: int,
+@router.get("/lookup", response_model=KanteiLookupResponse)
+async def lookup_kantei(
+    surname: str = Query(...),
+    given_name: str = Query(...),
+    birth_date: str = Query(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """鑑定詳細取得（省略パス版）"""
+    """同一姓名・生年月日の既存鑑定を検索（再利用可否の確認用）"""
 
-    # 鑑定記録取得
-    kantei_record = db.query(KanteiRecord).filter(
+    kantei_record = kantei_lookup_service.find(db, current_user.id, surname, given_name, birth_date)
+
+    if not kantei_record:
+        return KanteiLookupResponse(exists=False)
+
+    return KanteiLookupResponse(
+        exists=True,
+        kantei_id=kantei_record.id,
+        created_at=kantei_record.created_at
+    )
+
+
+def _get_kantei_etag(db: Session, kantei_id: int, user_id: int, fields: Optional[str] = None) -> str:
+    """鑑定記録のETagを取得（JSON列は読み込まない）"""
+    row = db.query(
+        KanteiRecord.id,
+        KanteiRecord.created_at,
+        KanteiRecord.updated_at
+    ).filter(
         KanteiRecord.id == kantei_id,
-        KanteiRecord.user_id == current_user.id
+        KanteiRecord.user_id == user_id
     ).first()
 
-    if not kantei_record:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Kantei record not found"
         )
 
-    # レスポンス作成
-    return KanteiResponse(
-        id=kantei_record.id,
-        client_info={
-            "surname": kantei_record.client_surname,
-            "given_name": kantei_record.client_given_name,
-            "birth_date": kantei_record.client_birth_date
-        },
-        kyusei_result=json.loads(kantei_record.kyusei_result) if kantei_record.kyusei_result else None,
-        seimei_result=json.loads(kantei_record.seimei_result) if kantei_record.seimei_result else None,
-        combined_result=json.loads(kantei_record.combined_result) if kantei_record.combined_result else None,
-        kantei_comment=kantei_record.kantei_comment,
-        pdf_generated=kantei_record.pdf_generated,
-        pdf_path=kantei_record.pdf_path,
-        created_at=kantei_record.created_at
+    # 更新がない記録は作成日時をバージョンとして扱う（fieldsごとに別表現）
+    return make_etag(
+        "kantei", row.id, row.updated_at or row.created_at, fields or "",
+        RESPONSE_VERSION
     )
 
 
-@router.get("/detail/{kantei_id}", response_model=KanteiResponse)
-async def get_detail(
-    kantei_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """鑑定詳細取得"""
+def _get_response_body(db: Session, kantei_id: int, user_id: int) -> bytes:
+    """シリアライズ済みレスポンスを取得（未生成の既存レコードはここで生成して保存）"""
+    response_body = db.query(KanteiRecord.response_body).filter(
+        KanteiRecord.id == kantei_id,
+        KanteiRecord.user_id == user_id
+    ).scalar()
+
+    if response_body is not None:
+        return bytes(response_body)
 
     # 鑑定記録取得
     kantei_record = db.query(KanteiRecord).filter(
         KanteiRecord.id == kantei_id,
-        KanteiRecord.user_id == current_user.id
+        KanteiRecord.user_id == user_id
     ).first()
 
     if not kantei_record:
@@ -479,22 +918,96 @@ async def get_detail(
             detail="Kantei record not found"
         )
 
-    # レスポンス作成
-    return KanteiResponse(
-        id=kantei_record.id,
-        client_info={
-            "surname": kantei_record.client_surname,
-            "given_name": kantei_record.client_given_name,
-            "birth_date": kantei_record.client_birth_date
+    response_body = kantei_response_serializer.serialize(
+        kantei_response_serializer.build(kantei_record)
+    )
+
+    # updated_atを据え置いて保存（ETagを変えない）
+    db.query(KanteiRecord).filter(KanteiRecord.id == kantei_record.id).update(
+        {
+            KanteiRecord.response_body: response_body,
+            KanteiRecord.updated_at: KanteiRecord.updated_at
         },
-        kyusei_result=json.loads(kantei_record.kyusei_result) if kantei_record.kyusei_result else None,
-        seimei_result=json.loads(kantei_record.seimei_result) if kantei_record.seimei_result else None,
-        combined_result=json.loads(kantei_record.combined_result) if kantei_record.combined_result else None,
-        kantei_comment=kantei_record.kantei_comment,
-        pdf_generated=kantei_record.pdf_generated,
-        pdf_path=kantei_record.pdf_path,
-        created_at=kantei_record.created_at
+        synchronize_session=False
     )
+    db.commit()
+
+    return response_body
+
+
+def _get_kantei_conditional(
+    kantei_id: int,
+    fields: Optional[str],
+    if_none_match: Optional[str],
+    current_user: User,
+    db: Session
+) -> Response:
+    """条件付きGETで鑑定詳細を取得（未変更なら304を返す）"""
+
+    field_tree = _parse_fields(fields)
+
+    # JSONを解析する前にETagで変更有無を判定
+    etag = _get_kantei_etag(db, kantei_id, current_user.id, fields)
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": PRIVATE_REVALIDATE,
+        "Vary": "Authorization"
+    }
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    if field_tree is not None:
+        # 必要なカラムだけを読み込み、指定フィールドを抽出してからシリアライズ
+        kantei_record = db.query(KanteiRecord).options(
+            *kantei_response_serializer.load_options(field_tree)
+        ).filter(
+            KanteiRecord.id == kantei_id,
+            KanteiRecord.user_id == current_user.id
+        ).first()
+
+        if not kantei_record:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Kantei record not found"
+            )
+
+        return Response(
+            content=kantei_response_serializer.serialize_record_fields(kantei_record, field_tree),
+            media_type=kantei_response_serializer.media_type,
+            headers=cache_headers
+        )
+
+    # 保存済みバイト列をそのまま返す（解析・検証・再シリアライズを行わない）
+    return Response(
+        content=_get_response_body(db, kantei_id, current_user.id),
+        media_type=kantei_response_serializer.media_type,
+        headers=cache_headers
+    )
+
+
+@router.get("/{kantei_id}", response_model=KanteiResponse)
+async def get_kantei(
+    kantei_id: int,
+    fields: Optional[str] = Query(None, description="返却フィールド（例: seimei_result.total,id または compact）"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """鑑定詳細取得（省略パス版）"""
+    return _get_kantei_conditional(kantei_id, fields, if_none_match, current_user, db)
+
+
+@router.get("/detail/{kantei_id}", response_model=KanteiResponse)
+async def get_detail(
+    kantei_id: int,
+    fields: Optional[str] = Query(None, description="返却フィールド（例: seimei_result.total,id または compact）"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """鑑定詳細取得"""
+    return _get_kantei_conditional(kantei_id, fields, if_none_match, current_user, db)
 
 
 @router.put("/{kantei_id}/comment", response_model=CommentUpdateResponse)
@@ -521,6 +1034,7 @@ async def update_comment(
     try:
         # コメント更新
         kantei_record.kantei_comment = request.comment
+        kantei_response_serializer.refresh(kantei_record)
         db.commit()
         db.refresh(kantei_record)
 
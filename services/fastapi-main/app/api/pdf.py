@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, Request
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.http_cache import content_addressed_url, is_current_version
 from app.api.auth import get_current_user
 from app.models import User, KanteiRecord
 from app.schemas import PDFGenerateRequest, PDFGenerateResponse
-from app.services import pdf_service
-from typing import Dict, Any
+from app.services import (
+    pdf_service, kantei_stats_service, kantei_response_serializer, idempotency_service,
+    artifact_lifecycle_service, artifact_response
+)
+from typing import Dict, Any, Optional
+import asyncio
 import json
 import os
 from datetime import datetime
@@ -31,9 +35,23 @@ def write_pdf_log(message: str):
 @router.post("/generate", response_model=PDFGenerateResponse)
 async def generate_pdf(
     request: PDFGenerateRequest,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """PDF生成エンドポイント - 印刷プレビューと同じ内容を生成"""
+    """PDF生成エンドポイント（Idempotency-Key対応）"""
+    # 認証無効のため鑑定IDをキーの適用範囲とする
+    return await idempotency_service.run(
+        db,
+        scope=f"kantei:{request.kantei_id}",
+        idempotency_key=idempotency_key,
+        endpoint="POST /api/pdf/generate",
+        payload=request,
+        handler=lambda: _generate_pdf(request, db)
+    )
+
+
+async def _generate_pdf(request: PDFGenerateRequest, db: Session) -> PDFGenerateResponse:
+    """PDF生成 - 印刷プレビューと同じ内容を生成"""
 
     write_pdf_log(f"PDF生成開始 - 鑑定ID: {request.kantei_id}")
 
@@ -64,8 +82,17 @@ async def generate_pdf(
         write_pdf_log(f"印刷プレビュー互換PDF生成成功 - パス: {pdf_path}")
 
         # データベース更新
+        newly_generated = not kantei_record.pdf_generated
         kantei_record.pdf_path = pdf_path
         kantei_record.pdf_generated = True
+        kantei_response_serializer.refresh(kantei_record)
+        if newly_generated:
+            kantei_stats_service.increment(db, kantei_record.user_id, pdf_generated_count=1)
+        # 保存済みPDFを読み出してハッシュを計算するため、イベントループ外で登録する
+        content_hash = await asyncio.to_thread(
+            artifact_lifecycle_service.register,
+            db, pdf_path, kantei_record_id=kantei_record.id, user_id=kantei_record.user_id
+        )
         db.commit()
 
         write_pdf_log(f"データベース更新成功 - 鑑定ID: {kantei_record.id}")
@@ -73,7 +100,7 @@ async def generate_pdf(
         return PDFGenerateResponse(
             success=True,
             pdf_path=pdf_path,
-            pdf_url=f"/api/pdf/download/{kantei_record.id}",
+            pdf_url=content_addressed_url(f"/api/pdf/download/{kantei_record.id}", content_hash),
             message="PDF generated successfully from print preview"
         )
 
@@ -89,9 +116,11 @@ async def generate_pdf(
 @router.get("/download/{kantei_id}")
 async def download_pdf(
     kantei_id: int,
+    request: Request,
+    v: Optional[str] = Query(None, description="内容のハッシュ（生成時に返したURLに含まれる）"),
     db: Session = Depends(get_db)
 ):
-    """PDFダウンロード"""
+    """PDFダウンロード（ETag・If-Modified-Since・Range対応）"""
 
     write_pdf_log(f"PDFダウンロード要求 - 鑑定ID: {kantei_id}")
 
@@ -114,7 +143,7 @@ async def download_pdf(
             detail="PDF not generated yet"
         )
 
-    if not pdf_service.pdf_exists(kantei_record.pdf_path):
+    if not await asyncio.to_thread(pdf_service.pdf_exists, kantei_record.pdf_path):
         write_pdf_log(f"PDFファイルが見つかりません - パス: {kantei_record.pdf_path}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -122,11 +151,17 @@ async def download_pdf(
         )
 
     write_pdf_log(f"PDFダウンロード開始 - パス: {kantei_record.pdf_path}")
+    artifact_lifecycle_service.touch(db, kantei_record.pdf_path)
+    content_hash = artifact_lifecycle_service.get_content_hash(db, kantei_record.pdf_path)
 
-    return FileResponse(
-        path=kantei_record.pdf_path,
+    return await asyncio.to_thread(
+        artifact_response,
+        kantei_record.pdf_path,
         media_type="application/pdf",
-        filename=f"kantei_{kantei_record.client_name}_{kantei_record.id}.pdf"
+        filename=f"kantei_{kantei_record.client_name}_{kantei_record.id}.pdf",
+        request_headers=request.headers,
+        content_hash=content_hash,
+        immutable=is_current_version(v, content_hash)
     )
 
 
@@ -164,7 +199,7 @@ async def check_pdf_exists(
     if not kantei_record.pdf_generated or not kantei_record.pdf_path:
         return {"exists": False, "reason": "PDF not generated"}
 
-    if not pdf_service.pdf_exists(kantei_record.pdf_path):
+    if not await asyncio.to_thread(pdf_service.pdf_exists, kantei_record.pdf_path):
         return {"exists": False, "reason": "PDF file not found"}
 
     return {
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, UploadFile, File
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.api.auth import get_current_user
@@ -9,12 +11,54 @@ from app.schemas import (
     TemplateSettingsUpdate,
     LogoUploadResponse
 )
-import os
-import shutil
-from typing import Optional
+from app.services.logo import logo_service, LogoTooLarge, MAX_LOGO_BYTES
+import asyncio
+from typing import Callable
 
 router = APIRouter()
 
+# ロゴアップロードのリクエスト全体の上限（multipartの境界・ヘッダー分の余裕を見る）
+MAX_LOGO_REQUEST_BYTES = MAX_LOGO_BYTES + 64 * 1024
+
+
+def _logo_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="File too large. Maximum size is 2MB."
+    )
+
+
+class LogoUploadRoute(APIRoute):
+    """ロゴアップロード用のルート（multipartの解析前にリクエストサイズを制限する）
+
+    FastAPIはフォームを解析してから依存関係・エンドポイントを呼ぶため、
+    Content-Lengthでの拒否と受信バイト数の上限はここで行う（Content-Lengthのないchunked送信も対象）。
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > MAX_LOGO_REQUEST_BYTES:
+                raise _logo_too_large()
+
+            received = 0
+            receive = request.receive
+
+            async def limited_receive():
+                nonlocal received
+                message = await receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > MAX_LOGO_REQUEST_BYTES:
+                        raise _logo_too_large()
+                return message
+
+            return await handler(Request(request.scope, limited_receive))
+
+        return limited_handler
+
 
 @router.get("/settings", response_model=TemplateSettingsSchema)
 async def get_settings(
@@ -76,16 +120,17 @@ async def update_settings(
     db.commit()
     db.refresh(settings)
 
+    # コンパイル済みテンプレートはレンダリングワーカー内にあり、設定値をキーに含むため破棄は不要
     return settings
 
 
-@router.post("/upload-logo", response_model=LogoUploadResponse)
 async def upload_logo(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """ロゴアップロード"""
+    """ロゴアップロード（保存後、PDF・Word・サムネイル用の派生画像をバックグラウンドで作成）"""
 
     # ファイル形式チェック
     allowed_types = ["image/jpeg", "image/png", "image/gif"]
@@ -95,31 +140,16 @@ async def upload_logo(
             detail="Invalid file type. Only JPEG, PNG, and GIF are allowed."
         )
 
-    # ファイルサイズチェック（2MB制限）
-    file_size = 0
-    chunk_size = 1024
-    content = await file.read()
-    file_size = len(content)
-
-    if file_size > 2 * 1024 * 1024:  # 2MB
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File too large. Maximum size is 2MB."
-        )
+    # ファイル名生成
+    file_extension = file.filename.split(".")[-1] if "." in file.filename else "jpg"
+    logo_filename = f"logo_{current_user.id}.{file_extension}"
 
     try:
-        # アップロードディレクトリ作成
-        upload_dir = "uploaded_logos"
-        os.makedirs(upload_dir, exist_ok=True)
-
-        # ファイル名生成
-        file_extension = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-        logo_filename = f"logo_{current_user.id}.{file_extension}"
-        logo_path = os.path.join(upload_dir, logo_filename)
-
-        # ファイル保存
-        with open(logo_path, "wb") as buffer:
-            buffer.write(content)
+        # ファイル保存（チャンク単位で書き込み、上限を超えた時点で中断）
+        try:
+            logo_path = await logo_service.save_upload(file, logo_filename)
+        except LogoTooLarge:
+            raise _logo_too_large()
 
         # データベース更新
         settings = db.query(TemplateSettings).filter(
@@ -133,14 +163,57 @@ async def upload_logo(
         settings.company_logo_path = logo_path
         db.commit()
 
+        # 同じパスに上書きするため、このプロセスで保持している更新日時・デコード済みロゴを破棄
+        # （ワーカー内のコンパイル済みテンプレートはロゴの更新日時をキーに含むため、新しい更新日時で作り直される）
+        logo_service.invalidate(logo_path)
+
+        # 派生画像の作成
+        background_tasks.add_task(logo_service.build_variants, logo_path)
+
         return LogoUploadResponse(
             success=True,
             logo_path=logo_path,
             message="Logo uploaded successfully"
         )
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         return LogoUploadResponse(
             success=False,
             message=f"Logo upload failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+# リクエストサイズの制限はフォーム解析前に行うため、専用のルートクラスで登録する
+router.add_api_route(
+    "/upload-logo",
+    upload_logo,
+    methods=["POST"],
+    response_model=LogoUploadResponse,
+    route_class_override=LogoUploadRoute
+)
+
+
+@router.get("/logo-thumbnail")
+async def get_logo_thumbnail(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """ロゴのサムネイル画像（PNG）を取得"""
+
+    settings = db.query(TemplateSettings).filter(
+        TemplateSettings.user_id == current_user.id
+    ).first()
+
+    thumbnail = await asyncio.to_thread(
+        logo_service.get_variant, settings.company_logo_path if settings else None, "thumbnail"
+    )
+    if thumbnail is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Logo not found"
+        )
+
+    return Response(content=thumbnail.data, media_type="image/png")
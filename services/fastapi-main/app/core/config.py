@@ -15,6 +15,63 @@ class Settings(BaseSettings):
     kyusei_service_url: str = "http://localhost:5002"
     seimei_service_url: str = "http://localhost:5003"
 
+    # Idempotency-Key設定
+    idempotency_window_hours: int = 24  # 保存済みレスポンスを再送する期間
+    idempotency_wait_seconds: float = 60.0  # 実行中の同一キーを待つ最大時間
+    idempotency_lock_timeout_seconds: int = 300  # 実行中のまま放置されたキーを引き継ぐまでの時間
+
+    # レンダリングワーカー設定（PDF・Word・方位盤画像）
+    render_workers: int = 2  # ワーカープロセス数
+    render_queue_size: int = 16  # ワーカーの空きを待てるジョブ数
+    render_timeout_seconds: float = 60.0  # 1ジョブあたりの制限時間
+    render_max_jobs_per_worker: int = 200  # この件数を処理したワーカーは入れ替える
+    render_warm_on_startup: bool = True  # APIプロセスの起動時にワーカーを起動・初期化する
+
+    # レンダリング成果物キャッシュ設定
+    render_cache_enabled: bool = True
+    render_cache_dir: str = "render_cache"  # 相対パスはサービスのルートディレクトリ（services/fastapi-main）基準
+    render_cache_max_mb: int = 512  # 超過時は最終利用日時の古い順に削除
+    render_deterministic: bool = True  # 同一入力から同一バイト列のPDF・Wordを生成
+    docx_image_dpi: int = 300  # Word文書に埋め込む方位盤画像の解像度（これを満たす最小の画像を使用）
+
+    # ロゴ画像設定
+    logo_stat_ttl_seconds: float = 30.0  # ロゴの更新日時の問い合わせ結果を使い回す時間
+
+    # PDFストリーミング設定
+    pdf_spool_max_bytes: int = 1024 * 1024  # これを超える送信待ちPDFは一時ファイルに退避
+    pdf_stream_chunk_bytes: int = 64 * 1024
+
+    # PDF非同期生成ジョブ設定
+    pdf_job_workers: int = 2  # APIプロセス内で起動するジョブワーカー数（0で無効・専用ワーカーのみ）
+    pdf_job_max_attempts: int = 3
+    pdf_job_retry_base_seconds: float = 10.0  # 再試行間隔（試行ごとに2倍）
+    pdf_job_poll_seconds: float = 1.0
+    pdf_job_stale_seconds: int = 600  # 実行中のまま放置されたジョブを再投入するまでの時間
+
+    # wkhtmltopdf設定（印刷プレビューからのPDF生成）
+    wkhtmltopdf_path: str = "wkhtmltopdf"
+    wkhtmltopdf_concurrency: int = 2  # 同時変換数
+    wkhtmltopdf_timeout_seconds: float = 30.0
+    wkhtmltopdf_prelaunch: int = 0  # 起動済みで待機させておくプロセス数（0で無効）
+
+    # 成果物ストレージ設定（local: ローカルディスク, s3: S3互換オブジェクトストレージ）
+    storage_backend: str = "local"
+    s3_bucket: str = ""
+    s3_prefix: str = ""
+    s3_endpoint_url: str = ""  # MinIO等のS3互換サービスを使う場合に指定
+    s3_region: str = ""
+    s3_access_key_id: str = ""
+    s3_secret_access_key: str = ""
+
+    # 生成済みPDFのライフサイクル設定
+    artifact_quota_mb: int = 2048  # 超過時は最終アクセス日時の古い順に削除
+    artifact_sweep_interval_seconds: float = 300.0  # バックグラウンドのスイープ間隔（0で無効）
+    artifact_sweep_batch_size: int = 100  # 1回のスイープで処理する件数
+
+    # 一括エクスポート設定
+    bulk_export_max_records: int = 200  # 1回のエクスポートで扱う鑑定書の上限
+    bulk_export_concurrency: int = 2  # 同時に生成する鑑定書の数（ZIP出力時）
+
     # CORS設定
     cors_origin: str = "http://localhost:3001"
 
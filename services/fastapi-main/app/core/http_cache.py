@@ -0,0 +1,118 @@
+"""
+HTTPキャッシュ（ETag・条件付きGET・Range）ユーティリティ
+"""
+
+import hashlib
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+
+# 認証付きAPIレスポンス用: ブラウザには保持させるが毎回再検証させる
+PRIVATE_REVALIDATE = "private, no-cache"
+
+# 内容のハッシュを含むURL用: 内容が変わればURLも変わるため再検証不要
+PRIVATE_IMMUTABLE = "private, max-age=31536000, immutable"
+
+
+class RangeNotSatisfiable(Exception):
+    """Rangeヘッダーの範囲がファイルサイズ外"""
+
+
+def make_etag(*parts) -> str:
+    """構成要素から強いETagを生成"""
+    source = ":".join(
+        part.isoformat() if isinstance(part, datetime) else str(part)
+        for part in parts
+    )
+    digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Matchヘッダーが現在のETagに一致するか判定（弱い比較）"""
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+
+    return False
+
+
+def content_etag(content_hash: str) -> str:
+    """内容のハッシュ（sha256の16進表記）から強いETagを生成"""
+    return f'"{content_hash[:32]}"'
+
+
+def content_addressed_url(url: str, content_hash: Optional[str]) -> str:
+    """内容のハッシュをバージョンとして付けたURL（ハッシュ不明の場合はそのまま）"""
+    return f"{url}?v={content_hash[:32]}" if content_hash else url
+
+
+def is_current_version(version: Optional[str], content_hash: Optional[str]) -> bool:
+    """URLのバージョンが現在の内容のハッシュと一致するか（一致すれば immutable で返せる）"""
+    return bool(version) and bool(content_hash) and version == content_hash[:32]
+
+
+def not_modified_since(if_modified_since: Optional[str], mtime: float) -> bool:
+    """If-Modified-Sinceヘッダー以降に更新されていないか判定（HTTP日付は秒単位）"""
+    if not if_modified_since:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since is None or since.tzinfo is None:
+        return False
+
+    return int(mtime) <= since.timestamp()
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Rangeヘッダーを解析して (開始, 終了) のバイト位置（終了を含む）を返す
+
+    ヘッダーがない・解釈できない・複数範囲の場合はNone（全体を返す）。
+    範囲がファイルサイズ外の場合は RangeNotSatisfiable。
+    """
+    if not range_header:
+        return None
+
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and start > end:
+                return None
+        else:
+            # bytes=-N: 末尾からNバイト
+            suffix = int(last)
+            if suffix < 0:
+                return None
+            if suffix == 0:
+                raise RangeNotSatisfiable(range_header)
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start < 0 or start >= size:
+        raise RangeNotSatisfiable(range_header)
+
+    return start, min(end, size - 1)
@@ -1,12 +1,40 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動時・停止時の処理（レンダリングワーカーを起動時に初期化し、最初のリクエストを待たせない）"""
+    from app.core.config import settings
+    from app.services.render_pool import render_pool
+    from app.services.pdf_jobs import pdf_job_service
+    from app.services.artifact_lifecycle import artifact_lifecycle_service
+
+    if settings.render_warm_on_startup:
+        await render_pool.warm_up()
+
+    # 前回停止時に実行中だったジョブを再投入し、PDF生成ジョブのワーカーを起動
+    await pdf_job_service.start()
+
+    # 成果物の登録はワーカースレッドからも行われるため、スイープは起動時に開始する
+    artifact_lifecycle_service.ensure_started()
+
+    try:
+        yield
+    finally:
+        await artifact_lifecycle_service.stop()
+        await pdf_job_service.stop()
+        render_pool.shutdown(wait=False)
+
+
 # 最小設定でCloud Run起動確認
 app = FastAPI(
     title="Kantei FastAPI Service",
     description="鑑定統合APIサービス - 九星気学と姓名判断の統合鑑定システム",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 基本CORS設定
@@ -77,6 +105,22 @@ async def health_detailed():
     }
 
 
+@app.get("/health/render")
+async def health_render():
+    """レンダリングワーカープールの待ち行列・処理件数"""
+    from app.services.render_pool import render_pool
+    from app.services.render_cache import render_cache
+    from app.services.wkhtmltopdf import wkhtmltopdf_runner
+    from app.services.artifact_lifecycle import artifact_lifecycle_service
+
+    return {
+        **render_pool.get_metrics(),
+        "cache": render_cache.get_metrics(),
+        "wkhtmltopdf": wkhtmltopdf_runner.get_metrics(),
+        "artifacts": artifact_lifecycle_service.get_metrics()
+    }
+
+
 @app.get("/api/status")
 async def status():
     """詳細ステータス"""
@@ -1,8 +1,11 @@
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from app.models.user import User
-from app.models.kantei import KanteiRecord, EmailHistory
+from app.models.kantei import KanteiRecord, EmailHistory, KanteiUserStats, KanteiLookup
 from app.models.template import TemplateSettings
+from app.models.idempotency import IdempotencyKey
+from app.models.pdf_job import PDFJob
+from app.models.artifact import GeneratedArtifact
 
 # SQLAlchemyの単一真実源の原則に従い、全てのモデルをここに集約
 __all__ = [
@@ -10,7 +13,12 @@ __all__ = [
     "User",
     "KanteiRecord",
     "EmailHistory",
-    "TemplateSettings"
+    "KanteiUserStats",
+    "KanteiLookup",
+    "TemplateSettings",
+    "IdempotencyKey",
+    "PDFJob",
+    "GeneratedArtifact"
 ]
 
 # リレーションシップの追加
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class GeneratedArtifact(Base):
+    """生成済み成果物（PDF等）のストレージインデックス
+
+    ディスク使用量の集計と、最終アクセス日時の古い順（LRU）の削除に使う。
+    内容のハッシュはダウンロード時のETagに使う。
+    """
+    __tablename__ = "generated_artifacts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, nullable=False, unique=True)
+    kind = Column(String, nullable=False, default="pdf")
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+    content_hash = Column(String(64))  # sha256（16進表記）
+
+    # 所有する鑑定記録（鑑定記録に紐付かない成果物はNULL）
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    kantei_record_id = Column(Integer, ForeignKey("kantei_records.id", ondelete="SET NULL"), index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_accessed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, LargeBinary, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class IdempotencyKey(Base):
+    """Idempotency-Keyごとのリクエスト指紋と保存済みレスポンス"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("scope", "idempotency_key", name="uq_idempotency_keys_scope_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # 適用範囲（"user:<id>" など）とクライアント指定のキー
+    scope = Column(String, nullable=False)
+    idempotency_key = Column(String, nullable=False)
+
+    # リクエスト情報
+    endpoint = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=False)
+
+    # 実行状態: in_progress, completed
+    status = Column(String, nullable=False, default="in_progress")
+
+    # 保存済みレスポンス
+    response_status = Column(Integer)
+    response_body = Column(LargeBinary)
+    response_media_type = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
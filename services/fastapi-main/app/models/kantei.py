@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, LargeBinary, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -27,6 +27,9 @@ class KanteiRecord(Base):
     # 鑑定士コメント
     kantei_comment = Column(Text)
 
+    # シリアライズ済みAPIレスポンス（詳細取得でそのまま返却）
+    response_body = Column(LargeBinary)
+
     # PDF情報
     pdf_path = Column(String)
     pdf_generated = Column(Boolean, default=False)
@@ -54,4 +57,44 @@ class EmailHistory(Base):
     status = Column(String, default="sent")  # sent, failed, pending
 
     # リレーション
-    kantei_record = relationship("KanteiRecord", back_populates="email_history")
\ No newline at end of file
+    kantei_record = relationship("KanteiRecord", back_populates="email_history")
+
+
+class KanteiUserStats(Base):
+    """ユーザー別の鑑定件数カウンター（履歴一覧のCOUNT(*)回避用）"""
+    __tablename__ = "kantei_user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    # 書き込みと同一トランザクションで加算されるカウンター
+    total_records = Column(Integer, nullable=False, default=0)
+    pdf_generated_count = Column(Integer, nullable=False, default=0)
+    email_sent_count = Column(Integer, nullable=False, default=0)
+
+    # 最終照合日時（ドリフト修正ジョブで更新）
+    reconciled_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class KanteiLookup(Base):
+    """同一クライアントの既存鑑定を引くための一意インデックス"""
+    __tablename__ = "kantei_lookups"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "client_surname", "client_given_name", "client_birth_date",
+            name="uq_kantei_lookups_client"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # 検索キー（前後の空白を除去した値）
+    client_surname = Column(String, nullable=False)
+    client_given_name = Column(String, nullable=False)
+    client_birth_date = Column(String, nullable=False)
+
+    # 再利用元の鑑定記録（最新の計算結果）
+    kantei_record_id = Column(Integer, ForeignKey("kantei_records.id"), nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,35 @@
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.sql import expression, func
+from app.core.database import Base
+
+
+class PDFJob(Base):
+    """PDF非同期生成ジョブ"""
+    __tablename__ = "pdf_jobs"
+    __table_args__ = (
+        # ワーカーが実行待ちジョブを実行予定日時順に取得するためのインデックス
+        Index("ix_pdf_jobs_status_next_run_at", "status", "next_run_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    kantei_record_id = Column(Integer, ForeignKey("kantei_records.id"), nullable=False, index=True)
+
+    # テンプレート設定（JSON）・サイズ最適化モード
+    template_settings = Column(Text)
+    optimize = Column(Boolean, nullable=False, default=False, server_default=expression.false())
+
+    # 実行状態: queued, running, completed, failed
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    next_run_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # 実行結果
+    pdf_path = Column(String)
+    error = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
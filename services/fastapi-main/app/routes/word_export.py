@@ -2,20 +2,29 @@
 Word出力APIエンドポイント
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, status
 from fastapi.responses import Response
 from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Literal, Optional
+import asyncio
+import hashlib
 import logging
+import uuid
 from datetime import datetime
 
-from app.services.word_generator import generate_word_document
-from app.services.svg_converter import generate_hoiban_image
+from app.services.render_pool import render_pool, RenderPoolBusy
+from app.services.logo import logo_service
+from app.services.storage import get_storage, artifact_response
+from app.core.http_cache import content_etag, etag_matches, PRIVATE_REVALIDATE
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 保存したWord文書の保存先ルート
+WORD_EXPORT_ROOT = "generated_words"
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
 
 class WordExportRequest(BaseModel):
     """Word出力リクエストモデル"""
@@ -27,6 +36,15 @@ class WordExportRequest(BaseModel):
     kyuseiHoiban: Optional[Dict[str, Any]] = None
     kanteiComment: Optional[str] = None
     targetDate: Optional[str] = None
+    logoPath: Optional[str] = None
+    persist: bool = False
+
+
+class HoibanImageRequest(BaseModel):
+    """方位盤画像リクエストモデル"""
+    kyuseiHoiban: Dict[str, Any]
+    variant: Literal["thumbnail", "screen", "print"] = "screen"
+    palette: bool = False  # 減色したPNG（サイズ優先）
 
 
 @router.post("/generate-word")
@@ -54,21 +72,32 @@ async def generate_word_export(request: WordExportRequest):
             'targetDate': request.targetDate or datetime.now().strftime('%Y年%m月%d日')
         }
 
+        # ロゴ画像（Word用に縮小済みの派生画像を使用）
+        if request.logoPath:
+            logo = await asyncio.to_thread(logo_service.get_variant, request.logoPath, "word")
+            if logo is not None:
+                data['logoImage'] = logo.data
+
         # 方位盤画像生成
         hoiban_image = None
         if request.kyuseiHoiban:
             try:
                 logger.info("方位盤画像生成開始")
-                hoiban_image = generate_hoiban_image(request.kyuseiHoiban)
+                from app.services.word_generator import hoiban_variant_for_docx
+                hoiban_image = await render_pool.render_hoiban_png(
+                    request.kyuseiHoiban, variant=hoiban_variant_for_docx(), palette=True
+                )
                 data['hoibanImage'] = hoiban_image
                 logger.info("方位盤画像生成完了")
+            except RenderPoolBusy:
+                raise
             except Exception as e:
                 logger.warning(f"方位盤画像生成失敗: {str(e)} - 続行します")
                 # 方位盤画像生成失敗時も文書生成は続行
 
         # Word文書生成
         logger.info("Word文書生成処理開始")
-        word_bytes = generate_word_document(data)
+        word_bytes = await render_pool.render_word(data)
         logger.info("Word文書生成完了")
 
         # ファイル名生成（URL エンコード対応）
@@ -80,16 +109,31 @@ async def generate_word_export(request: WordExportRequest):
         from urllib.parse import quote
         filename_encoded = quote(filename_raw.encode('utf-8'))
 
+        headers = {
+            "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}",
+            "Content-Type": DOCX_MEDIA_TYPE
+        }
+
+        # 再ダウンロード用に保存（保存名はレスポンスヘッダーで返す）
+        if request.persist:
+            document_name = f"word_{uuid.uuid4().hex}.docx"
+            await asyncio.to_thread(get_storage(WORD_EXPORT_ROOT).save, document_name, word_bytes)
+            headers["X-Document-Name"] = document_name
+
         # レスポンス返却
         return Response(
             content=word_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}",
-                "Content-Type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            }
+            media_type=DOCX_MEDIA_TYPE,
+            headers=headers
         )
 
+    except RenderPoolBusy:
+        logger.warning("Word文書生成待ち行列が満杯")
+        raise HTTPException(
+            status_code=503,
+            detail="Word文書の生成が混み合っています。しばらくしてから再度お試しください。",
+            headers={"Retry-After": "5"}
+        )
     except Exception as e:
         logger.error(f"Word文書生成エラー: {str(e)}")
         raise HTTPException(
@@ -98,6 +142,62 @@ async def generate_word_export(request: WordExportRequest):
         )
 
 
+@router.post("/hoiban-image")
+async def generate_hoiban_image(
+    request: HoibanImageRequest,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    方位盤画像（PNG）生成エンドポイント
+
+    Args:
+        request: 方位盤データと画像の種別（thumbnail: 履歴一覧 / screen: 画面表示 / print: 印刷）
+
+    Returns:
+        方位盤のPNG画像（内容が同じ場合は304）
+    """
+    try:
+        png_bytes = await render_pool.render_hoiban_png(
+            request.kyuseiHoiban, variant=request.variant, palette=request.palette
+        )
+    except RenderPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="方位盤画像の生成が混み合っています。しばらくしてから再度お試しください。",
+            headers={"Retry-After": "5"}
+        )
+
+    etag = content_etag(hashlib.sha256(png_bytes).hexdigest())
+    headers = {"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=png_bytes, media_type="image/png", headers=headers)
+
+
+@router.get("/word-documents/{document_name}")
+async def download_word_document(document_name: str):
+    """
+    保存済みWord文書のダウンロードエンドポイント
+
+    Args:
+        document_name: 生成時に X-Document-Name で返した保存名
+
+    Returns:
+        Word文書（.docx）のストリーミングレスポンス
+    """
+    # セキュリティ：パストラバーサル攻撃を防ぐ
+    if ".." in document_name or "/" in document_name or "\\" in document_name:
+        raise HTTPException(status_code=400, detail="Invalid document name")
+
+    storage = get_storage(WORD_EXPORT_ROOT)
+    locator = storage.locate(document_name)
+    if not await asyncio.to_thread(storage.exists, locator):
+        raise HTTPException(status_code=404, detail="Word文書が見つかりません")
+
+    return await asyncio.to_thread(artifact_response, locator, media_type=DOCX_MEDIA_TYPE, filename=document_name)
+
+
 @router.get("/test-word")
 async def test_word_generation():
     """
@@ -152,7 +252,7 @@ async def test_word_generation():
         }
 
         # Word文書生成
-        word_bytes = generate_word_document(test_data)
+        word_bytes = await render_pool.render_word(test_data)
 
         # ファイル名（テスト用）
         filename_raw = f"test_document_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
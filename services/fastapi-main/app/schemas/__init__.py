@@ -1,12 +1,16 @@
 from app.schemas.user import User, UserCreate, UserUpdate, Token, TokenData, ThemeSettingsUpdate, ThemeSettingsResponse
 from app.schemas.kantei import (
     ClientInfo,
+    KanteiClientInfo,
     KanteiRequest,
     KanteiResponse,
+    KanteiLookupResponse,
     PDFGenerateRequest,
     PDFGenerateResponse,
     PDFGenerationRequest,
     PDFGenerationResponse,
+    PDFJobResponse,
+    BulkExportRequest,
     EmailSendRequest,
     EmailSendResponse,
     KanteiHistoryItem,
@@ -29,12 +33,16 @@ __all__ = [
     "Token",
     "TokenData",
     "ClientInfo",
+    "KanteiClientInfo",
     "KanteiRequest",
     "KanteiResponse",
+    "KanteiLookupResponse",
     "PDFGenerateRequest",
     "PDFGenerateResponse",
     "PDFGenerationRequest",
     "PDFGenerationResponse",
+    "PDFJobResponse",
+    "BulkExportRequest",
     "EmailSendRequest",
     "EmailSendResponse",
     "KanteiHistoryItem",
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+from typing import Optional, Dict, Any, List, Literal
+from datetime import date, datetime
 
 
 class ClientInfo(BaseModel):
@@ -13,13 +13,28 @@ class ClientInfo(BaseModel):
     email: Optional[str] = None
 
 
+class KanteiClientInfo(BaseModel):
+    """鑑定レスポンスのクライアント情報（鑑定記録に保存される項目のみ・全エンドポイント共通）"""
+    surname: str
+    given_name: str
+    birth_date: str
+
+
 class KanteiRequest(BaseModel):
     client_info: ClientInfo
+    # 同一姓名・生年月日の既存鑑定を再利用（link: 既存記録を返す, copy: 結果をコピーした新規記録を作成）
+    reuse: Optional[Literal["link", "copy"]] = None
+
+
+class KanteiLookupResponse(BaseModel):
+    exists: bool
+    kantei_id: Optional[int] = None
+    created_at: Optional[datetime] = None
 
 
 class KanteiResponse(BaseModel):
     id: int
-    client_info: ClientInfo
+    client_info: KanteiClientInfo
     kyusei_result: Optional[Dict[str, Any]] = None
     seimei_result: Optional[Dict[str, Any]] = None
     combined_result: Optional[Dict[str, Any]] = None
@@ -56,11 +71,13 @@ class TemplateSettings(BaseModel):
     font_family: str = Field(default="mincho")
     include_logo: bool = Field(default=True)
     include_signature: bool = Field(default=True)
+    document_date: Optional[str] = None  # 作成日の表示（未指定時は生成日）
 
 class PDFGenerationRequest(BaseModel):
-    kantei_data: Dict[str, Any]  # KyuseiKigakuData + SeimeiHandanData
+    kantei_data: Dict[str, Any]  # KyuseiKigakuData + SeimeiHandanData（kyusei_hoiban指定時は方位盤を描画。クライアントのみが指定でき、鑑定記録からは作られない）
     template_settings: TemplateSettings
     custom_message: Optional[str] = None
+    optimize: bool = Field(default=True)  # サイズ最適化モード（圧縮・使用グリフのみ埋め込み）
 
 class PDFGenerationResponse(BaseModel):
     success: bool
@@ -75,6 +92,7 @@ class PDFGenerateRequest(BaseModel):
     kantei_id: int
     template_settings: Optional[TemplateSettings] = None
     custom_message: Optional[str] = None
+    optimize: bool = Field(default=False)  # サイズ最適化モード（指定時のみ。ロゴをJPEGで埋め込む）
 
 class PDFGenerateResponse(BaseModel):
     success: bool
@@ -83,6 +101,28 @@ class PDFGenerateResponse(BaseModel):
     message: str
 
 
+class PDFJobResponse(BaseModel):
+    job_id: int
+    kantei_id: int
+    status: str  # queued, running, completed, failed
+    attempts: int
+    pdf_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class BulkExportRequest(BaseModel):
+    # 鑑定IDまたは作成日の範囲で対象を指定（両方指定時は両方の条件を満たすもの）
+    kantei_ids: Optional[List[int]] = Field(default=None, max_length=500)
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    # booklet: しおり付きの1冊のPDF, zip: 鑑定書ファイルを格納したZIP
+    output: Literal["booklet", "zip"] = "zip"
+    file_format: Literal["pdf", "docx"] = "pdf"  # zip出力時のファイル形式
+    template_settings: Optional[TemplateSettings] = None
+
+
 class EmailSendRequest(BaseModel):
     kantei_id: int
     email_address: EmailStr
@@ -102,6 +142,8 @@ class KanteiHistoryItem(BaseModel):
     created_at: datetime
     pdf_generated: bool
     email_sent: bool
+    # with_results=true の場合のみ: fields=（既定は compact）で絞り込んだ鑑定結果
+    results: Optional[Dict[str, Any]] = None
 
     class Config:
         from_attributes = True
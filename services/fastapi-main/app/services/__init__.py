@@ -1,9 +1,34 @@
 from app.services.kyusei import kyusei_service
 from app.services.seimei import seimei_service
 from app.services.pdf import pdf_service
+from app.services.kantei_stats import kantei_stats_service
+from app.services.kantei_response import kantei_response_serializer
+from app.services.idempotency import idempotency_service
+from app.services.kantei_lookup import kantei_lookup_service
+from app.services.render_pool import render_pool, RenderPoolBusy, RenderTimeout
+from app.services.pdf_jobs import pdf_job_service, build_pdf_data
+from app.services.logo import logo_service
+from app.services.bulk_export import bulk_export_service
+from app.services.artifact_lifecycle import artifact_lifecycle_service
+from app.services.storage import get_storage, storage_for, artifact_response
 
 __all__ = [
     "kyusei_service",
     "seimei_service",
-    "pdf_service"
+    "pdf_service",
+    "kantei_stats_service",
+    "kantei_response_serializer",
+    "idempotency_service",
+    "kantei_lookup_service",
+    "render_pool",
+    "RenderPoolBusy",
+    "RenderTimeout",
+    "pdf_job_service",
+    "build_pdf_data",
+    "logo_service",
+    "bulk_export_service",
+    "artifact_lifecycle_service",
+    "get_storage",
+    "storage_for",
+    "artifact_response"
 ]
\ No newline at end of file
@@ -0,0 +1,313 @@
+"""
+生成済み成果物のライフサイクル管理サービス
+generated_pdfs の成果物をインデックステーブルで管理し、保存容量の上限を超えたら最終アクセス日時の古い順に削除する
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import KanteiRecord, GeneratedArtifact
+from app.services.kantei_stats import kantei_stats_service
+from app.services.kantei_response import kantei_response_serializer
+from app.services.storage import get_storage, storage_for
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactLifecycleService:
+    """生成済み成果物のライフサイクル管理クラス
+
+    - 保存時に register() でインデックスに登録し（サイズ・内容のハッシュ）、ダウンロード時に touch() で最終アクセス日時を更新する
+    - バックグラウンドのスイープは1回あたり batch_size 件までを処理する（テーブル・ディレクトリ全体を走査しない）
+      1. 鑑定記録のPDFが作り直されて参照されなくなった古いファイルを削除
+      2. 合計サイズが上限を超えていれば、最終アクセス日時の古い順に上限の一定割合まで削除
+    - 削除したファイルを参照している鑑定記録は pdf_generated / pdf_path を同じトランザクションでクリアする
+    """
+
+    def __init__(self):
+        self.quota_bytes = settings.artifact_quota_mb * 1024 * 1024
+        # 削除時はこの割合まで減らす（毎回上限ぎりぎりで削除が走るのを避ける）
+        self.low_water_ratio = 0.9
+        self.sweep_interval = settings.artifact_sweep_interval_seconds
+        self.batch_size = settings.artifact_sweep_batch_size
+        # 最終アクセス日時の更新間隔（ダウンロードごとの書き込みを抑える）
+        self.touch_interval = timedelta(minutes=5)
+
+        self._task: Optional[asyncio.Task] = None
+        self._metrics = {
+            "sweeps": 0,
+            "superseded_removed": 0,
+            "evicted": 0,
+            "evicted_bytes": 0,
+            "errors": 0,
+        }
+
+    def register(
+        self,
+        db: Session,
+        path: str,
+        kantei_record_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        kind: str = "pdf",
+        accessed_at: Optional[datetime] = None,
+        content_hash: Optional[str] = None,
+        size_bytes: Optional[int] = None
+    ) -> Optional[str]:
+        """保存した成果物（ロケーター）をインデックスに登録して内容のハッシュを返す（コミットは呼び出し側で行う）
+
+        content_hash を省略した場合は保存済みの内容を読み出して計算する。
+        保存直後で content_hash と size_bytes が分かっている場合はストレージにアクセスしない。
+        """
+        if content_hash is not None and size_bytes is not None:
+            size = size_bytes
+        else:
+            storage = storage_for(path)
+            try:
+                file_stat = storage.stat(path)
+                if file_stat is not None and content_hash is None:
+                    digest = hashlib.sha256()
+                    for chunk in storage.iter_chunks(path):
+                        digest.update(chunk)
+                    content_hash = digest.hexdigest()
+            except Exception as e:
+                logger.warning(f"Artifact read error on register - {path}: {e}")
+                return None
+            if file_stat is None:
+                logger.warning(f"Artifact not found on register - {path}")
+                return None
+            size = file_stat["size"]
+
+        stmt = insert(GeneratedArtifact).values(
+            path=path,
+            kind=kind,
+            size_bytes=size,
+            content_hash=content_hash,
+            user_id=user_id,
+            kantei_record_id=kantei_record_id,
+            last_accessed_at=accessed_at or func.now()
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["path"],
+            set_={
+                "size_bytes": stmt.excluded.size_bytes,
+                "content_hash": stmt.excluded.content_hash,
+                "user_id": stmt.excluded.user_id,
+                "kantei_record_id": stmt.excluded.kantei_record_id,
+                "last_accessed_at": func.now()
+            }
+        ))
+
+        self.ensure_started()
+        return content_hash
+
+    def register_file(
+        self,
+        path: Optional[str],
+        kantei_record_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        content_hash: Optional[str] = None
+    ) -> None:
+        """独自のセッションで登録してコミット（バックグラウンド処理用）"""
+        if not path:
+            return
+
+        db = SessionLocal()
+        try:
+            self.register(db, path, kantei_record_id=kantei_record_id, user_id=user_id, content_hash=content_hash)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Artifact register failed - {path}: {e}")
+        finally:
+            db.close()
+
+    def get_content_hash(self, db: Session, path: str) -> Optional[str]:
+        """インデックスに保存した内容のハッシュ（未登録・計算前の成果物はNone）"""
+        return db.query(GeneratedArtifact.content_hash).filter(GeneratedArtifact.path == path).scalar()
+
+    def touch(self, db: Session, path: str) -> None:
+        """ダウンロード時に最終アクセス日時を更新（一定間隔以内の再更新は省略）"""
+        now = datetime.now(timezone.utc)
+        updated = db.query(GeneratedArtifact).filter(
+            GeneratedArtifact.path == path,
+            GeneratedArtifact.last_accessed_at < now - self.touch_interval
+        ).update({GeneratedArtifact.last_accessed_at: now}, synchronize_session=False)
+        if updated:
+            db.commit()
+
+        self.ensure_started()
+
+    def get_usage(self, db: Session) -> Dict[str, int]:
+        """インデックス上の件数・合計サイズ"""
+        count, total = db.query(
+            func.count(GeneratedArtifact.id),
+            func.coalesce(func.sum(GeneratedArtifact.size_bytes), 0)
+        ).one()
+        return {"count": int(count), "size_bytes": int(total)}
+
+    def ensure_started(self) -> None:
+        """バックグラウンドのスイープを起動（未起動の場合のみ）"""
+        if self.sweep_interval <= 0:
+            return
+        if self._task is not None and not self._task.done():
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._task = loop.create_task(self.run_sweeper())
+        logger.info(f"Artifact sweeper started - quota: {self.quota_bytes} bytes")
+
+    async def stop(self) -> None:
+        """バックグラウンドのスイープを停止"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def run_sweeper(self) -> None:
+        """一定間隔でスイープを実行し続ける（残りがある間は間隔を空けずに続ける）
+
+        DBの問い合わせ・ファイル削除を行うため、スイープはイベントループ外のスレッドで実行する。
+        """
+        while True:
+            try:
+                processed = await asyncio.to_thread(self.sweep_once)
+            except Exception as e:
+                self._metrics["errors"] += 1
+                logger.error(f"Artifact sweep error: {e}")
+                processed = 0
+
+            await asyncio.sleep(0 if processed >= self.batch_size else self.sweep_interval)
+
+    def sweep_once(self) -> int:
+        """1バッチ分のスイープ（処理件数を返す）"""
+        db = SessionLocal()
+        try:
+            self._metrics["sweeps"] += 1
+            processed = self._remove_superseded(db)
+            processed += self._evict_over_quota(db)
+            return processed
+        finally:
+            db.close()
+
+    def _remove_superseded(self, db: Session) -> int:
+        """鑑定記録から参照されなくなった（作り直された）PDFを削除"""
+        superseded = db.query(GeneratedArtifact).join(
+            KanteiRecord, KanteiRecord.id == GeneratedArtifact.kantei_record_id
+        ).filter(
+            func.coalesce(KanteiRecord.pdf_path, "") != GeneratedArtifact.path
+        ).order_by(GeneratedArtifact.id).limit(self.batch_size).with_for_update(
+            of=GeneratedArtifact, skip_locked=True
+        ).all()
+
+        paths = []
+        for artifact in superseded:
+            # コピーされた鑑定記録などから参照されている場合は所有者なしとして残す
+            if db.query(KanteiRecord.id).filter(KanteiRecord.pdf_path == artifact.path).first():
+                artifact.kantei_record_id = None
+                continue
+            paths.append(artifact.path)
+            db.delete(artifact)
+
+        db.commit()
+        self._remove_files(paths)
+        self._metrics["superseded_removed"] += len(paths)
+        return len(superseded)
+
+    def _evict_over_quota(self, db: Session) -> int:
+        """合計サイズが上限を超えていれば最終アクセス日時の古い順に削除"""
+        total = self.get_usage(db)["size_bytes"]
+        if total <= self.quota_bytes:
+            return 0
+
+        target = self.quota_bytes * self.low_water_ratio
+        candidates = db.query(GeneratedArtifact).order_by(
+            GeneratedArtifact.last_accessed_at, GeneratedArtifact.id
+        ).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+        paths = []
+        evicted_bytes = 0
+        for artifact in candidates:
+            if total <= target:
+                break
+            self._clear_records(db, artifact.path)
+            paths.append(artifact.path)
+            total -= artifact.size_bytes
+            evicted_bytes += artifact.size_bytes
+            db.delete(artifact)
+
+        # 鑑定記録の参照を外してからファイルを削除する
+        db.commit()
+        self._remove_files(paths)
+
+        self._metrics["evicted"] += len(paths)
+        self._metrics["evicted_bytes"] += evicted_bytes
+        logger.info(f"Artifacts evicted - count: {len(paths)}, bytes: {evicted_bytes}, remaining: {total}")
+        return len(paths)
+
+    def _clear_records(self, db: Session, path: str) -> None:
+        """削除するファイルを参照している鑑定記録のPDF情報をクリア"""
+        kantei_records = db.query(KanteiRecord).filter(KanteiRecord.pdf_path == path).all()
+        for kantei_record in kantei_records:
+            was_generated = kantei_record.pdf_generated
+            kantei_record.pdf_path = None
+            kantei_record.pdf_generated = False
+            kantei_response_serializer.refresh(kantei_record)
+            if was_generated:
+                kantei_stats_service.increment(db, kantei_record.user_id, pdf_generated_count=-1)
+
+    def _remove_files(self, paths: List[str]) -> None:
+        for path in paths:
+            try:
+                storage_for(path).delete(path)
+            except Exception as e:
+                self._metrics["errors"] += 1
+                logger.warning(f"Artifact delete error - {path}: {e}")
+
+    def backfill(self, db: Session, root: str) -> int:
+        """インデックス未登録の既存成果物を登録（導入時に一度実行。登録件数を返す）"""
+        registered = 0
+        for path, _size, mtime in get_storage(root).list():
+            if not path.endswith(".pdf"):
+                continue
+            if db.query(GeneratedArtifact.id).filter(GeneratedArtifact.path == path).first():
+                continue
+
+            kantei_record = db.query(KanteiRecord).filter(KanteiRecord.pdf_path == path).first()
+            self.register(
+                db,
+                path,
+                kantei_record_id=kantei_record.id if kantei_record else None,
+                user_id=kantei_record.user_id if kantei_record else None,
+                accessed_at=datetime.fromtimestamp(mtime, timezone.utc)
+            )
+            registered += 1
+            if registered % self.batch_size == 0:
+                db.commit()
+
+        db.commit()
+        return registered
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """スイープのメトリクス（このプロセス分）"""
+        return {
+            "quota_bytes": self.quota_bytes,
+            "running": self._task is not None and not self._task.done(),
+            **self._metrics,
+        }
+
+
+# シングルトンインスタンス
+artifact_lifecycle_service = ArtifactLifecycleService()
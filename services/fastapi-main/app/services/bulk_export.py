@@ -0,0 +1,250 @@
+"""
+一括エクスポートサービス
+複数の鑑定記録を、しおり付きの1冊のPDF（冊子）またはPDF/Wordファイルを格納したZIPとして出力する
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import zipfile
+from collections import deque
+from datetime import date, datetime, time
+from typing import Any, AsyncIterator, BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import KanteiRecord
+from app.services.pdf_jobs import build_pdf_data
+from app.services.render_pool import render_pool, RenderPoolBusy
+
+logger = logging.getLogger(__name__)
+
+
+def build_word_data(kantei_record: KanteiRecord) -> Dict[str, Any]:
+    """鑑定記録からWord文書生成用データを作成"""
+    created_at = kantei_record.created_at or datetime.now()
+    return {
+        "formData": {
+            "name": f"{kantei_record.client_surname}{kantei_record.client_given_name}",
+            "birthDate": kantei_record.client_birth_date,
+        },
+        "kyuseiResult": json.loads(kantei_record.kyusei_result) if kantei_record.kyusei_result else None,
+        "seimeiResult": json.loads(kantei_record.seimei_result) if kantei_record.seimei_result else None,
+        "kantei_comment": kantei_record.kantei_comment,
+        "targetDate": created_at.strftime('%Y年%m月%d日'),
+    }
+
+
+class _ZipStream:
+    """ZipFileの書き込み先（書き込まれたバイト列を溜め、送信ごとに取り出す）
+
+    tell/seekを持たないため、ZipFileはデータディスクリプタ形式で逐次書き込む。
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class BulkExportService:
+    """一括エクスポート管理クラス
+
+    - ZIP: 鑑定書を同時実行数を制限して並列に生成し、生成順にZIPエントリとして逐次送信する
+      （メモリに保持するのは生成中・送信待ちの数件分のみ）
+    - 冊子PDF: レンダリングワーカーで1つの文書として組み、削除済みの一時ファイルからチャンク単位で送信する
+    """
+
+    def __init__(self):
+        self.max_records = settings.bulk_export_max_records
+        self.concurrency = settings.bulk_export_concurrency
+        self.chunk_size = settings.pdf_stream_chunk_bytes
+        # 待ち行列が満杯の場合の再試行
+        self.busy_retries = 30
+        self.busy_delay = 1.0
+
+    def select_record_ids(
+        self,
+        db: Session,
+        user_id: int,
+        kantei_ids: Optional[List[int]] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> List[int]:
+        """対象の鑑定IDを取得（本人の記録のみ・作成日時順・上限件数まで）"""
+        query = db.query(KanteiRecord.id).filter(KanteiRecord.user_id == user_id)
+
+        if kantei_ids:
+            query = query.filter(KanteiRecord.id.in_(kantei_ids))
+        if date_from:
+            query = query.filter(KanteiRecord.created_at >= datetime.combine(date_from, time.min))
+        if date_to:
+            query = query.filter(KanteiRecord.created_at <= datetime.combine(date_to, time.max))
+
+        rows = query.order_by(KanteiRecord.created_at, KanteiRecord.id).limit(self.max_records + 1).all()
+        return [row.id for row in rows]
+
+    async def iter_zip(
+        self,
+        record_ids: List[int],
+        template_settings: Dict[str, Any],
+        file_format: str = "pdf"
+    ) -> AsyncIterator[bytes]:
+        """鑑定書を格納したZIPを逐次生成（生成に失敗した鑑定書は errors.txt に記録）"""
+        stream = _ZipStream()
+        errors: List[str] = []
+
+        # 送信が中断された場合は生成中のジョブもすぐに取り消す（内側のジェネレーターを明示的に閉じる）
+        rendered = self._render_in_order(record_ids, template_settings, file_format)
+        async with contextlib.aclosing(rendered):
+            with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+                async for filename, content, error in rendered:
+                    if content is None:
+                        errors.append(f"{filename}: {error}")
+                        continue
+                    self._write_entry(archive, filename, content)
+                    del content
+                    yield stream.drain()
+
+                if errors:
+                    self._write_entry(archive, "errors.txt", "\n".join(errors).encode("utf-8"))
+
+        # セントラルディレクトリ
+        yield stream.drain()
+
+    def _write_entry(self, archive: zipfile.ZipFile, filename: str, content: bytes) -> None:
+        entry = zipfile.ZipInfo(filename, date_time=datetime.now().timetuple()[:6])
+        entry.compress_type = zipfile.ZIP_DEFLATED
+        entry.external_attr = 0o644 << 16
+        archive.writestr(entry, content)
+
+    async def _render_in_order(
+        self,
+        record_ids: List[int],
+        template_settings: Dict[str, Any],
+        file_format: str
+    ) -> AsyncIterator[Tuple[str, Optional[bytes], Optional[str]]]:
+        """同時実行数を制限して並列に生成し、ID順に (ファイル名, 内容, エラー) を返す"""
+        jobs = iter(record_ids)
+        pending: Deque[asyncio.Task] = deque()
+
+        def schedule_next() -> None:
+            for kantei_id in jobs:
+                pending.append(asyncio.ensure_future(self._render_one(kantei_id, template_settings, file_format)))
+                return
+
+        try:
+            for _ in range(max(self.concurrency, 1)):
+                schedule_next()
+
+            while pending:
+                result = await pending.popleft()
+                schedule_next()
+                if result is not None:
+                    yield result
+        finally:
+            # クライアント切断時などは生成中のジョブを取り消す
+            for task in pending:
+                task.cancel()
+
+    async def _render_one(
+        self,
+        kantei_id: int,
+        template_settings: Dict[str, Any],
+        file_format: str
+    ) -> Optional[Tuple[str, Optional[bytes], Optional[str]]]:
+        """鑑定書1件を生成（記録が削除されていた場合はNone）"""
+        db = SessionLocal()
+        try:
+            kantei_record = db.get(KanteiRecord, kantei_id)
+            if kantei_record is None:
+                return None
+            filename = self.make_filename(kantei_record, file_format)
+            if file_format == "docx":
+                data = build_word_data(kantei_record)
+            else:
+                data = build_pdf_data(kantei_record)
+        finally:
+            db.close()
+
+        for attempt in range(self.busy_retries + 1):
+            try:
+                if file_format == "docx":
+                    content = await render_pool.render_word(data)
+                else:
+                    content = await render_pool.render_pdf(data, template_settings, optimize=True)
+                return filename, content, None
+            except RenderPoolBusy:
+                if attempt == self.busy_retries:
+                    return filename, None, "render queue is busy"
+                await asyncio.sleep(self.busy_delay)
+            except Exception as e:
+                logger.error(f"Bulk export render failed - kantei_id: {kantei_id}: {e}")
+                return filename, None, str(e)
+
+    async def build_booklet(
+        self,
+        record_ids: List[int],
+        template_settings: Dict[str, Any]
+    ) -> Tuple[BinaryIO, int]:
+        """冊子PDFを一時ファイルに生成（読み出し用に開いたファイルとページ数を返す）
+
+        一時ファイルは開いた直後にパスを削除するため、レスポンスが送信されずに破棄された場合も
+        ファイルを閉じた時点で領域が解放される。
+        """
+        items = []
+        db = SessionLocal()
+        try:
+            for kantei_id in record_ids:
+                kantei_record = db.get(KanteiRecord, kantei_id)
+                if kantei_record is None:
+                    continue
+                items.append({
+                    "title": f"{kantei_record.client_surname} {kantei_record.client_given_name}（{kantei_record.client_birth_date}）",
+                    "kantei_data": build_pdf_data(kantei_record),
+                })
+        finally:
+            db.close()
+
+        fd, output_path = tempfile.mkstemp(prefix="booklet_", suffix=".pdf")
+        os.close(fd)
+        try:
+            page_count = await render_pool.render_booklet(items, template_settings, output_path)
+            booklet = open(output_path, "rb")
+        finally:
+            os.remove(output_path)
+        return booklet, page_count
+
+    def iter_file(self, f: BinaryIO) -> Iterator[bytes]:
+        """ファイルをチャンク単位で読み出す（送信完了・中断後に閉じる）"""
+        try:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    def make_filename(self, kantei_record: KanteiRecord, file_format: str) -> str:
+        """ZIP内のファイル名（IDを含めて重複を避ける）"""
+        return f"{kantei_record.id}_{kantei_record.client_surname}{kantei_record.client_given_name}.{file_format}"
+
+
+# シングルトンインスタンス
+bulk_export_service = BulkExportService()
@@ -0,0 +1,134 @@
+"""
+方位盤レイアウト
+方位盤の図形（座標・色・文字）を定義し、PDF用のベクター描画（ReportLabのDrawing）を組み立てる
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from reportlab.graphics.shapes import Circle, Drawing, Group, Line, String
+from reportlab.lib.colors import HexColor, white
+
+# 方位盤の座標系（SVGと同じ左上原点・1辺300）
+BOARD_SIZE = 300
+BOARD_CENTER = BOARD_SIZE // 2
+BOARD_RADIUS = 120
+OUTER_RADIUS = BOARD_RADIUS + 20
+CENTER_RADIUS = 30
+DIRECTION_RADIUS = 25
+
+# 色
+PRIMARY_COLOR = "#1976d2"
+ACCENT_COLOR = "#dc004e"
+PLATE_COLOR = "#f5f5f5"
+LINE_COLOR = "#e0e0e0"
+TEXT_COLOR = "#000000"
+
+# 文字サイズ
+DIRECTION_FONT_SIZE = 14
+STAR_FONT_SIZE = 12
+CENTER_FONT_SIZE = 16
+
+DEFAULT_CENTER_STAR = "五黄土星"
+
+# 方位ごとの中心からの向き（斜め方向は半径の0.7倍）
+DIRECTION_OFFSETS: Dict[str, Tuple[float, float]] = {
+    "北": (0, -1),
+    "北東": (0.7, -0.7),
+    "東": (1, 0),
+    "南東": (0.7, 0.7),
+    "南": (0, 1),
+    "南西": (-0.7, 0.7),
+    "西": (-1, 0),
+    "北西": (-0.7, -0.7),
+}
+
+
+def direction_positions() -> Dict[str, Tuple[float, float]]:
+    """方位ごとの円の中心座標"""
+    return {
+        direction: (BOARD_CENTER + BOARD_RADIUS * dx, BOARD_CENTER + BOARD_RADIUS * dy)
+        for direction, (dx, dy) in DIRECTION_OFFSETS.items()
+    }
+
+
+def direction_lines() -> List[Tuple[float, float, float, float]]:
+    """方位線（縦・横・斜め2本）の端点"""
+    c, r = BOARD_CENTER, BOARD_RADIUS
+    d = r * 0.7 + 14
+    return [
+        (c, c - r - 20, c, c + r + 20),
+        (c - r - 20, c, c + r + 20, c),
+        (c - d, c - d, c + d, c + d),
+        (c + d, c - d, c - d, c + d),
+    ]
+
+
+def center_star_name(hoiban_data: Dict[str, Any]) -> str:
+    """中央の星の名前（年盤の中宮）"""
+    try:
+        return hoiban_data.get('nenban', {}).get('centerQsei', {}).get('name') or DEFAULT_CENTER_STAR
+    except AttributeError:
+        return DEFAULT_CENTER_STAR
+
+
+def star_labels(hoiban_data: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """方位盤に表示する (方位, 年盤星) の一覧（未知の方位は除く）"""
+    labels = []
+    for detail in hoiban_data.get('houiDetails') or []:
+        direction = detail.get('houi', '')
+        if direction in DIRECTION_OFFSETS:
+            labels.append((direction, str(detail.get('nenbanStar', '') or '')))
+    return labels
+
+
+def hoiban_drawing(hoiban_data: Dict[str, Any], width: float, font_name: str) -> Drawing:
+    """方位盤をベクター描画として組み立てる（PDFにラスタライズせずに埋め込む）
+
+    座標系の上下を反転して方位盤の座標（左上原点）で描き、width（pt）に縮尺する。
+    重なり順はSVG版と同じく、方位線を最後（円・文字の上）に描く。
+    """
+    scale = width / BOARD_SIZE
+    drawing = Drawing(width, width)
+    board = Group(transform=(scale, 0, 0, scale, 0, 0))
+
+    def y(value: float) -> float:
+        return BOARD_SIZE - value
+
+    def text(x: float, top: float, label: str, font_size: int, color: str) -> String:
+        # SVGの dominant-baseline: middle に合わせてベースラインを下げる
+        return String(
+            x, y(top) - font_size * 0.35, label,
+            fontName=font_name, fontSize=font_size, fillColor=HexColor(color), textAnchor='middle'
+        )
+
+    # 背景円・中央円
+    board.add(Circle(
+        BOARD_CENTER, y(BOARD_CENTER), OUTER_RADIUS,
+        fillColor=HexColor(PLATE_COLOR), strokeColor=HexColor(PRIMARY_COLOR), strokeWidth=2
+    ))
+    board.add(Circle(
+        BOARD_CENTER, y(BOARD_CENTER), CENTER_RADIUS,
+        fillColor=white, strokeColor=HexColor(PRIMARY_COLOR), strokeWidth=2
+    ))
+
+    # 中央星
+    board.add(text(BOARD_CENTER, BOARD_CENTER, center_star_name(hoiban_data), CENTER_FONT_SIZE, ACCENT_COLOR))
+
+    # 8方位の年盤星
+    positions = direction_positions()
+    for direction, star in star_labels(hoiban_data):
+        cx, cy = positions[direction]
+        board.add(Circle(
+            cx, y(cy), DIRECTION_RADIUS,
+            fillColor=white, strokeColor=HexColor(LINE_COLOR), strokeWidth=1
+        ))
+        board.add(text(cx, cy - 8, direction, DIRECTION_FONT_SIZE, TEXT_COLOR))
+        if star:
+            board.add(text(cx, cy + 8, star, STAR_FONT_SIZE, PRIMARY_COLOR))
+
+    # 方位線
+    for x1, y1, x2, y2 in direction_lines():
+        board.add(Line(x1, y(y1), x2, y(y2), strokeColor=HexColor(LINE_COLOR), strokeWidth=1))
+
+    drawing.add(board)
+    return drawing
@@ -0,0 +1,255 @@
+"""
+Idempotency-Keyサービス
+同一キーの再送には保存済みレスポンスを返し、同時に届いた重複リクエストは最初の実行の完了を待たせる
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+# 再送レスポンスに付与するヘッダー
+REPLAY_HEADER = "Idempotency-Replayed"
+
+
+class IdempotencyService:
+    """Idempotency-Key管理クラス
+
+    キーはDBに保存するため、複数インスタンス間でも重複実行を防げる。
+    同一プロセス内の重複はイベントで即時に起床し、他インスタンスの実行中キーはポーリングで待つ。
+    """
+
+    def __init__(self):
+        self.window = timedelta(hours=settings.idempotency_window_hours)
+        self.wait_seconds = settings.idempotency_wait_seconds
+        self.lock_timeout = timedelta(seconds=settings.idempotency_lock_timeout_seconds)
+        self.poll_interval = 0.2
+        self.purge_interval = 60.0
+        self._last_purge = 0.0
+
+        # 同一プロセス内で実行中のキー → 完了通知イベント
+        self._inflight: Dict[Tuple[str, str], asyncio.Event] = {}
+
+    def fingerprint(self, endpoint: str, payload: Any) -> str:
+        """エンドポイントとリクエスト内容から指紋を作成"""
+        body = orjson.dumps(jsonable_encoder(payload), option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(endpoint.encode("utf-8") + b"\n" + body).hexdigest()
+
+    async def run(
+        self,
+        db: Session,
+        scope: str,
+        idempotency_key: Optional[str],
+        endpoint: str,
+        payload: Any,
+        handler: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Idempotency-Key付きでハンドラーを実行
+
+        キーが未指定ならそのまま実行する。既に完了済みのキーは保存済みレスポンスを返し、
+        実行中のキーは完了を待ってから保存済みレスポンスを返す。
+        """
+        if not idempotency_key:
+            return await handler()
+
+        fingerprint = self.fingerprint(endpoint, payload)
+        replay = await self._acquire(db, scope, idempotency_key, endpoint, fingerprint)
+        if replay is not None:
+            return replay
+
+        inflight_key = (scope, idempotency_key)
+        event = asyncio.Event()
+        self._inflight[inflight_key] = event
+
+        try:
+            try:
+                result = await handler()
+            except Exception:
+                self._release(db, scope, idempotency_key)
+                raise
+
+            response = self._to_response(result)
+            if getattr(result, "success", True) is False:
+                # 失敗レスポンスは保存せず、再送時に再実行できるようにする
+                self._release(db, scope, idempotency_key)
+            elif not self._is_storable(response):
+                # ストリーミング・ファイルレスポンスは本文を保持しないため保存せず、再送時は再実行する
+                logger.info(f"Idempotent response not stored (streaming) - scope: {scope}, key: {idempotency_key}")
+                self._release(db, scope, idempotency_key)
+            else:
+                self._complete(db, scope, idempotency_key, response)
+            return response
+
+        finally:
+            event.set()
+            self._inflight.pop(inflight_key, None)
+
+    async def _acquire(
+        self,
+        db: Session,
+        scope: str,
+        idempotency_key: str,
+        endpoint: str,
+        fingerprint: str
+    ) -> Optional[Response]:
+        """実行権を取得（取得できればNone、完了済みなら再送レスポンスを返す）"""
+        self._purge_expired(db)
+        deadline = time.monotonic() + self.wait_seconds
+
+        while True:
+            now = datetime.now(timezone.utc)
+
+            # 一意制約で同時実行を1件に絞る
+            try:
+                db.add(IdempotencyKey(
+                    scope=scope,
+                    idempotency_key=idempotency_key,
+                    endpoint=endpoint,
+                    fingerprint=fingerprint,
+                    status="in_progress",
+                    expires_at=now + self.window
+                ))
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+
+            existing = self._get(db, scope, idempotency_key)
+            if existing is None:
+                # 直前に解放された
+                continue
+
+            if existing.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used for a different request"
+                )
+
+            stale = existing.status == "in_progress" and existing.created_at + self.lock_timeout <= now
+            if existing.expires_at <= now or stale:
+                # 期限切れ・放置されたキーは削除して取り直す
+                logger.info(f"Idempotency key taken over - scope: {scope}, key: {idempotency_key}")
+                db.delete(existing)
+                db.commit()
+                continue
+
+            if existing.status == "completed":
+                return self._replay(existing)
+
+            # 実行中: 最初の実行の完了を待つ
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress"
+                )
+
+            event = self._inflight.get((scope, idempotency_key))
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(self.poll_interval, remaining))
+
+            # 次のループで最新状態を読み直す
+            db.expire_all()
+
+    def _get(self, db: Session, scope: str, idempotency_key: str) -> Optional[IdempotencyKey]:
+        return db.query(IdempotencyKey).filter(
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.idempotency_key == idempotency_key
+        ).first()
+
+    def _to_response(self, result: Any) -> Response:
+        """ハンドラーの戻り値を保存可能なレスポンスに変換"""
+        if isinstance(result, Response):
+            return result
+
+        return Response(
+            content=orjson.dumps(jsonable_encoder(result)),
+            media_type="application/json"
+        )
+
+    def _is_storable(self, response: Response) -> bool:
+        """本文をバイト列として保持しているレスポンスか（StreamingResponse・FileResponse は保存しない）"""
+        return isinstance(getattr(response, "body", None), (bytes, bytearray, memoryview))
+
+    def _complete(self, db: Session, scope: str, idempotency_key: str, response: Response) -> None:
+        """実行結果を保存"""
+        try:
+            record = self._get(db, scope, idempotency_key)
+            if record is None:
+                return
+
+            record.status = "completed"
+            record.response_status = response.status_code
+            record.response_body = bytes(response.body)
+            record.response_media_type = response.media_type
+            db.commit()
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to store idempotent response - scope: {scope}, key: {idempotency_key}: {e}")
+            # 実行中のまま残すとロックの期限切れまで再送が待たされるため解放する
+            self._release(db, scope, idempotency_key)
+
+    def _release(self, db: Session, scope: str, idempotency_key: str) -> None:
+        """実行中のキーを解放（失敗時に再送で再実行できるようにする）"""
+        try:
+            db.rollback()
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.idempotency_key == idempotency_key,
+                IdempotencyKey.status == "in_progress"
+            ).delete(synchronize_session=False)
+            db.commit()
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to release idempotency key - scope: {scope}, key: {idempotency_key}: {e}")
+
+    def _replay(self, record: IdempotencyKey) -> Response:
+        """保存済みレスポンスを再送"""
+        return Response(
+            content=bytes(record.response_body or b""),
+            status_code=record.response_status or status.HTTP_200_OK,
+            media_type=record.response_media_type,
+            headers={REPLAY_HEADER: "true"}
+        )
+
+    def _purge_expired(self, db: Session) -> None:
+        """期限切れのキーを削除（プロセスごとに一定間隔でのみ実行）"""
+        if time.monotonic() - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = time.monotonic()
+
+        try:
+            deleted = db.query(IdempotencyKey).filter(
+                IdempotencyKey.expires_at < datetime.now(timezone.utc)
+            ).delete(synchronize_session=False)
+            db.commit()
+            if deleted:
+                logger.info(f"Purged {deleted} expired idempotency keys")
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Idempotency key purge error: {e}")
+
+
+# シングルトンインスタンス
+idempotency_service = IdempotencyService()
@@ -0,0 +1,94 @@
+"""
+鑑定結果再利用サービス
+同一ユーザー・同一姓名・同一生年月日の既存鑑定を一意インデックスで検索し、再計算せずに再利用する
+"""
+
+import logging
+from typing import Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.models import KanteiRecord, KanteiLookup
+
+logger = logging.getLogger(__name__)
+
+
+class KanteiLookupService:
+    """既存鑑定の検索・再利用クラス"""
+
+    def _normalize(self, value: str) -> str:
+        """検索キーの正規化（前後の空白を除去）"""
+        return (value or "").strip()
+
+    def find(
+        self,
+        db: Session,
+        user_id: int,
+        surname: str,
+        given_name: str,
+        birth_date: str
+    ) -> Optional[KanteiRecord]:
+        """再利用可能な既存鑑定記録を取得"""
+        lookup = db.query(KanteiLookup).filter(
+            KanteiLookup.user_id == user_id,
+            KanteiLookup.client_surname == self._normalize(surname),
+            KanteiLookup.client_given_name == self._normalize(given_name),
+            KanteiLookup.client_birth_date == self._normalize(birth_date)
+        ).first()
+
+        if lookup is None:
+            return None
+
+        return db.query(KanteiRecord).filter(
+            KanteiRecord.id == lookup.kantei_record_id,
+            KanteiRecord.user_id == user_id
+        ).first()
+
+    def register(self, db: Session, kantei_record: KanteiRecord) -> None:
+        """鑑定記録を検索インデックスに登録（コミットは呼び出し側で行う）
+
+        九星気学・姓名判断の両方が取得できた記録のみを再利用対象とする。
+        """
+        if not kantei_record.kyusei_result or not kantei_record.seimei_result:
+            return
+
+        stmt = insert(KanteiLookup).values(
+            user_id=kantei_record.user_id,
+            client_surname=self._normalize(kantei_record.client_surname),
+            client_given_name=self._normalize(kantei_record.client_given_name),
+            client_birth_date=self._normalize(kantei_record.client_birth_date),
+            kantei_record_id=kantei_record.id
+        )
+        db.execute(stmt.on_conflict_do_update(
+            constraint="uq_kantei_lookups_client",
+            set_={
+                "kantei_record_id": stmt.excluded.kantei_record_id,
+                "updated_at": func.now()
+            }
+        ))
+
+    def copy_record(self, db: Session, source: KanteiRecord) -> KanteiRecord:
+        """既存鑑定の結果を新しい鑑定記録にコピー（外部サービスは呼び出さない）"""
+        kantei_record = KanteiRecord(
+            user_id=source.user_id,
+            client_surname=source.client_surname,
+            client_given_name=source.client_given_name,
+            client_birth_date=source.client_birth_date,
+            kyusei_result=source.kyusei_result,
+            seimei_result=source.seimei_result,
+            combined_result=source.combined_result,
+            pdf_generated=False,
+            email_sent=False
+        )
+        db.add(kantei_record)
+        db.flush()
+
+        logger.info(f"Kantei result reused - source: {source.id}, copy: {kantei_record.id}")
+        return kantei_record
+
+
+# シングルトンインスタンス
+kantei_lookup_service = KanteiLookupService()
+
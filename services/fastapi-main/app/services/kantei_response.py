@@ -0,0 +1,183 @@
+"""
+鑑定レスポンス事前シリアライズサービス
+鑑定結果は書き込み後ほぼ不変のため、APIレスポンスのバイト列を書き込み時に一度だけ生成して保存する
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+from sqlalchemy.orm import load_only
+
+from app.models import KanteiRecord
+from app.schemas import KanteiResponse
+
+
+# レスポンスのトップレベルフィールド → 読み込みが必要なカラム
+FIELD_COLUMNS = {
+    "id": [KanteiRecord.id],
+    "client_info": [
+        KanteiRecord.client_surname,
+        KanteiRecord.client_given_name,
+        KanteiRecord.client_birth_date
+    ],
+    "kyusei_result": [KanteiRecord.kyusei_result],
+    "seimei_result": [KanteiRecord.seimei_result],
+    "combined_result": [KanteiRecord.combined_result],
+    "kantei_comment": [KanteiRecord.kantei_comment],
+    "pdf_generated": [KanteiRecord.pdf_generated],
+    "pdf_path": [KanteiRecord.pdf_path],
+    "created_at": [KanteiRecord.created_at],
+}
+
+# 保存済みレスポンスの形式のバージョン（形式を変えたら上げる。ETagに含める）
+RESPONSE_VERSION = 2
+
+# fields= に指定できるプリセット
+FIELD_PRESETS = {
+    # 一覧表示向け: 姓名判断の詳細解説（original_response）を除外
+    "compact": [
+        "id",
+        "client_info",
+        "kyusei_result",
+        "seimei_result.total",
+        "seimei_result.heaven",
+        "seimei_result.earth",
+        "seimei_result.personality",
+        "combined_result",
+        "kantei_comment",
+        "pdf_generated",
+        "pdf_path",
+        "created_at",
+    ],
+}
+
+# 一覧表示（履歴一覧など）で fields= を省略した場合のプリセット
+LIST_DEFAULT_FIELDS = "compact"
+
+
+class KanteiResponseSerializer:
+    """鑑定レスポンスのシリアライズ・保存クラス"""
+
+    media_type = "application/json"
+
+    def parse_fields(self, fields: Optional[str]) -> Optional[Dict[str, Any]]:
+        """fields= パラメータを解析してフィールドツリーに変換
+
+        "seimei_result.total,id" のようなドット区切りのパス、またはプリセット名を受け付ける。
+        ツリーの葉（None）はそのサブツリー全体を表す。未指定ならNone（全フィールド）。
+
+        Raises:
+            ValueError: 未知のフィールドが指定された場合
+        """
+        if not fields:
+            return None
+
+        paths = FIELD_PRESETS.get(fields.strip())
+        if paths is None:
+            paths = [path.strip() for path in fields.split(",") if path.strip()]
+
+        tree: Dict[str, Any] = {}
+        for path in paths:
+            keys = path.split(".")
+            if keys[0] not in FIELD_COLUMNS or not all(keys):
+                raise ValueError(f"Unknown field: {path}")
+
+            node = tree
+            for i, key in enumerate(keys):
+                if i == len(keys) - 1:
+                    # 親パスの指定はサブツリー全体を含む
+                    node[key] = None
+                    break
+                if key in node and node[key] is None:
+                    break
+                node = node.setdefault(key, {})
+
+        return tree or None
+
+    def load_options(self, tree: Dict[str, Any], extra_columns: Sequence = ()) -> List:
+        """指定フィールド（と extra_columns）に必要なカラムだけを読み込むクエリオプション"""
+        columns = [KanteiRecord.id, KanteiRecord.user_id, *extra_columns]
+        for name in tree:
+            columns.extend(FIELD_COLUMNS[name])
+        return [load_only(*columns)]
+
+    def _project(self, value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+        """値からツリーで指定されたサブツリーだけを取り出す"""
+        if tree is None:
+            return value
+        if isinstance(value, dict):
+            return {
+                key: self._project(value[key], subtree)
+                for key, subtree in tree.items()
+                if key in value
+            }
+        if isinstance(value, list):
+            return [self._project(item, tree) for item in value]
+        return value
+
+    def client_info(self, kantei_record: KanteiRecord) -> Dict[str, str]:
+        """レスポンスのクライアント情報（全エンドポイント・fields指定の有無で共通の形）"""
+        return {
+            "surname": kantei_record.client_surname,
+            "given_name": kantei_record.client_given_name,
+            "birth_date": kantei_record.client_birth_date
+        }
+
+    def _record_value(self, kantei_record: KanteiRecord, name: str) -> Any:
+        """鑑定記録からトップレベルフィールドの値を取得（必要なJSON列のみ解析）"""
+        if name == "client_info":
+            return self.client_info(kantei_record)
+        value = getattr(kantei_record, name)
+        if name in ("kyusei_result", "seimei_result", "combined_result"):
+            return json.loads(value) if value else None
+        return value
+
+    def serialize_fields(self, source: Dict[str, Any], tree: Dict[str, Any]) -> bytes:
+        """指定フィールドだけを抽出してからシリアライズ"""
+        return orjson.dumps({
+            name: self._project(source.get(name), subtree)
+            for name, subtree in tree.items()
+        })
+
+    def project_record(self, kantei_record: KanteiRecord, tree: Dict[str, Any]) -> Dict[str, Any]:
+        """鑑定記録から指定フィールドだけを取り出す"""
+        return {
+            name: self._project(self._record_value(kantei_record, name), subtree)
+            for name, subtree in tree.items()
+        }
+
+    def serialize_record_fields(self, kantei_record: KanteiRecord, tree: Dict[str, Any]) -> bytes:
+        """鑑定記録から指定フィールドだけをシリアライズ"""
+        return orjson.dumps(self.project_record(kantei_record, tree))
+
+    def build(self, kantei_record: KanteiRecord) -> KanteiResponse:
+        """鑑定記録からレスポンスモデルを作成"""
+        return KanteiResponse(
+            id=kantei_record.id,
+            client_info=self.client_info(kantei_record),
+            kyusei_result=json.loads(kantei_record.kyusei_result) if kantei_record.kyusei_result else None,
+            seimei_result=json.loads(kantei_record.seimei_result) if kantei_record.seimei_result else None,
+            combined_result=json.loads(kantei_record.combined_result) if kantei_record.combined_result else None,
+            kantei_comment=kantei_record.kantei_comment,
+            pdf_generated=kantei_record.pdf_generated,
+            pdf_path=kantei_record.pdf_path,
+            created_at=kantei_record.created_at
+        )
+
+    def serialize(self, response: KanteiResponse) -> bytes:
+        """レスポンスモデルをJSONバイト列に変換（orjson使用）"""
+        return orjson.dumps(response.model_dump())
+
+    def refresh(self, kantei_record: KanteiRecord, response: Optional[KanteiResponse] = None) -> bytes:
+        """保存済みレスポンスを再生成（作成時・コメント/PDF状態の変更時に呼び出す）
+
+        コミットは呼び出し側のトランザクションで行う。
+        """
+        body = self.serialize(response or self.build(kantei_record))
+        kantei_record.response_body = body
+        return body
+
+
+# シングルトンインスタンス
+kantei_response_serializer = KanteiResponseSerializer()
@@ -0,0 +1,181 @@
+"""
+ユーザー別鑑定件数カウンターサービス
+履歴一覧の総数を COUNT(*) ではなくカウンターテーブルから返す
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import KanteiRecord, EmailHistory, KanteiUserStats
+
+logger = logging.getLogger(__name__)
+
+# カウンター名 → カラムの対応
+COUNTER_COLUMNS = {
+    "total_records": KanteiUserStats.total_records,
+    "pdf_generated_count": KanteiUserStats.pdf_generated_count,
+    "email_sent_count": KanteiUserStats.email_sent_count,
+}
+
+
+class KanteiStatsService:
+    """ユーザー別鑑定件数カウンター管理クラス"""
+
+    def increment(
+        self,
+        db: Session,
+        user_id: int,
+        total_records: int = 0,
+        pdf_generated_count: int = 0,
+        email_sent_count: int = 0
+    ) -> None:
+        """カウンターを加算（コミットは呼び出し側のトランザクションで行う）
+
+        呼び出し前に対象の書き込みを db.add() しておくこと。
+        カウンター行が未作成の場合は実テーブルから集計して作成するため、
+        今回の書き込み分も集計結果に含まれる。
+        """
+        deltas = {
+            "total_records": total_records,
+            "pdf_generated_count": pdf_generated_count,
+            "email_sent_count": email_sent_count,
+        }
+        values = {
+            COUNTER_COLUMNS[name]: COUNTER_COLUMNS[name] + delta
+            for name, delta in deltas.items()
+            if delta
+        }
+        if not values:
+            return
+
+        # UPDATE ... SET col = col + n で行ロック内に加算（同時更新でも欠落しない）
+        updated = db.query(KanteiUserStats).filter(
+            KanteiUserStats.user_id == user_id
+        ).update(values, synchronize_session=False)
+
+        if updated:
+            return
+
+        # 初回: 今回の書き込みをflushしてから実数で初期化
+        db.flush()
+        try:
+            with db.begin_nested():
+                db.add(KanteiUserStats(user_id=user_id, **self._count_from_source(db, user_id)))
+        except IntegrityError:
+            # 同時に別リクエストが作成した場合は加算にフォールバック
+            db.query(KanteiUserStats).filter(
+                KanteiUserStats.user_id == user_id
+            ).update(values, synchronize_session=False)
+
+    def get_stats(self, db: Session, user_id: int) -> KanteiUserStats:
+        """カウンター行を取得（未作成なら実テーブルから作成）"""
+        stats = db.get(KanteiUserStats, user_id)
+        if stats is not None:
+            return stats
+
+        stats = KanteiUserStats(user_id=user_id, **self._count_from_source(db, user_id))
+        stats.reconciled_at = datetime.now(timezone.utc)
+        try:
+            db.add(stats)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            stats = db.get(KanteiUserStats, user_id)
+        return stats
+
+    def get_total(self, db: Session, user_id: int) -> int:
+        """鑑定記録の総数を取得"""
+        return self.get_stats(db, user_id).total_records or 0
+
+    def _count_from_source(self, db: Session, user_id: int) -> Dict[str, int]:
+        """実テーブルからユーザー1人分のカウンター値を集計"""
+        counts = self._aggregate(db, user_id)
+        return counts.get(user_id, self._empty_counts())
+
+    def _empty_counts(self) -> Dict[str, int]:
+        return {name: 0 for name in COUNTER_COLUMNS}
+
+    def _aggregate(self, db: Session, user_id: Optional[int] = None) -> Dict[int, Dict[str, int]]:
+        """実テーブルからユーザー別のカウンター値を集計"""
+        record_query = db.query(
+            KanteiRecord.user_id,
+            func.count(KanteiRecord.id),
+            func.count(KanteiRecord.id).filter(KanteiRecord.pdf_generated.is_(True))
+        )
+        email_query = db.query(
+            KanteiRecord.user_id,
+            func.count(EmailHistory.id)
+        ).join(
+            EmailHistory, EmailHistory.kantei_record_id == KanteiRecord.id
+        ).filter(EmailHistory.status == "sent")
+
+        if user_id is not None:
+            record_query = record_query.filter(KanteiRecord.user_id == user_id)
+            email_query = email_query.filter(KanteiRecord.user_id == user_id)
+
+        counts: Dict[int, Dict[str, int]] = {}
+        for row_user_id, total, pdf_count in record_query.group_by(KanteiRecord.user_id):
+            entry = counts.setdefault(row_user_id, self._empty_counts())
+            entry["total_records"] = total
+            entry["pdf_generated_count"] = pdf_count
+
+        for row_user_id, email_count in email_query.group_by(KanteiRecord.user_id):
+            entry = counts.setdefault(row_user_id, self._empty_counts())
+            entry["email_sent_count"] = email_count
+
+        return counts
+
+    def reconcile(self, db: Session, user_id: Optional[int] = None) -> int:
+        """カウンターのドリフトを実テーブルの集計値で修正
+
+        カウンター行をロックしてから集計する。集計中の加算はロック解放まで待たされ、
+        修正後の値に加算されるため欠落しない（先に集計すると、集計とロックの間の加算が上書きで失われる）。
+
+        Returns:
+            修正（または新規作成）したユーザー数
+        """
+        stats_query = db.query(KanteiUserStats)
+        if user_id is not None:
+            stats_query = stats_query.filter(KanteiUserStats.user_id == user_id)
+        existing = {stats.user_id: stats for stats in stats_query.order_by(KanteiUserStats.user_id).with_for_update()}
+
+        actual = self._aggregate(db, user_id)
+
+        now = datetime.now(timezone.utc)
+        fixed = 0
+        for target_user_id in set(actual) | set(existing):
+            expected = actual.get(target_user_id, self._empty_counts())
+            stats = existing.get(target_user_id)
+
+            if stats is None:
+                # 同時に加算側が作成した場合は、その時点の実数で作成済みのため何もしない
+                created = db.execute(insert(KanteiUserStats).values(
+                    user_id=target_user_id, reconciled_at=now, **expected
+                ).on_conflict_do_nothing(index_elements=["user_id"]).returning(KanteiUserStats.user_id))
+                if created.scalar() is not None:
+                    fixed += 1
+                continue
+
+            drift = {
+                name: value for name, value in expected.items()
+                if getattr(stats, name) != value
+            }
+            if drift:
+                logger.warning(f"Kantei stats drift fixed - user_id: {target_user_id}, {drift}")
+                for name, value in drift.items():
+                    setattr(stats, name, value)
+                fixed += 1
+            stats.reconciled_at = now
+
+        db.commit()
+        return fixed
+
+
+# シングルトンインスタンス
+kantei_stats_service = KanteiStatsService()
@@ -0,0 +1,204 @@
+"""
+ロゴ画像サービス
+アップロードされたロゴをストリーミングで保存し、PDF・Word・サムネイル用のサイズに正規化した派生画像を管理する
+"""
+
+import asyncio
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+from app.services.storage import ArtifactStorage, get_storage
+
+logger = logging.getLogger(__name__)
+
+# アップロード上限（2MB）
+MAX_LOGO_BYTES = 2 * 1024 * 1024
+
+# 派生画像の最大サイズ（px）。PDFは高さ20mm・Wordは幅2インチ程度を300dpiで印刷できるサイズ
+LOGO_VARIANTS: Dict[str, Tuple[int, int]] = {
+    "pdf": (960, 240),
+    "word": (600, 300),
+    "thumbnail": (128, 128),
+}
+
+
+class LogoTooLarge(Exception):
+    """ロゴ画像がサイズ上限を超えている"""
+
+
+class LogoVariant:
+    """デコード済みの派生画像（PNGバイト列とPIL画像）"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.image = Image.open(io.BytesIO(data))
+        self.image.load()
+        self.width, self.height = self.image.size
+
+
+class LogoService:
+    """ロゴ画像管理クラス
+
+    - アップロードはチャンク単位で一時ファイルに書き込み、上限を超えた時点で中断する（超過分はストレージに残らない）
+    - 元画像・派生画像はアップロード用ストレージに保存し、派生画像が元画像より古ければ作り直す
+    - デコード済みの派生画像は (ロゴパス, 更新日時, 種別) をキーにプロセス内で保持する
+    - 更新日時の問い合わせ（S3ではHEADリクエスト）は stat_ttl 秒間プロセス内で使い回す
+      （レンダリングワーカーでは使わない。親プロセスで確定した更新日時をジョブに渡す）
+    """
+
+    def __init__(self):
+        self.upload_dir = "uploaded_logos"
+        self.chunk_size = 64 * 1024
+        self.max_cache_entries = 64
+        self.stat_ttl = settings.logo_stat_ttl_seconds
+
+        self._cache: "OrderedDict[Tuple[str, float, str], LogoVariant]" = OrderedDict()
+        self._mtimes: Dict[str, Tuple[float, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def storage(self) -> ArtifactStorage:
+        """ロゴ画像の保存先（設定によりローカルディスクまたはS3互換ストレージ）"""
+        return get_storage(self.upload_dir)
+
+    async def save_upload(self, upload_file, filename: str) -> str:
+        """アップロードをストリーミングで保存してロケーターを返す（上限超過時は LogoTooLarge）"""
+        with tempfile.SpooledTemporaryFile(max_size=MAX_LOGO_BYTES) as spool:
+            size = 0
+            while True:
+                chunk = await upload_file.read(self.chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_LOGO_BYTES:
+                    raise LogoTooLarge(f"Logo exceeds {MAX_LOGO_BYTES} bytes")
+                spool.write(chunk)
+
+            spool.seek(0)
+            return await asyncio.to_thread(self.storage.save_stream, filename, spool)
+
+    def is_managed_path(self, logo_path: Optional[str]) -> bool:
+        """アップロード用ストレージ配下の成果物か（任意パスの読み込みを防ぐ）"""
+        return self.get_mtime(logo_path) is not None
+
+    def get_mtime(self, logo_path: Optional[str]) -> Optional[float]:
+        """アップロード済みロゴの更新日時（管理外・存在しない場合はNone）"""
+        if not self.storage.owns(logo_path):
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._mtimes.get(logo_path)
+        if cached is not None and now - cached[0] < self.stat_ttl:
+            return cached[1]
+
+        file_stat = self.storage.stat(logo_path)
+        mtime = file_stat["mtime"] if file_stat else None
+        with self._lock:
+            self._mtimes[logo_path] = (now, mtime)
+        return mtime
+
+    def variant_name(self, logo_path: str, variant: str) -> str:
+        name = os.path.splitext(os.path.basename(logo_path))[0]
+        return f"{name}_{variant}.png"
+
+    def _open_source(self, logo_path: str) -> Image.Image:
+        source = Image.open(io.BytesIO(self.storage.read(logo_path)))
+        source.load()
+        return source
+
+    def build_variants(self, logo_path: str) -> None:
+        """全種別の派生画像を作成（アップロード後にバックグラウンドで実行）"""
+        try:
+            with self._open_source(logo_path) as source:
+                for variant in LOGO_VARIANTS:
+                    self._write_variant(logo_path, variant, source)
+            logger.info(f"Logo variants created - {logo_path}")
+        except Exception as e:
+            logger.warning(f"Logo normalization failed - {logo_path}: {e}")
+
+    def _write_variant(self, logo_path: str, variant: str, source: Image.Image) -> bytes:
+        """派生画像を縮小・PNG化して保存"""
+        image = source.convert("RGBA") if source.mode in ("P", "LA", "RGBA") else source.convert("RGB")
+        image.thumbnail(LOGO_VARIANTS[variant], Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+        data = buffer.getvalue()
+
+        self.storage.save(self.variant_name(logo_path, variant), data)
+        return data
+
+    def get_variant(
+        self,
+        logo_path: Optional[str],
+        variant: str,
+        mtime: Optional[float] = None
+    ) -> Optional[LogoVariant]:
+        """デコード済みの派生画像を取得（未作成・古い場合はその場で作成。読めない場合はNone）
+
+        mtime を指定した場合はその更新日時のロゴとして扱い、ストレージに更新日時を問い合わせない。
+        """
+        if mtime is None:
+            mtime = self.get_mtime(logo_path)
+        elif not self.storage.owns(logo_path):
+            return None
+        if mtime is None:
+            return None
+
+        key = (logo_path, mtime, variant)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        try:
+            data = self._read_variant(logo_path, variant, mtime)
+            logo = LogoVariant(data)
+        except Exception as e:
+            logger.warning(f"Logo variant load error - {logo_path} ({variant}): {e}")
+            return None
+
+        with self._lock:
+            self._cache[key] = logo
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+        return logo
+
+    def _read_variant(self, logo_path: str, variant: str, mtime: float) -> bytes:
+        """保存済みの派生画像を読む（元画像より古ければ作り直す）"""
+        locator = self.storage.locate(self.variant_name(logo_path, variant))
+        variant_stat = self.storage.stat(locator)
+        if variant_stat is not None and variant_stat["mtime"] >= mtime:
+            try:
+                return self.storage.read(locator)
+            except Exception as e:
+                logger.warning(f"Logo variant read error - {locator}: {e}")
+
+        with self._open_source(logo_path) as source:
+            return self._write_variant(logo_path, variant, source)
+
+    def invalidate(self, logo_path: Optional[str] = None) -> None:
+        """デコード済みの派生画像・更新日時を破棄（logo_path指定時はそのロゴのみ）"""
+        with self._lock:
+            if logo_path is None:
+                self._cache.clear()
+                self._mtimes.clear()
+                return
+            self._mtimes.pop(logo_path, None)
+            for key in [key for key in self._cache if key[0] == logo_path]:
+                del self._cache[key]
+
+
+# シングルトンインスタンス
+logo_service = LogoService()
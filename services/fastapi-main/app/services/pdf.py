@@ -1,23 +1,77 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, mm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak, Flowable
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 from reportlab.lib.colors import black, blue, red, green, gray
+from reportlab.lib.utils import TimeStamp
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
+from reportlab import rl_config
 import os
 import io
+import asyncio
+import calendar
+import copy
+import hashlib
+import tempfile
+import threading
+import time
 import urllib.request
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, BinaryIO, Iterator
+from datetime import date, datetime, timedelta
 import logging
+from collections import OrderedDict
+import orjson
+from PIL import Image as PILImage
+from app.core.config import settings
 from .font_manager import font_manager
+from .logo import logo_service
+from .hoiban import hoiban_drawing
+from .storage import ArtifactStorage, get_storage, storage_for
+from .render_cache import render_cache, render_date
+from .wkhtmltopdf import wkhtmltopdf_runner
 
-# 日本語フォント設定（改良版）
-def setup_japanese_fonts():
-    """日本語フォントを設定（Noto Sans CJK JP使用）"""
+# 日本語フォント登録結果（プロセス内で一度だけ登録する）
+_font_setup_result: Optional[bool] = None
+_font_setup_lock = threading.Lock()
+
+# ストリームはASCII85でエンコードせずFlate圧縮のみで出力する（出力はバイナリのPDFのみで、7bit化は不要）
+# ReportLabはこの設定を文書ごとではなく出力時にグローバル設定から読むため、文書ごとに切り替えず起動時に1回だけ設定する
+rl_config.useA85 = 0
+
+# サイズ最適化モードでのロゴ画像の解像度（dpi）とJPEG品質
+OPTIMIZED_LOGO_DPI = 150
+OPTIMIZED_LOGO_JPEG_QUALITY = 85
+
+
+def setup_japanese_fonts() -> bool:
+    """日本語フォントを設定（プロセス内で一度だけ登録し、以降は登録結果を返す）
+
+    CJKフォントのTTF解析は重いため、2回目以降の呼び出しではフォントファイルを読まない。
+    """
+    global _font_setup_result
+
+    if _font_setup_result is not None:
+        return _font_setup_result
+
+    with _font_setup_lock:
+        if _font_setup_result is None:
+            _font_setup_result = _register_japanese_fonts()
+        return _font_setup_result
+
+
+def warm_up_fonts() -> bool:
+    """起動時のウォームアップ用フック（フォント登録とグリフ幅テーブルの読み込みを済ませる）"""
+    font_available = setup_japanese_fonts()
+    if font_available:
+        pdfmetrics.stringWidth("鑑定書", 'Japanese', 12)
+    return font_available
+
+
+def _register_japanese_fonts() -> bool:
+    """日本語フォントを登録（Noto Sans CJK JP使用）"""
     try:
         # フォントマネージャーから日本語フォントを取得
         font_path = font_manager.get_font_path("NotoSansCJK-Regular")
@@ -86,6 +140,123 @@ def setup_japanese_fonts():
         logging.error(f"Font setup error: {e}")
         return False
 
+
+# サイズ最適化モードの目標サイズ（標準的な鑑定書）
+PDF_SIZE_TARGET_BYTES = 200 * 1024
+
+# プロセス内に保持するコンパイル済みテンプレートの上限数
+TEMPLATE_CONTEXT_MAX_ENTRIES = 32
+
+
+class BookmarkFlowable(Flowable):
+    """描画位置にしおり（アウトライン）を追加する大きさ0のフローアブル"""
+
+    def __init__(self, key: str, title: str, level: int = 0):
+        super().__init__()
+        self.key = key
+        self.title = title
+        self.level = level
+        self.width = self.height = 0
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=self.level)
+
+
+class TemplateRenderContext:
+    """テンプレート設定からコンパイルしたレンダリングコンテキスト
+
+    スタイル・テーマ色・デコード済みロゴ・ヘッダー/フッター等の顧客に依存しない要素を保持する。
+    フローアブルはレイアウト時に状態を持つため、取り出す際は浅いコピーを返す
+    （Paragraphの解析済みテキストは共有される）。
+    """
+
+    def __init__(self, key: str, styles: Dict[str, ParagraphStyle], theme_colors: Dict[str, Any]):
+        self.key = key
+        self.styles = styles
+        self.theme_colors = theme_colors
+        self.logo: Optional[bytes] = None
+        self.header: List = []
+        self.custom_message: List = []
+        self.footer: List = []
+
+    @staticmethod
+    def _copy(elements: List) -> List:
+        return [copy.copy(element) for element in elements]
+
+    def header_elements(self) -> List:
+        return self._copy(self.header)
+
+    def custom_message_elements(self) -> List:
+        return self._copy(self.custom_message)
+
+    def footer_elements(self) -> List:
+        return self._copy(self.footer)
+
+
+class StaticForm(Flowable):
+    """テンプレート固有の静的な要素（ロゴ・事業者名・作成日・署名など）をまとめて描くフローアブル
+
+    中の要素の組版（折り返し・高さ）は本文幅ごとに一度だけ行い、浅いコピー間で共有する。
+    冊子（キャンバスに _static_forms がある場合）では初回だけフォームXObjectとして出力し、2件目以降はフォームを参照するだけにする。
+    1件だけの鑑定書ではフォームの辞書の分かえって大きくなるため、そのまま描画する。
+    """
+
+    def __init__(self, form_name: str, elements: List):
+        Flowable.__init__(self)
+        self.form_name = form_name
+        self.elements = elements
+        self._layouts: Dict[float, Any] = {}
+
+    def _lay_out(self, avail_width: float):
+        """各要素を本文幅で組み、(高さ, [(要素, 幅, y座標)]) を返す（フレームと同じく前後の余白を詰める）"""
+        placed = []
+        cursor = 0.0
+        prev_after = 0.0
+        for index, element in enumerate(self.elements):
+            element = copy.copy(element)
+            width, height = element.wrap(avail_width, A4[1])
+            if index:
+                cursor += max(element.getSpaceBefore() - prev_after, 0)
+            cursor += height
+            placed.append((element, width, cursor))
+            prev_after = element.getSpaceAfter()
+            cursor += prev_after
+
+        # 下端からの座標に直す
+        return cursor, [(element, width, cursor - top) for element, width, top in placed]
+
+    def wrap(self, availWidth, availHeight):
+        layout = self._layouts.get(availWidth)
+        if layout is None:
+            layout = self._layouts[availWidth] = self._lay_out(availWidth)
+        self.width = availWidth
+        self.height = layout[0]
+        return self.width, self.height
+
+    def _draw_elements(self, canv):
+        for element, width, y in self._layouts[self.width][1]:
+            element.drawOn(canv, 0, y, _sW=self.width - width)
+
+    def draw(self):
+        canv = self.canv
+        defined = getattr(canv, '_static_forms', None)
+        if defined is None:
+            self._draw_elements(canv)
+            return
+
+        if self.form_name not in defined:
+            canv.beginForm(self.form_name)
+            self._draw_elements(canv)
+            canv.endForm()
+            defined.add(self.form_name)
+
+        canv.doForm(self.form_name)
+
+
 class PDFGeneratorService:
     """PDF生成サービス（日本語対応版）"""
 
@@ -111,15 +282,39 @@ class PDFGeneratorService:
             'black': {'primary': black, 'secondary': gray}
         }
 
+        # 決定的出力モード（作成日時・文書IDを固定し、同一入力から同一バイト列を生成）
+        self.deterministic = settings.render_deterministic
+
+        # スタイル・コンパイル済みテンプレートのキャッシュ
+        self._styles_cache: Dict[str, Dict[str, ParagraphStyle]] = {}
+        self._template_contexts: "OrderedDict[str, TemplateRenderContext]" = OrderedDict()
+        self._template_context_lock = threading.Lock()
+        self._template_context_metrics = {"hits": 0, "misses": 0, "invalidations": 0}
+
         # フォント状態をログ出力
         logging.info(f"PDF service initialized - Font available: {self.font_available}, Font name: {self.font_name}")
 
+    def warm_up(self):
+        """起動時・ワーカー起動時のウォームアップ（フォント登録とスタイル作成を済ませる）"""
+        warm_up_fonts()
+        for color_theme in self.color_themes:
+            self.create_styles(color_theme)
+
     def ensure_output_dir(self):
         """出力ディレクトリを作成"""
         os.makedirs(self.output_dir, exist_ok=True)
 
+    @property
+    def storage(self) -> ArtifactStorage:
+        """生成したPDFの保存先（設定によりローカルディスクまたはS3互換ストレージ）"""
+        return get_storage(self.output_dir)
+
     def create_styles(self, color_theme: str = "blue") -> Dict[str, ParagraphStyle]:
-        """スタイルシートを作成"""
+        """スタイルシートを作成（テーマごとに一度だけ作成し、以降は同じものを返す）"""
+        cached = self._styles_cache.get(color_theme)
+        if cached is not None:
+            return cached
+
         styles = getSampleStyleSheet()
         theme_colors = self.color_themes.get(color_theme, self.color_themes['blue'])
 
@@ -170,48 +365,277 @@ class PDFGeneratorService:
             )
         }
 
+        self._styles_cache[color_theme] = custom_styles
         return custom_styles
 
+    def get_template_context(self, template_settings: Dict[str, Any], optimize: bool = False) -> TemplateRenderContext:
+        """テンプレート設定に対応するコンパイル済みコンテキストを取得（なければコンパイル）"""
+        key = self.template_context_key(template_settings, optimize)
+
+        with self._template_context_lock:
+            context = self._template_contexts.get(key)
+            if context is not None:
+                self._template_contexts.move_to_end(key)
+                self._template_context_metrics["hits"] += 1
+                return context
+
+        context = self._compile_template_context(key, template_settings, optimize)
+
+        with self._template_context_lock:
+            self._template_context_metrics["misses"] += 1
+            self._template_contexts[key] = context
+            while len(self._template_contexts) > TEMPLATE_CONTEXT_MAX_ENTRIES:
+                self._template_contexts.popitem(last=False)
+
+        return context
+
+    def template_context_key(self, template_settings: Dict[str, Any], optimize: bool = False) -> str:
+        """テンプレート設定のハッシュ（ロゴファイルの更新日時・作成日・最適化モードを含む）"""
+        body = orjson.dumps(
+            {
+                "template_settings": template_settings,
+                "optimize": optimize,
+                "logo_mtime": self._logo_mtime(template_settings),
+                "date": template_settings.get('document_date') or render_date(),
+                "font_name": self.font_name,
+            },
+            default=str,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        )
+        return hashlib.sha256(body).hexdigest()
+
+    def invalidate_template_contexts(self) -> int:
+        """このプロセスのコンパイル済みコンテキストを破棄
+
+        キーにテンプレート設定・ロゴの更新日時・作成日を含むため、設定やロゴの更新時に呼ぶ必要はない。
+        """
+        with self._template_context_lock:
+            count = len(self._template_contexts)
+            self._template_contexts.clear()
+            self._template_context_metrics["invalidations"] += 1
+        return count
+
+    def get_template_context_metrics(self) -> Dict[str, Any]:
+        """コンパイル済みコンテキストのメトリクス（このプロセス分）"""
+        return {
+            "entries": len(self._template_contexts),
+            **self._template_context_metrics,
+        }
+
+    def _compile_template_context(
+        self,
+        key: str,
+        template_settings: Dict[str, Any],
+        optimize: bool = False
+    ) -> TemplateRenderContext:
+        """顧客に依存しない要素を組み立てる"""
+        color_theme = template_settings.get('color_theme', 'blue')
+        context = TemplateRenderContext(
+            key,
+            self.create_styles(color_theme),
+            self.color_themes.get(color_theme, self.color_themes['blue'])
+        )
+        styles = context.styles
+
+        if template_settings.get('include_logo') and template_settings.get('logo_url'):
+            logo_mtime = self._logo_mtime(template_settings)
+            if logo_mtime is not None:
+                context.logo = self._load_logo(template_settings['logo_url'], optimize, logo_mtime)
+
+        # ヘッダー・タイトル（ロゴ・事業者名を含め、組版はテンプレートごとに1回。冊子ではフォームとして共有する）
+        header = self._create_header(template_settings, styles, logo=context.logo)
+        header.append(Paragraph("鑑定書", styles['title']))
+        header.append(Spacer(1, 20))
+        context.header = [StaticForm(f"header{key[:16]}", header)]
+
+        if template_settings.get('custom_message'):
+            context.custom_message = self._create_custom_message(template_settings['custom_message'], styles)
+
+        # フッター（作成日・署名。前の余白はページ境界で詰められるよう通常のフローアブルのまま）
+        spacer, *footer = self._create_footer(template_settings, styles)
+        context.footer = [spacer, StaticForm(f"footer{key[:16]}", footer)]
+        return context
+
+    def with_logo_mtime(self, template_settings: Dict[str, Any]) -> Dict[str, Any]:
+        """ロゴの更新日時を確定したテンプレート設定を返す（確定済みならそのまま返す）
+
+        レンダリングワーカーに渡す前に親プロセスで呼び、キャッシュキーとワーカーが埋め込むロゴを同じ更新日時から作る。
+        """
+        if 'logo_mtime' in template_settings:
+            return template_settings
+        return {**template_settings, 'logo_mtime': logo_service.get_mtime(template_settings.get('logo_url'))}
+
+    def _logo_mtime(self, template_settings: Dict[str, Any]) -> Optional[float]:
+        if 'logo_mtime' in template_settings:
+            return template_settings['logo_mtime']
+        return logo_service.get_mtime(template_settings.get('logo_url'))
+
+    def _load_logo(self, logo_url: str, optimize: bool = False, mtime: Optional[float] = None) -> Optional[bytes]:
+        """PDF用に縮小済みのロゴ画像データを取得（アップロード済みファイルのみ。読めない場合はNone）
+
+        optimize=True では表示サイズ（高さ20mm）に合わせて縮小し、JPEGで埋め込む。
+        """
+        variant = logo_service.get_variant(logo_url, "pdf", mtime=mtime)
+        if variant is None:
+            return None
+        if not optimize:
+            return variant.data
+
+        image = variant.image
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEGは透過を持てないため白背景に合成する
+            rgba = image.convert("RGBA")
+            image = PILImage.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            image = image.convert("RGB")
+
+        max_height = round(20 * OPTIMIZED_LOGO_DPI / 25.4)
+        if image.height > max_height:
+            image = image.resize(
+                (max(1, round(image.width * max_height / image.height)), max_height),
+                PILImage.LANCZOS
+            )
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=OPTIMIZED_LOGO_JPEG_QUALITY, optimize=True)
+        return buffer.getvalue()
+
     def generate_kantei_report(
         self,
         kantei_data: Dict[str, Any],
-        template_settings: Dict[str, Any]
+        template_settings: Dict[str, Any],
+        optimize: bool = False,
+        use_cache: bool = True
+    ) -> io.BytesIO:
+        """鑑定書PDFを生成（新版）
+
+        optimize=True でサイズ最適化モード（ロゴを表示解像度のJPEGで埋め込み、未使用の標準フォント参照を省く）。
+        ストリームはモードによらずFlate圧縮のみ（ASCII85エンコードなし）で出力する。
+        フォントはTTFontのサブセット埋め込みにより使用グリフのみが埋め込まれる。
+        同一入力の生成結果はレンダリングキャッシュから返す（use_cache=Falseで無効）。
+        """
+        if not use_cache:
+            return self._build_kantei_report(kantei_data, template_settings, optimize)
+
+        content = render_cache.get_or_render(
+            "pdf",
+            self.report_cache_inputs(kantei_data, template_settings, optimize),
+            lambda: self._build_kantei_report(kantei_data, template_settings, optimize).getvalue()
+        )
+        return io.BytesIO(content)
+
+    def report_cache_inputs(
+        self,
+        kantei_data: Dict[str, Any],
+        template_settings: Dict[str, Any],
+        optimize: bool = False
+    ) -> Dict[str, Any]:
+        """鑑定書PDFのキャッシュキーに含める入力"""
+        return {
+            "kantei_data": kantei_data,
+            "template_settings": template_settings,
+            "optimize": optimize,
+            "deterministic": self.deterministic,
+            "font_name": self.font_name,
+            "date": template_settings.get('document_date') or render_date(),
+            "logo_mtime": self._logo_mtime(template_settings),
+        }
+
+    def _build_kantei_report(
+        self,
+        kantei_data: Dict[str, Any],
+        template_settings: Dict[str, Any],
+        optimize: bool = False
     ) -> io.BytesIO:
-        """鑑定書PDFを生成（新版）"""
+        """鑑定書PDFを構築"""
 
         buffer = io.BytesIO()
 
         # PDF設定
-        doc = SimpleDocTemplate(
-            buffer,
+        doc = self._create_document(buffer, optimize)
+
+        # PDF生成
+        self._build_document(doc, self._build_report_story(kantei_data, template_settings, optimize))
+        buffer.seek(0)
+
+        if optimize and buffer.getbuffer().nbytes > PDF_SIZE_TARGET_BYTES:
+            logging.warning(f"Optimized PDF exceeds size target: {buffer.getbuffer().nbytes} bytes")
+
+        return buffer
+
+    def build_booklet(
+        self,
+        items: List[Dict[str, Any]],
+        template_settings: Dict[str, Any],
+        output_path: str,
+        optimize: bool = True
+    ) -> int:
+        """複数の鑑定書を1冊のPDFにまとめて保存（鑑定書ごとにしおりを付ける）
+
+        items は {"title": しおりの見出し, "kantei_data": 鑑定データ} のリスト。
+        1つの文書として組むため、フォントは1回だけ埋め込まれる。ページ数を返す。
+        """
+        story: List = []
+        for index, item in enumerate(items):
+            if index:
+                story.append(PageBreak())
+            story.append(BookmarkFlowable(f"kantei-{index}", item["title"]))
+            story.extend(self._build_report_story(item["kantei_data"], template_settings, optimize))
+
+        tmp_path = f"{output_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                doc = self._create_document(f, optimize)
+                self._build_document(doc, story, share_static_forms=True)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return doc.page
+
+    def _create_document(self, output, optimize: bool) -> SimpleDocTemplate:
+        """鑑定書用のA4文書を作成"""
+        return SimpleDocTemplate(
+            output,
             pagesize=A4,
             rightMargin=20*mm,
             leftMargin=20*mm,
             topMargin=20*mm,
-            bottomMargin=20*mm
+            bottomMargin=20*mm,
+            **self._document_options(optimize)
         )
 
-        # スタイル取得
-        color_theme = template_settings.get('color_theme', 'blue')
-        styles = self.create_styles(color_theme)
+    def _build_report_story(
+        self,
+        kantei_data: Dict[str, Any],
+        template_settings: Dict[str, Any],
+        optimize: bool = False
+    ) -> List:
+        """鑑定書1件分のフローアブルを組み立てる"""
 
-        # コンテンツ構築
-        story = []
+        # コンパイル済みテンプレート（スタイル・ヘッダー・フッター等）
+        context = self.get_template_context(template_settings, optimize)
+        styles = context.styles
 
-        # ヘッダー（ロゴ・会社情報）
-        story.extend(self._create_header(template_settings, styles))
+        # コンテンツ構築（テンプレート部分はコンパイル済みの要素を使い、顧客ごとの内容のみ組み立てる）
+        story = []
 
-        # タイトル
-        story.append(Paragraph("鑑定書", styles['title']))
-        story.append(Spacer(1, 20))
+        # ヘッダー（ロゴ・会社情報）・タイトル
+        story.extend(context.header_elements())
 
         # クライアント情報
-        story.extend(self._create_client_info(kantei_data, styles))
+        story.extend(self._create_client_info(kantei_data.get('client_info', {}), styles))
 
         # 九星気学結果
         if kantei_data.get('kyusei_kigaku'):
             story.extend(self._create_kyusei_section(kantei_data['kyusei_kigaku'], styles))
 
+        # 方位盤（ベクター描画。クライアントが吉方位の結果を指定した場合のみ）
+        if kantei_data.get('kyusei_hoiban'):
+            story.extend(self._create_hoiban_section(kantei_data['kyusei_hoiban'], styles))
+
         # 姓名判断結果
         if kantei_data.get('seimei_handan'):
             story.extend(self._create_seimei_section(kantei_data['seimei_handan'], styles))
@@ -221,27 +645,72 @@ class PDFGeneratorService:
             story.extend(self._create_kichihoui_section(kantei_data['kichihoui'], styles))
 
         # カスタムメッセージ
-        if template_settings.get('custom_message'):
-            story.extend(self._create_custom_message(template_settings['custom_message'], styles))
+        story.extend(context.custom_message_elements())
 
         # 鑑定士コメント
         if kantei_data.get('kantei_comment'):
             story.extend(self._create_kantei_comment(kantei_data['kantei_comment'], styles))
 
         # フッター
-        story.extend(self._create_footer(template_settings, styles))
-
-        # PDF生成
-        doc.build(story)
-        buffer.seek(0)
-        return buffer
-
-    def _create_header(self, template_settings: Dict[str, Any], styles: Dict[str, ParagraphStyle]) -> List:
+        story.extend(context.footer_elements())
+
+        return story
+
+    def _document_options(self, optimize: bool) -> Dict[str, Any]:
+        """SimpleDocTemplateの出力オプション（サイズ最適化・決定的出力）"""
+        options: Dict[str, Any] = {}
+
+        if optimize and self.font_available:
+            # キャンバス初期フォント（Helvetica）の参照を出力しない
+            options['initialFontName'] = self.font_name
+
+        if self.deterministic:
+            # 文書IDを固定し、メタデータも入力に依存しない値にする（作成・更新日時は _build_document で生成日に固定）
+            options.update({
+                'invariant': 1,
+                'title': '鑑定書',
+                'creator': '運命織',
+            })
+
+        return options
+
+    def _build_document(self, doc: SimpleDocTemplate, story: List, share_static_forms: bool = False) -> None:
+        """文書を構築
+
+        決定的出力モードでは作成・更新日時を生成日の0時（UTC）に固定する。
+        share_static_forms を指定すると、ヘッダー・フッター（StaticForm）をフォームとして文書内で共有する（冊子用）。
+        """
+        timestamp = None
+        if self.deterministic:
+            timestamp = TimeStamp(invariant=1)
+            timestamp.t = calendar.timegm(date.fromisoformat(render_date()).timetuple())
+            timestamp.lt = time.gmtime(timestamp.t)
+            timestamp.YMDhms = tuple(timestamp.lt)[:6]
+
+        def make_canvas(*args, **kwargs) -> canvas.Canvas:
+            canv = canvas.Canvas(*args, **kwargs)
+            if timestamp is not None:
+                canv._doc._timeStamp = timestamp
+            if share_static_forms:
+                canv._static_forms = set()
+            return canv
+
+        doc.build(story, canvasmaker=make_canvas)
+
+    def _create_header(
+        self,
+        template_settings: Dict[str, Any],
+        styles: Dict[str, ParagraphStyle],
+        logo: Optional[bytes] = None
+    ) -> List:
         """ヘッダー部分を作成"""
         header_elements = []
 
-        # ロゴ画像
-        if template_settings.get('include_logo') and template_settings.get('logo_url'):
+        # ロゴ画像（高さ20mm・本文幅に収まるよう縦横比を保って縮小）
+        if logo is not None:
+            header_elements.append(Image(io.BytesIO(logo), width=170*mm, height=20*mm, kind='proportional'))
+            header_elements.append(Spacer(1, 10))
+        elif template_settings.get('include_logo') and template_settings.get('logo_url'):
             try:
                 # ロゴ画像の処理（実装を簡略化）
                 logo_text = f"ロゴ: {template_settings.get('business_name', '鑑定所')}"
@@ -257,13 +726,12 @@ class PDFGeneratorService:
 
         return header_elements
 
-    def _create_client_info(self, kantei_data: Dict[str, Any], styles: Dict[str, ParagraphStyle]) -> List:
+    def _create_client_info(self, client_info: Dict[str, Any], styles: Dict[str, ParagraphStyle]) -> List:
         """クライアント情報セクションを作成"""
         elements = []
 
         elements.append(Paragraph("■ お客様情報", styles['subtitle']))
 
-        client_info = kantei_data.get('client_info', {})
         info_data = [
             ['お名前', client_info.get('name', '')],
             ['生年月日', client_info.get('birth_date', '')],
@@ -315,6 +783,19 @@ class PDFGeneratorService:
         elements.append(Spacer(1, 15))
         return elements
 
+    def _create_hoiban_section(self, hoiban_data: Dict[str, Any], styles: Dict[str, ParagraphStyle]) -> List:
+        """方位盤セクションを作成（ラスタライズせずベクター図形として埋め込む）"""
+        elements = []
+
+        elements.append(Paragraph("■ 方位盤", styles['subtitle']))
+
+        drawing = hoiban_drawing(hoiban_data, 90 * mm, self.font_name)
+        drawing.hAlign = 'CENTER'
+        elements.append(drawing)
+        elements.append(Spacer(1, 15))
+
+        return elements
+
     def _create_seimei_section(self, seimei_data: Dict[str, Any], styles: Dict[str, ParagraphStyle]) -> List:
         """姓名判断セクションを作成"""
         elements = []
@@ -426,7 +907,7 @@ class PDFGeneratorService:
         elements.append(Spacer(1, 30))
 
         # 作成日
-        created_date = datetime.now().strftime('%Y年%m月%d日')
+        created_date = template_settings.get('document_date') or date.fromisoformat(render_date()).strftime('%Y年%m月%d日')
         elements.append(Paragraph(f"作成日: {created_date}", styles['small']))
 
         # 鑑定士署名
@@ -447,6 +928,15 @@ class PDFGeneratorService:
     ) -> str:
         """互換性のためのラッパーメソッド"""
 
+        # PDF生成
+        pdf_buffer = self.generate_kantei_report(kantei_data, self.build_template_settings(template_settings))
+
+        # ファイルに保存
+        return self.save_kantei_pdf(kantei_data, pdf_buffer.getvalue())
+
+    def build_template_settings(self, template_settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """デフォルト値を補完したテンプレート設定を作成"""
+
         # デフォルトテンプレート設定
         default_settings = {
             'business_name': '開運鑑定所',
@@ -460,75 +950,93 @@ class PDFGeneratorService:
         if template_settings:
             default_settings.update(template_settings)
 
-        # ファイル名生成
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        client_name = kantei_data.get("client_info", {}).get("name", "unknown")
-        filename = f"kantei_{client_name}_{timestamp}.pdf"
-        filepath = os.path.join(self.output_dir, filename)
+        return default_settings
 
-        # PDF生成
-        pdf_buffer = self.generate_kantei_report(kantei_data, default_settings)
-
-        # ファイルに保存
-        with open(filepath, 'wb') as f:
-            f.write(pdf_buffer.getvalue())
+    def save_kantei_pdf(self, kantei_data: Dict[str, Any], pdf_bytes: bytes) -> str:
+        """生成済みPDFをストレージに保存してロケーター（ローカルではファイルパス）を返す"""
+        return self.storage.save(self.make_pdf_filename(kantei_data), pdf_bytes)
 
-        return filepath
+    def make_pdf_filename(self, kantei_data: Dict[str, Any]) -> str:
+        """鑑定書PDFのファイル名を生成"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        client_name = kantei_data.get("client_info", {}).get("name", "unknown")
+        return f"kantei_{client_name}_{timestamp}.pdf"
+
+    def spool_pdf(self, pdf_bytes: bytes) -> BinaryIO:
+        """送信待ちのPDFを一時バッファに格納（一定サイズを超えるとディスクに退避）"""
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.pdf_spool_max_bytes)
+        spool.write(pdf_bytes)
+        spool.seek(0)
+        return spool
+
+    def iter_spooled_pdf(self, spool: BinaryIO) -> Iterator[bytes]:
+        """一時バッファのPDFをチャンク単位で読み出す（バッファは閉じない）"""
+        spool.seek(0)
+        while True:
+            chunk = spool.read(settings.pdf_stream_chunk_bytes)
+            if not chunk:
+                break
+            yield chunk
+
+    def persist_spooled_pdf(self, spool: BinaryIO, filename: str) -> Optional[str]:
+        """一時バッファのPDFをストレージに保存して閉じる（送信完了後のバックグラウンド処理用）"""
+        try:
+            spool.seek(0)
+            return self.storage.save_stream(filename, spool)
+        except Exception as e:
+            logging.error(f"Failed to persist streamed PDF {filename}: {e}")
+            return None
+        finally:
+            spool.close()
 
     def get_pdf_path(self, filename: str) -> str:
-        """PDFファイルのフルパスを取得"""
-        return os.path.join(self.output_dir, filename)
+        """PDFファイル名からロケーター（ローカルではファイルパス）を取得"""
+        return self.storage.locate(filename)
 
     def pdf_exists(self, filepath: str) -> bool:
         """PDFファイルが存在するかチェック"""
-        return os.path.exists(filepath)
+        return storage_for(filepath).exists(filepath)
 
     def get_pdf_info(self, filepath: str) -> Dict[str, Any]:
         """PDFファイルの情報を取得"""
-        if not os.path.exists(filepath):
-            return {"exists": False}
-
         try:
-            file_stat = os.stat(filepath)
-            return {
-                "exists": True,
-                "size": file_stat.st_size,
-                "created_at": datetime.fromtimestamp(file_stat.st_ctime),
-                "modified_at": datetime.fromtimestamp(file_stat.st_mtime),
-                "expires_at": datetime.fromtimestamp(file_stat.st_ctime) + timedelta(days=365)
-            }
+            file_stat = storage_for(filepath).stat(filepath)
         except Exception as e:
             return {"exists": False, "error": str(e)}
 
+        if file_stat is None:
+            return {"exists": False}
+
+        return {
+            "exists": True,
+            "size": file_stat["size"],
+            "created_at": file_stat["created_at"],
+            "modified_at": file_stat["modified_at"],
+            "expires_at": file_stat["created_at"] + timedelta(days=365)
+        }
+
+    def iter_pdf(self, filepath: str) -> Iterator[bytes]:
+        """PDFファイルをチャンク単位で読み出す"""
+        return storage_for(filepath).iter_chunks(filepath, settings.pdf_stream_chunk_bytes)
+
     def delete_pdf(self, filepath: str) -> bool:
         """PDFファイルを削除"""
         try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                return True
-            return False
+            return storage_for(filepath).delete(filepath)
         except Exception as e:
             print(f"PDF deletion error: {e}")
             return False
 
     def cleanup_old_pdfs(self, days_old: int = 30) -> int:
         """古いPDFファイルをクリーンアップ"""
-        if not os.path.exists(self.output_dir):
-            return 0
-
         deleted_count = 0
-        cutoff_time = datetime.now() - timedelta(days=days_old)
+        cutoff_time = (datetime.now() - timedelta(days=days_old)).timestamp()
 
         try:
-            for filename in os.listdir(self.output_dir):
-                if filename.endswith('.pdf'):
-                    filepath = os.path.join(self.output_dir, filename)
-                    file_stat = os.stat(filepath)
-                    file_time = datetime.fromtimestamp(file_stat.st_mtime)
-
-                    if file_time < cutoff_time:
-                        if self.delete_pdf(filepath):
-                            deleted_count += 1
+            for filepath, _size, mtime in list(self.storage.list()):
+                if filepath.endswith('.pdf') and mtime < cutoff_time:
+                    if self.delete_pdf(filepath):
+                        deleted_count += 1
 
         except Exception as e:
             print(f"PDF cleanup error: {e}")
@@ -537,20 +1045,16 @@ class PDFGeneratorService:
 
 
     async def generate_pdf_from_print_preview(self, kantei_id: int, preview_url: str) -> str:
-        """印刷プレビューからPDF生成 - シンプルアプローチ"""
-        import subprocess
-        import tempfile
-        from datetime import datetime
-
+        """印刷プレビューからPDF生成 - シンプルアプローチ（変換中もイベントループをブロックしない）"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         pdf_filename = f"kantei_{kantei_id}_{timestamp}_preview.pdf"
-        pdf_path = os.path.join(self.output_dir, pdf_filename)
+        fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
 
         try:
             # macOSのwkhtmltopdfを使用してHTML→PDF変換
             # インストール: brew install wkhtmltopdf
-            cmd = [
-                'wkhtmltopdf',
+            args = [
                 '--page-size', 'A4',
                 '--margin-top', '5mm',
                 '--margin-bottom', '15mm',
@@ -561,33 +1065,39 @@ class PDFGeneratorService:
                 pdf_path
             ]
 
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            await wkhtmltopdf_runner.convert(args)
 
-            if result.returncode == 0 and os.path.exists(pdf_path):
-                logging.info(f"PDF generated successfully from print preview: {pdf_path}")
-                return pdf_path
+            if os.path.getsize(pdf_path) > 0:
+                locator = await asyncio.to_thread(self._save_file, pdf_filename, pdf_path)
+                logging.info(f"PDF generated successfully from print preview: {locator}")
+                return locator
             else:
-                raise Exception(f"wkhtmltopdf failed: {result.stderr}")
+                raise Exception("wkhtmltopdf failed: output file was not created")
 
         except FileNotFoundError:
             # wkhtmltopdfが見つからない場合のフォールバック
             logging.warning("wkhtmltopdf not found, falling back to ReportLab PDF generation")
-            return self.generate_simple_fallback_pdf(kantei_id)
+            return await asyncio.to_thread(self.generate_simple_fallback_pdf, kantei_id)
         except Exception as e:
             logging.error(f"Error generating PDF from print preview: {e}")
-            return self.generate_simple_fallback_pdf(kantei_id)
+            return await asyncio.to_thread(self.generate_simple_fallback_pdf, kantei_id)
+        finally:
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)
+
+    def _save_file(self, name: str, path: str) -> str:
+        """ローカルの一時ファイルをストレージに保存してロケーターを返す"""
+        with open(path, 'rb') as f:
+            return self.storage.save_stream(name, f)
 
     def generate_simple_fallback_pdf(self, kantei_id: int) -> str:
         """フォールバック用の簡単なPDF生成（日本語フォント対応）"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         pdf_filename = f"kantei_{kantei_id}_{timestamp}_fallback.pdf"
-        pdf_path = os.path.join(self.output_dir, pdf_filename)
-
-        # 日本語フォントをセットアップ
-        setup_japanese_fonts()
+        buffer = io.BytesIO()
 
-        # 最小限のPDF生成
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4)
+        # 最小限のPDF生成（フォントは登録済みのものを使用）
+        doc = SimpleDocTemplate(buffer, pagesize=A4)
 
         # 日本語対応スタイルを作成
         styles = getSampleStyleSheet()
@@ -596,7 +1106,7 @@ class PDFGeneratorService:
         japanese_style = ParagraphStyle(
             'Japanese',
             parent=styles['Normal'],
-            fontName='Japanese',
+            fontName=self.font_name,
             fontSize=12,
             encoding='utf-8'
         )
@@ -604,7 +1114,7 @@ class PDFGeneratorService:
         japanese_title_style = ParagraphStyle(
             'JapaneseTitle',
             parent=styles['Title'],
-            fontName='Japanese',
+            fontName=self.bold_font_name,
             fontSize=16,
             encoding='utf-8'
         )
@@ -626,7 +1136,7 @@ class PDFGeneratorService:
 
         try:
             doc.build(story)
-            logging.info(f"Fallback PDF generated with Japanese fonts: {pdf_path}")
+            logging.info(f"Fallback PDF generated with Japanese fonts: {pdf_filename}")
         except Exception as e:
             logging.error(f"Error generating fallback PDF: {e}")
             # 最後の手段：英語のみでPDF生成
@@ -637,9 +1147,11 @@ class PDFGeneratorService:
                 Paragraph("PDF generation from print preview failed.", styles['Normal']),
                 Paragraph("Please use browser print function.", styles['Normal'])
             ]
+            buffer = io.BytesIO()
+            doc = SimpleDocTemplate(buffer, pagesize=A4)
             doc.build(story_fallback)
 
-        return pdf_path
+        return self.storage.save(pdf_filename, buffer.getvalue())
 
 
 # シングルトンインスタンス
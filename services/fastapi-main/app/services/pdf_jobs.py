@@ -0,0 +1,308 @@
+"""
+PDF非同期生成ジョブサービス
+PDF生成をDBに永続化したジョブとして受け付け、ワーカーが順次処理する（失敗時はバックオフ付きで再試行）
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import KanteiRecord, PDFJob
+from app.services.pdf import pdf_service
+from app.services.kantei_stats import kantei_stats_service
+from app.services.kantei_response import kantei_response_serializer
+from app.services.render_pool import render_pool, RenderPoolBusy
+from app.services.artifact_lifecycle import artifact_lifecycle_service
+
+logger = logging.getLogger(__name__)
+
+
+def build_pdf_data(kantei_record: KanteiRecord) -> Dict[str, Any]:
+    """鑑定記録からPDF生成用データを作成
+
+    方位盤（kyusei_hoiban）は含めない。鑑定記録に保存される九星気学の結果は本命星などの計算結果のみで、
+    方位盤に必要な年盤・方位ごとの星（吉方位APIの結果）は保存されないため。
+    方位盤はクライアントが /api/pdf/generate の kantei_data に指定した場合にのみ描画される。
+    """
+    return {
+        "client_info": {
+            "surname": kantei_record.client_surname,
+            "given_name": kantei_record.client_given_name,
+            "birth_date": kantei_record.client_birth_date,
+        },
+        "kyusei_kigaku": json.loads(kantei_record.kyusei_result) if kantei_record.kyusei_result else None,
+        "seimei_handan": json.loads(kantei_record.seimei_result) if kantei_record.seimei_result else None,
+        "combined_result": json.loads(kantei_record.combined_result) if kantei_record.combined_result else None,
+        "kantei_comment": kantei_record.kantei_comment
+    }
+
+
+class PDFJobService:
+    """PDF非同期生成ジョブ管理クラス
+
+    ジョブはDBに保存するため、プロセスの再起動をまたいで処理を継続できる。
+    ワーカーは SELECT ... FOR UPDATE SKIP LOCKED で1件ずつ取得するため、
+    APIプロセス内のワーカーと専用ワーカー（run_pdf_worker.py）を同時に動かしても重複しない。
+    """
+
+    def __init__(self):
+        self.workers = settings.pdf_job_workers
+        self.max_attempts = settings.pdf_job_max_attempts
+        self.retry_base = settings.pdf_job_retry_base_seconds
+        self.poll_interval = settings.pdf_job_poll_seconds
+        self.stale_after = timedelta(seconds=settings.pdf_job_stale_seconds)
+        # 待ち行列が満杯の場合の再投入間隔（試行回数には数えない）
+        self.busy_delay = timedelta(seconds=5)
+        self.stale_check_interval = 60.0
+        self._last_stale_check = 0.0
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def enqueue(
+        self,
+        db: Session,
+        kantei_record: KanteiRecord,
+        template_settings: Optional[Dict[str, Any]] = None,
+        user_id: Optional[int] = None,
+        optimize: bool = False
+    ) -> PDFJob:
+        """ジョブを登録してAPIプロセス内のワーカーを起こす"""
+        job = PDFJob(
+            user_id=user_id,
+            kantei_record_id=kantei_record.id,
+            template_settings=json.dumps(template_settings or {}, ensure_ascii=False),
+            optimize=optimize,
+            status="queued",
+            attempts=0,
+            max_attempts=self.max_attempts,
+            next_run_at=datetime.now(timezone.utc)
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        self.ensure_started()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+        logger.info(f"PDF job queued - job_id: {job.id}, kantei_id: {kantei_record.id}")
+        return job
+
+    def get_job(self, db: Session, job_id: int, user_id: Optional[int] = None) -> Optional[PDFJob]:
+        """ジョブを取得（user_id指定時は本人のジョブのみ）"""
+        query = db.query(PDFJob).filter(PDFJob.id == job_id)
+        if user_id is not None:
+            query = query.filter(PDFJob.user_id == user_id)
+        return query.first()
+
+    async def start(self) -> None:
+        """起動時の処理（停止時に実行中のまま残ったジョブを再投入してからワーカーを起動）"""
+        try:
+            await asyncio.to_thread(self.recover_stale)
+        except Exception as e:
+            # DBに接続できなくてもAPIは起動する（ワーカーのポーリング時にも再投入される）
+            logger.error(f"PDF job recovery error: {e}")
+        self.ensure_started()
+
+    def ensure_started(self) -> None:
+        """APIプロセス内のワーカーを起動（未起動の場合のみ）"""
+        if self.workers <= 0:
+            return
+
+        self._tasks = [task for task in self._tasks if not task.done()]
+        if self._tasks:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._wakeup = asyncio.Event()
+        self._tasks = [loop.create_task(self.run_worker()) for _ in range(self.workers)]
+        logger.info(f"PDF job workers started - workers: {self.workers}")
+
+    async def stop(self) -> None:
+        """APIプロセス内のワーカーを停止"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_worker(self) -> None:
+        """ジョブを1件ずつ取得して処理し続ける"""
+        while True:
+            try:
+                job_id = await asyncio.to_thread(self._claim_next)
+            except Exception as e:
+                logger.error(f"PDF job claim error: {e}")
+                job_id = None
+
+            if job_id is None:
+                await self._wait()
+                continue
+
+            await self._process(job_id)
+
+    async def _wait(self) -> None:
+        """新しいジョブの登録または次のポーリングまで待つ"""
+        if self._wakeup is None:
+            await asyncio.sleep(self.poll_interval)
+            return
+
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def _claim_next(self) -> Optional[int]:
+        """実行予定日時を過ぎたジョブを1件取得して実行中にする"""
+        db = SessionLocal()
+        try:
+            self._requeue_stale(db)
+
+            now = datetime.now(timezone.utc)
+            job = db.query(PDFJob).filter(
+                PDFJob.status == "queued",
+                PDFJob.next_run_at <= now
+            ).order_by(
+                PDFJob.next_run_at, PDFJob.id
+            ).with_for_update(skip_locked=True).first()
+
+            if job is None:
+                db.rollback()
+                return None
+
+            job.status = "running"
+            job.attempts += 1
+            job.started_at = now
+            db.commit()
+            return job.id
+
+        finally:
+            db.close()
+
+    def recover_stale(self) -> None:
+        """実行中のまま放置されたジョブを直ちに再投入（起動時に呼ぶ）"""
+        db = SessionLocal()
+        try:
+            self._requeue_stale(db, force=True)
+        finally:
+            db.close()
+
+    def _requeue_stale(self, db: Session, force: bool = False) -> None:
+        """実行中のまま放置されたジョブ（ワーカー停止など）を再投入（force=False では一定間隔でのみ実行）"""
+        if not force and time.monotonic() - self._last_stale_check < self.stale_check_interval:
+            return
+        self._last_stale_check = time.monotonic()
+
+        now = datetime.now(timezone.utc)
+        stale = db.query(PDFJob).filter(
+            PDFJob.status == "running",
+            PDFJob.started_at < now - self.stale_after
+        )
+        failed = stale.filter(PDFJob.attempts >= PDFJob.max_attempts).update({
+            PDFJob.status: "failed",
+            PDFJob.error: "Worker stopped while processing the job",
+            PDFJob.finished_at: now
+        }, synchronize_session=False)
+        requeued = stale.filter(PDFJob.attempts < PDFJob.max_attempts).update({
+            PDFJob.status: "queued",
+            PDFJob.next_run_at: now
+        }, synchronize_session=False)
+        db.commit()
+
+        if failed or requeued:
+            logger.warning(f"Stale PDF jobs recovered - requeued: {requeued}, failed: {failed}")
+
+    async def _process(self, job_id: int) -> None:
+        """ジョブを実行して結果を鑑定記録に反映"""
+        db = SessionLocal()
+        try:
+            job = db.get(PDFJob, job_id)
+            if job is None:
+                return
+
+            kantei_record = db.query(KanteiRecord).filter(
+                KanteiRecord.id == job.kantei_record_id
+            ).first()
+
+            if not kantei_record:
+                self._fail(db, job_id, "Kantei record not found", retry=False)
+                return
+
+            pdf_data = build_pdf_data(kantei_record)
+            template_settings = pdf_service.build_template_settings(json.loads(job.template_settings or "{}"))
+
+            pdf_bytes = await render_pool.render_pdf(pdf_data, template_settings, optimize=job.optimize)
+            pdf_path = await asyncio.to_thread(pdf_service.save_kantei_pdf, pdf_data, pdf_bytes)
+
+            # 鑑定記録の更新
+            newly_generated = not kantei_record.pdf_generated
+            kantei_record.pdf_path = pdf_path
+            kantei_record.pdf_generated = True
+            kantei_response_serializer.refresh(kantei_record)
+            if newly_generated:
+                kantei_stats_service.increment(db, kantei_record.user_id, pdf_generated_count=1)
+            artifact_lifecycle_service.register(
+                db, pdf_path, kantei_record_id=kantei_record.id, user_id=kantei_record.user_id,
+                content_hash=hashlib.sha256(pdf_bytes).hexdigest(), size_bytes=len(pdf_bytes)
+            )
+
+            job.status = "completed"
+            job.pdf_path = pdf_path
+            job.error = None
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+
+            logger.info(f"PDF job completed - job_id: {job_id}, path: {pdf_path}")
+
+        except RenderPoolBusy:
+            db.rollback()
+            self._postpone(db, job_id)
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"PDF job failed - job_id: {job_id}: {e}")
+            self._fail(db, job_id, str(e))
+
+        finally:
+            db.close()
+
+    def _postpone(self, db: Session, job_id: int) -> None:
+        """待ち行列が満杯のため後で再実行（試行回数を戻す）"""
+        job = db.get(PDFJob, job_id)
+        job.status = "queued"
+        job.attempts -= 1
+        job.next_run_at = datetime.now(timezone.utc) + self.busy_delay
+        db.commit()
+
+    def _fail(self, db: Session, job_id: int, error: str, retry: bool = True) -> None:
+        """失敗を記録し、試行回数が残っていればバックオフ後に再実行"""
+        job = db.get(PDFJob, job_id)
+        now = datetime.now(timezone.utc)
+
+        if retry and job.attempts < job.max_attempts:
+            delay = self.retry_base * (2 ** (job.attempts - 1))
+            job.status = "queued"
+            job.next_run_at = now + timedelta(seconds=delay)
+        else:
+            job.status = "failed"
+            job.finished_at = now
+
+        job.error = error[:1000]
+        db.commit()
+
+
+# シングルトンインスタンス
+pdf_job_service = PDFJobService()
@@ -0,0 +1,213 @@
+"""
+レンダリング成果物キャッシュサービス
+同一の入力データ・テンプレート設定で生成されるPDF・Word・方位盤PNGをディスクに保存して再利用する
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 保存先の相対パスはサービスのルートディレクトリ（起動時のカレントディレクトリではない）からの位置とする
+SERVICE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+# レンダラーのバージョン（出力内容が変わる変更を加えたら上げる）
+RENDERER_VERSIONS = {
+    "pdf": "9",
+    "docx": "2",
+    "hoiban_png": "3",
+}
+
+
+def _default(value: Any) -> Any:
+    """orjsonで直列化できない値をキー用に変換"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"sha256": hashlib.sha256(bytes(value)).hexdigest()}
+    return str(value)
+
+
+class RenderCache:
+    """レンダリング成果物のディスクキャッシュ
+
+    キーは種別・レンダラーバージョン・入力データの正規化JSONのハッシュ。
+    ディスクI/Oを行うため、非同期処理からは asyncio.to_thread 経由で呼び出す。
+    合計サイズが上限を超えたら最終利用日時（ヒット時に更新するmtime）の古い順に削除する。
+    複数のワーカープロセスで同じディレクトリを共有できるよう、書き込みは一時ファイル経由で置き換える。
+    """
+
+    def __init__(self):
+        self.enabled = settings.render_cache_enabled
+        self.cache_dir = os.path.normpath(os.path.join(SERVICE_ROOT, settings.render_cache_dir))
+        self.max_bytes = settings.render_cache_max_mb * 1024 * 1024
+        # 削除時はこの割合まで減らす（毎回の全体走査を避ける）
+        self.evict_ratio = 0.8
+
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    def make_key(self, kind: str, inputs: Any) -> str:
+        """入力データからキャッシュキーを作成"""
+        body = orjson.dumps(
+            [kind, RENDERER_VERSIONS[kind], inputs],
+            default=_default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        )
+        return hashlib.sha256(body).hexdigest()
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.cache_dir, kind, key[:2], key)
+
+    def get(self, kind: str, key: str) -> Optional[bytes]:
+        """キャッシュ済みの成果物を取得（ヒット時は最終利用日時を更新）"""
+        if not self.enabled:
+            return None
+
+        path = self._path(kind, key)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self._metrics["misses"] += 1
+            return None
+        except OSError as e:
+            self._metrics["errors"] += 1
+            logger.warning(f"Render cache read error - {path}: {e}")
+            return None
+
+        self._metrics["hits"] += 1
+        return content
+
+    def put(self, kind: str, key: str, content: bytes) -> None:
+        """成果物を保存（上限超過時は古いものから削除）"""
+        if not self.enabled:
+            return
+
+        path = self._path(kind, key)
+        try:
+            # 同じキーの上書きでは差分だけ合計サイズを増やす
+            try:
+                previous_size = os.stat(path).st_size
+            except FileNotFoundError:
+                previous_size = 0
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            self._metrics["errors"] += 1
+            logger.warning(f"Render cache write error - {path}: {e}")
+            return
+
+        self._metrics["stores"] += 1
+        with self._lock:
+            if self._size is None:
+                # プロセス内で最初の保存時のみディレクトリを走査し、以降は合計サイズを差分で更新する
+                self._size = self._scan_size()
+            else:
+                self._size += len(content) - previous_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def get_or_render(self, kind: str, inputs: Any, render: Callable[[], bytes]) -> bytes:
+        """キャッシュにあればそれを返し、なければ生成して保存"""
+        if not self.enabled:
+            return render()
+
+        key = self.make_key(kind, inputs)
+        content = self.get(kind, key)
+        if content is None:
+            content = render()
+            self.put(kind, key, content)
+        return content
+
+    def _entries(self):
+        """キャッシュファイルの一覧（パス, サイズ, 最終利用日時）"""
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _path, size, _mtime in self._entries())
+
+    def _evict(self) -> None:
+        """最終利用日時の古い順に削除して上限の一定割合まで減らす"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _path, size, _mtime in entries)
+        target = self.max_bytes * self.evict_ratio
+
+        for path, size, _mtime in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                self._metrics["evictions"] += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        self._size = total
+        logger.info(f"Render cache evicted - size: {total} bytes")
+
+    def clear(self) -> int:
+        """キャッシュを全削除（削除件数を返す）"""
+        deleted = 0
+        with self._lock:
+            for path, _size, _mtime in list(self._entries()):
+                try:
+                    os.remove(path)
+                    deleted += 1
+                except FileNotFoundError:
+                    pass
+            self._size = 0
+        return deleted
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """ヒット率などのメトリクス（このプロセス分）"""
+        lookups = self._metrics["hits"] + self._metrics["misses"]
+        return {
+            "enabled": self.enabled,
+            "max_bytes": self.max_bytes,
+            "size_bytes": self._size,
+            **self._metrics,
+            "hit_ratio": round(self._metrics["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+def render_date() -> str:
+    """生成日（PDFのフッター等に埋め込まれるため、キーに含めて日付が変わったら作り直す）"""
+    return date.today().isoformat()
+
+
+# シングルトンインスタンス
+render_cache = RenderCache()
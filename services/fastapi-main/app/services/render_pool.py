@@ -0,0 +1,316 @@
+"""
+レンダリングワーカープールサービス
+PDF・Word・方位盤PNGの生成（CPUバウンド）を常駐ワーカープロセスで実行し、イベントループをブロックしない
+"""
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.render_cache import render_cache
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPoolBusy(Exception):
+    """待ち行列が上限に達しているため受け付けられない"""
+
+
+class RenderTimeout(Exception):
+    """レンダリングが制限時間内に完了しなかった"""
+
+
+# ===== ワーカープロセス側の処理 =====
+# ProcessPoolExecutorへ渡すためモジュールレベルの関数として定義する
+
+def _init_worker() -> None:
+    """ワーカー起動時の初期化（フォント登録・スタイル作成を事前に済ませる）
+
+    一部の初期化に失敗してもワーカーは起動する（該当するジョブの実行時にエラーになる）。
+    initializerの例外はプール全体を停止させるため、ここで止めない。
+    """
+    try:
+        from app.services.pdf import pdf_service
+        pdf_service.warm_up()
+    except Exception as e:
+        logger.warning(f"Render worker PDF warm-up failed: {e}")
+
+    for module in ("app.services.word_generator", "app.services.svg_converter"):
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.warning(f"Render worker import failed - {module}: {e}")
+
+
+def _ping() -> bool:
+    """ワーカーの起動確認用（起動済みのワーカーを温めるために使う）"""
+    return True
+
+
+def _render_pdf(kantei_data: Dict[str, Any], template_settings: Dict[str, Any], optimize: bool) -> bytes:
+    """鑑定書PDFを生成してバイト列で返す"""
+    from app.services.pdf import pdf_service
+    return pdf_service.generate_kantei_report(
+        kantei_data, template_settings, optimize=optimize, use_cache=False
+    ).getvalue()
+
+
+def _render_booklet(
+    items: List[Dict[str, Any]],
+    template_settings: Dict[str, Any],
+    output_path: str,
+    optimize: bool
+) -> int:
+    """複数の鑑定書をまとめたPDFをファイルに出力（ページ数を返す）"""
+    from app.services.pdf import pdf_service
+    return pdf_service.build_booklet(items, template_settings, output_path, optimize=optimize)
+
+
+def _render_word(data: Dict[str, Any]) -> bytes:
+    """Word文書を生成"""
+    from app.services.word_generator import generate_word_document
+    return generate_word_document(data, use_cache=False)
+
+
+def _render_hoiban_png(hoiban_data: Dict[str, Any], variant: str, palette: bool) -> bytes:
+    """方位盤PNGを生成"""
+    from app.services.svg_converter import generate_hoiban_image
+    return generate_hoiban_image(hoiban_data, use_cache=False, variant=variant, palette=palette)
+
+
+# ===== 親プロセス側 =====
+
+class RenderPool:
+    """レンダリングワーカープール管理クラス
+
+    - 待ち行列は上限付き（実行中 + 待機中がworkers + queue_sizeを超えるとRenderPoolBusy）
+    - ジョブごとにタイムアウト（超過時はプールを作り直し、詰まったワーカーを停止する）
+    - ワーカーは一定件数のジョブを処理したら新しいプロセスに入れ替える
+    """
+
+    def __init__(self):
+        self.workers = settings.render_workers
+        self.queue_size = settings.render_queue_size
+        self.timeout = settings.render_timeout_seconds
+        self.max_jobs_per_worker = settings.render_max_jobs_per_worker
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._generation = 0
+        self._in_flight = 0
+
+        self._metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "restarts": 0,
+            "max_queue_depth": 0,
+            "total_seconds": 0.0,
+        }
+
+    @property
+    def capacity(self) -> int:
+        """同時に受け付けられるジョブ数（実行中 + 待機中）"""
+        return self.workers + self.queue_size
+
+    def start(self, warm: bool = True) -> None:
+        """プールを起動（warm=Trueなら全ワーカーを起動して初期化を済ませる）"""
+        if self._executor is not None:
+            return
+
+        # 子プロセスの入れ替えにはspawnが必要（forkは親のスレッド状態を引き継ぐため使わない）
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            max_tasks_per_child=self.max_jobs_per_worker
+        )
+        self._generation += 1
+        logger.info(f"Render pool started - workers: {self.workers}, queue: {self.queue_size}")
+
+        if warm:
+            futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+            for future in futures:
+                try:
+                    future.result(timeout=self.timeout)
+                except Exception as e:
+                    logger.warning(f"Render worker warm-up failed: {e}")
+
+    async def warm_up(self) -> None:
+        """プールを起動して全ワーカーの初期化を済ませる（APIプロセスの起動時用・イベントループをブロックしない）"""
+        self.start(warm=False)
+        futures = [asyncio.wrap_future(self._executor.submit(_ping)) for _ in range(self.workers)]
+        results = await asyncio.gather(
+            *(asyncio.wait_for(future, timeout=self.timeout) for future in futures),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning(f"Render worker warm-up failed: {result}")
+
+    def shutdown(self, wait: bool = True) -> None:
+        """プールを停止"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _restart(self, generation: int) -> None:
+        """プールを作り直す（同じ世代に対して重複実行しない）"""
+        if generation != self._generation or self._executor is None:
+            return
+
+        executor, self._executor = self._executor, None
+        self._metrics["restarts"] += 1
+        logger.warning("Render pool restarted - terminating stuck workers")
+
+        # 詰まったワーカーを含め旧プールのプロセスを停止
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        self.start(warm=False)
+
+    async def submit(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """ジョブをワーカーで実行して結果を返す
+
+        Raises:
+            RenderPoolBusy: 待ち行列が上限に達している場合
+            RenderTimeout: 制限時間内に完了しなかった場合
+        """
+        if self._in_flight >= self.capacity:
+            self._metrics["rejected"] += 1
+            raise RenderPoolBusy("Render queue is full")
+
+        self.start(warm=False)
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+
+        self._in_flight += 1
+        self._metrics["submitted"] += 1
+        self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], self.queue_depth)
+        started = time.monotonic()
+
+        try:
+            # タイムアウトによるプール再作成で中断された場合は1度だけ再投入する
+            for attempt in range(2):
+                generation = self._generation
+                future = asyncio.wrap_future(self._executor.submit(func, *args))
+                try:
+                    result = await asyncio.wait_for(future, timeout=max(deadline - time.monotonic(), 0.001))
+                except asyncio.TimeoutError:
+                    self._metrics["timeouts"] += 1
+                    self._restart(generation)
+                    raise RenderTimeout(f"Render job timed out after {timeout} seconds")
+                except BrokenProcessPool:
+                    self._restart(generation)
+                    if attempt == 0 and time.monotonic() < deadline:
+                        continue
+                    raise
+
+                self._metrics["completed"] += 1
+                return result
+
+        except Exception:
+            self._metrics["failed"] += 1
+            raise
+
+        finally:
+            self._in_flight -= 1
+            self._metrics["total_seconds"] += time.monotonic() - started
+
+    @property
+    def queue_depth(self) -> int:
+        """ワーカーの空きを待っているジョブ数"""
+        return max(self._in_flight - self.workers, 0)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """待ち行列・処理件数のメトリクス"""
+        finished = self._metrics["completed"] + self._metrics["failed"]
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "running": self._executor is not None,
+            **{name: value for name, value in self._metrics.items() if name != "total_seconds"},
+            "avg_seconds": round(self._metrics["total_seconds"] / finished, 3) if finished else 0.0,
+        }
+
+    async def render_pdf(
+        self,
+        kantei_data: Dict[str, Any],
+        template_settings: Dict[str, Any],
+        optimize: bool = False
+    ) -> bytes:
+        """鑑定書PDFを生成（optimize=Trueでサイズ最適化モード）"""
+        from app.services.pdf import pdf_service
+
+        # ロゴの更新日時はここで確定してワーカーに渡す（キーと埋め込むロゴを一致させる。問い合わせはイベントループ外）
+        template_settings = await asyncio.to_thread(pdf_service.with_logo_mtime, template_settings)
+        inputs = pdf_service.report_cache_inputs(kantei_data, template_settings, optimize)
+        return await self._submit_cached("pdf", inputs, _render_pdf, kantei_data, template_settings, optimize)
+
+    async def render_booklet(
+        self,
+        items: List[Dict[str, Any]],
+        template_settings: Dict[str, Any],
+        output_path: str,
+        optimize: bool = True
+    ) -> int:
+        """複数の鑑定書をまとめたPDFをファイルに出力（件数に応じて制限時間を延ばす）"""
+        from app.services.pdf import pdf_service
+
+        template_settings = await asyncio.to_thread(pdf_service.with_logo_mtime, template_settings)
+        timeout = self.timeout * max(1, len(items) / 10)
+        return await self.submit(_render_booklet, items, template_settings, output_path, optimize, timeout=timeout)
+
+    async def render_word(self, data: Dict[str, Any]) -> bytes:
+        """Word文書を生成"""
+        from app.services.word_generator import document_cache_inputs, with_document_date
+
+        data = with_document_date(data)
+        return await self._submit_cached("docx", document_cache_inputs(data), _render_word, data)
+
+    async def render_hoiban_png(
+        self,
+        hoiban_data: Dict[str, Any],
+        variant: str = "screen",
+        palette: bool = False
+    ) -> bytes:
+        """方位盤PNGを生成（種別: thumbnail / screen / print）"""
+        from app.services.svg_converter import HOIBAN_VARIANTS, hoiban_cache_inputs
+
+        if variant not in HOIBAN_VARIANTS:
+            raise ValueError(f"Unknown hoiban variant: {variant}")
+
+        return await self._submit_cached(
+            "hoiban_png",
+            hoiban_cache_inputs(hoiban_data, variant, palette),
+            _render_hoiban_png, hoiban_data, variant, palette
+        )
+
+    async def _submit_cached(self, kind: str, inputs: Any, func: Callable[..., bytes], *args: Any) -> bytes:
+        """レンダリングキャッシュにあればワーカーに投入せずに返す"""
+        if not render_cache.enabled:
+            return await self.submit(func, *args)
+
+        # キャッシュの読み書き・削除はディスクI/Oのためイベントループ外で行う
+        key = render_cache.make_key(kind, inputs)
+        content = await asyncio.to_thread(render_cache.get, kind, key)
+        if content is None:
+            content = await self.submit(func, *args)
+            await asyncio.to_thread(render_cache.put, kind, key, content)
+        return content
+
+
+# シングルトンインスタンス
+render_pool = RenderPool()
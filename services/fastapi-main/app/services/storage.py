@@ -0,0 +1,402 @@
+"""
+成果物ストレージサービス
+生成したPDF・Word文書・ロゴ画像の保存先を抽象化する（ローカルディスク / S3互換オブジェクトストレージ）
+
+保存時に返す「ロケーター」をDB（pdf_path, company_logo_path 等）に保存し、読み出し・削除に使う。
+- ローカル: ファイルパス（root/ab/cd/ファイル名 のようにファイル名のハッシュでサブディレクトリに分散）
+- S3: s3://バケット/プレフィックス/ab/cd/ファイル名
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from email.utils import formatdate
+from typing import Any, BinaryIO, Dict, Iterator, Mapping, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from app.core.config import settings
+from app.core.http_cache import (
+    PRIVATE_IMMUTABLE, PRIVATE_REVALIDATE, RangeNotSatisfiable,
+    content_etag, etag_matches, make_etag, not_modified_since, parse_range
+)
+
+logger = logging.getLogger(__name__)
+
+S3_SCHEME = "s3://"
+
+
+def shard_name(name: str) -> str:
+    """ファイル名のハッシュから2階層のサブディレクトリを付けた相対パスを作成"""
+    digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}/{name}"
+
+
+class ArtifactStorage:
+    """成果物ストレージの共通インターフェース"""
+
+    def locate(self, name: str) -> str:
+        """ファイル名からロケーターを求める"""
+        raise NotImplementedError
+
+    def owns(self, locator: Optional[str]) -> bool:
+        """このストレージ（保存先ルート）配下のロケーターか"""
+        raise NotImplementedError
+
+    def save(self, name: str, data: bytes) -> str:
+        """バイト列を保存してロケーターを返す"""
+        raise NotImplementedError
+
+    def save_stream(self, name: str, stream: BinaryIO) -> str:
+        """ファイルオブジェクトの内容を保存してロケーターを返す"""
+        raise NotImplementedError
+
+    def stat(self, locator: str) -> Optional[Dict[str, Any]]:
+        """サイズ・更新日時（存在しない場合はNone）"""
+        raise NotImplementedError
+
+    def exists(self, locator: str) -> bool:
+        return self.stat(locator) is not None
+
+    def iter_chunks(self, locator: str, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        """内容をチャンク単位で読み出す"""
+        raise NotImplementedError
+
+    def iter_range(self, locator: str, start: int, end: int, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        """指定範囲（start〜end、endを含む）をチャンク単位で読み出す"""
+        raise NotImplementedError
+
+    def read(self, locator: str) -> bytes:
+        return b"".join(self.iter_chunks(locator))
+
+    def delete(self, locator: str) -> bool:
+        """削除（存在しなかった場合はFalse）"""
+        raise NotImplementedError
+
+    def local_path(self, locator: str) -> Optional[str]:
+        """ローカルファイルとして読める場合はそのパス（FileResponse等で直接送信するため）"""
+        return None
+
+    def list(self) -> Iterator[Tuple[str, int, float]]:
+        """保存済みの成果物一覧（ロケーター, サイズ, 更新日時）"""
+        raise NotImplementedError
+
+
+class LocalStorage(ArtifactStorage):
+    """ローカルディスクのストレージ
+
+    ファイル名のハッシュで2階層のサブディレクトリに分散し、1ディレクトリのファイル数が増えすぎないようにする。
+    書き込みは一時ファイル経由で置き換える（読み出し中のファイルが途中の状態にならない）。
+    分散配置の導入前に root 直下へ保存されたファイルもそのまま読める。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.chunk_size = settings.pdf_stream_chunk_bytes
+
+    def locate(self, name: str) -> str:
+        path = os.path.join(self.root, *shard_name(name).split("/"))
+        if not os.path.exists(path):
+            legacy_path = os.path.join(self.root, name)
+            if os.path.isfile(legacy_path):
+                return legacy_path
+        return path
+
+    def owns(self, locator: Optional[str]) -> bool:
+        if not locator or locator.startswith(S3_SCHEME):
+            return False
+        root = os.path.realpath(self.root)
+        return os.path.realpath(locator).startswith(root + os.sep)
+
+    def save(self, name: str, data: bytes) -> str:
+        return self._write(name, lambda f: f.write(data))
+
+    def save_stream(self, name: str, stream: BinaryIO) -> str:
+        return self._write(name, lambda f: shutil.copyfileobj(stream, f, self.chunk_size))
+
+    def _write(self, name: str, write) -> str:
+        path = os.path.join(self.root, *shard_name(name).split("/"))
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def stat(self, locator: str) -> Optional[Dict[str, Any]]:
+        try:
+            file_stat = os.stat(locator)
+        except OSError:
+            return None
+        return {
+            "size": file_stat.st_size,
+            "created_at": datetime.fromtimestamp(file_stat.st_ctime),
+            "modified_at": datetime.fromtimestamp(file_stat.st_mtime),
+            "mtime": file_stat.st_mtime,
+        }
+
+    def iter_chunks(self, locator: str, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        chunk_size = chunk_size or self.chunk_size
+        with open(locator, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def iter_range(self, locator: str, start: int, end: int, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        chunk_size = chunk_size or self.chunk_size
+        with open(locator, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, locator: str) -> bool:
+        try:
+            os.remove(locator)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def local_path(self, locator: str) -> Optional[str]:
+        return locator
+
+    def list(self) -> Iterator[Tuple[str, int, float]]:
+        for directory, _dirs, files in os.walk(self.root):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    file_stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, file_stat.st_size, file_stat.st_mtime
+
+
+class S3Storage(ArtifactStorage):
+    """S3互換オブジェクトストレージ（AWS S3・MinIO等）
+
+    boto3 が必要（ローカルストレージのみ使う場合は不要）。
+    複数のAPIインスタンスから同じ成果物を参照できる。
+    """
+
+    def __init__(self, prefix: str):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("boto3 is required for the S3 storage backend") from e
+
+        self.bucket = settings.s3_bucket
+        self.prefix = "/".join(part for part in (settings.s3_prefix.strip("/"), prefix.strip("/")) if part)
+        self.chunk_size = settings.pdf_stream_chunk_bytes
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.s3_endpoint_url or None,
+            region_name=settings.s3_region or None,
+            aws_access_key_id=settings.s3_access_key_id or None,
+            aws_secret_access_key=settings.s3_secret_access_key or None
+        )
+
+    def _key(self, locator: str) -> str:
+        bucket_and_key = locator[len(S3_SCHEME):]
+        bucket, _, key = bucket_and_key.partition("/")
+        if bucket != self.bucket:
+            raise ValueError(f"Locator belongs to another bucket: {locator}")
+        return key
+
+    def _root(self) -> str:
+        return f"{S3_SCHEME}{self.bucket}/{self.prefix}/" if self.prefix else f"{S3_SCHEME}{self.bucket}/"
+
+    def locate(self, name: str) -> str:
+        return f"{self._root()}{shard_name(name)}"
+
+    def owns(self, locator: Optional[str]) -> bool:
+        return bool(locator) and locator.startswith(self._root())
+
+    def save(self, name: str, data: bytes) -> str:
+        locator = self.locate(name)
+        # PUTは完了するまで既存オブジェクトを置き換えない（原子的）
+        self.client.put_object(Bucket=self.bucket, Key=self._key(locator), Body=data)
+        return locator
+
+    def save_stream(self, name: str, stream: BinaryIO) -> str:
+        locator = self.locate(name)
+        self.client.upload_fileobj(stream, self.bucket, self._key(locator))
+        return locator
+
+    def stat(self, locator: str) -> Optional[Dict[str, Any]]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(locator))
+        except ClientError:
+            return None
+        modified_at = head["LastModified"].astimezone(timezone.utc).replace(tzinfo=None)
+        return {
+            "size": head["ContentLength"],
+            "created_at": modified_at,
+            "modified_at": modified_at,
+            "mtime": head["LastModified"].timestamp(),
+            "etag": head.get("ETag", "").strip('"'),
+        }
+
+    def iter_chunks(self, locator: str, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(locator))["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size or self.chunk_size)
+        finally:
+            body.close()
+
+    def iter_range(self, locator: str, start: int, end: int, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        body = self.client.get_object(
+            Bucket=self.bucket, Key=self._key(locator), Range=f"bytes={start}-{end}"
+        )["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size or self.chunk_size)
+        finally:
+            body.close()
+
+    def delete(self, locator: str) -> bool:
+        if not self.exists(locator):
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(locator))
+        return True
+
+    def list(self) -> Iterator[Tuple[str, int, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/" if self.prefix else ""):
+            for item in page.get("Contents", []):
+                yield f"{S3_SCHEME}{self.bucket}/{item['Key']}", item["Size"], item["LastModified"].timestamp()
+
+
+_storages: Dict[Tuple[str, str], ArtifactStorage] = {}
+
+
+def get_storage(root: str) -> ArtifactStorage:
+    """保存先ルート（generated_pdfs, uploaded_logos 等）のストレージを取得
+
+    ローカルでは root をディレクトリ、S3では root をキーのプレフィックスとして使う。
+    """
+    backend = settings.storage_backend
+    storage = _storages.get((backend, root))
+    if storage is None:
+        storage = S3Storage(root) if backend == "s3" else LocalStorage(root)
+        _storages[(backend, root)] = storage
+    return storage
+
+
+def storage_for(locator: str) -> ArtifactStorage:
+    """ロケーターを扱えるストレージを取得（バックエンド切り替え前に保存された成果物も扱う）
+
+    ロケーターは保存先を完全に表すため、読み出し・削除は保存先ルートに依存しない。
+    """
+    backend = "s3" if locator.startswith(S3_SCHEME) else "local"
+    storage = _storages.get((backend, ""))
+    if storage is None:
+        storage = S3Storage("") if backend == "s3" else LocalStorage("")
+        _storages[(backend, "")] = storage
+    return storage
+
+
+def artifact_response(
+    locator: str,
+    media_type: str,
+    filename: str,
+    request_headers: Optional[Mapping[str, str]] = None,
+    content_hash: Optional[str] = None,
+    immutable: bool = False
+) -> Response:
+    """成果物のダウンロードレスポンス
+
+    - ETag（インデックスに保存した内容のハッシュ。未登録の成果物はロケーター・サイズ・更新日時から生成）と
+      Last-Modified を付け、If-None-Match / If-Modified-Since が一致すれば304を返す
+    - 単一範囲の Range リクエストには206で該当部分のみを返す（If-Range が一致しない場合は全体）
+    - 全体はローカルならFileResponse、それ以外はチャンク単位のストリーミングで返す
+    - immutable: 内容のハッシュを含むURLでのアクセス（内容が変わればURLも変わる）
+    """
+    storage = storage_for(locator)
+    file_stat = storage.stat(locator)
+    if file_stat is None:
+        raise FileNotFoundError(locator)
+
+    size = file_stat["size"]
+    mtime = file_stat["mtime"]
+    etag = content_etag(content_hash) if content_hash else make_etag(locator, size, mtime)
+    request_headers = request_headers or {}
+
+    cache_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": PRIVATE_IMMUTABLE if immutable else PRIVATE_REVALIDATE,
+        "Vary": "Authorization",
+    }
+
+    # If-None-Match がある場合は If-Modified-Since より優先する
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    elif not_modified_since(request_headers.get("if-modified-since"), mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    headers = {
+        **cache_headers,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+    }
+
+    byte_range = None
+    if _if_range_matches(request_headers.get("if-range"), etag, mtime):
+        try:
+            byte_range = parse_range(request_headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**cache_headers, "Content-Range": f"bytes */{size}"}
+            )
+
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            storage.iter_range(locator, start, end),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers=headers
+        )
+
+    local_path = storage.local_path(locator)
+    if local_path is not None:
+        return FileResponse(path=local_path, media_type=media_type, filename=filename, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(storage.iter_chunks(locator), media_type=media_type, headers=headers)
+
+
+def _if_range_matches(if_range: Optional[str], etag: str, mtime: float) -> bool:
+    """If-Rangeヘッダーがない、または現在の版と一致するか（ETagは強い比較）"""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    return not_modified_since(if_range, mtime)
@@ -4,12 +4,63 @@ SVG→PNG変換サービス
 """
 
 import cairosvg
+import threading
+from collections import OrderedDict
 from io import BytesIO
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
+from PIL import Image, ImageDraw, ImageFont
+
+from app.services.font_manager import font_manager
+from app.services.hoiban import (
+    BOARD_SIZE, BOARD_CENTER, OUTER_RADIUS, CENTER_RADIUS, DIRECTION_RADIUS,
+    PRIMARY_COLOR, ACCENT_COLOR, PLATE_COLOR, LINE_COLOR, TEXT_COLOR,
+    DIRECTION_FONT_SIZE, STAR_FONT_SIZE, CENTER_FONT_SIZE,
+    center_star_name, direction_lines, direction_positions, star_labels
+)
+from app.services.render_cache import render_cache
+
 logger = logging.getLogger(__name__)
 
+# 方位盤の合成結果をプロセス内に保持する上限（1年間の盤面は数百種類程度・印刷用は1枚が大きいため容量でも制限）
+HOIBAN_MEMO_MAX_ENTRIES = 512
+HOIBAN_MEMO_MAX_BYTES = 32 * 1024 * 1024
+
+# 方位盤画像の種別ごとの1辺のピクセル数
+HOIBAN_VARIANTS: Dict[str, int] = {
+    "thumbnail": 160,  # 履歴一覧
+    "screen": 400,     # 画面プレビュー
+    "print": 1200,     # 印刷（4インチ幅・300dpi）
+}
+DEFAULT_HOIBAN_VARIANT = "screen"
+
+# 太字のフォントが使えない場合に縁取りで太字にする幅（文字サイズに対する比率）
+SYNTHETIC_BOLD_STROKE_RATIO = 1 / 24
+
+# パレット化（減色）する場合の色数（方位盤は使用色が少ないため劣化はほぼない）
+HOIBAN_PALETTE_COLORS = 64
+
+# (中央星, ((方位, 年盤星), ...)) — 方位盤の描画結果を決める入力
+BoardKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def hoiban_board_key(hoiban_data: Dict[str, Any]) -> BoardKey:
+    """方位盤の正規化したキー（描画に影響しない項目・方位の並び順の違いを除く）"""
+    order = list(direction_positions())
+    labels = sorted(star_labels(hoiban_data), key=lambda label: order.index(label[0]))
+    return center_star_name(hoiban_data), tuple(labels)
+
+
+def hoiban_variant_for(width_inches: float, dpi: int) -> str:
+    """指定幅・解像度を満たす最小の種別（満たすものがなければ最大の種別）"""
+    required = width_inches * dpi
+    variants = sorted(HOIBAN_VARIANTS.items(), key=lambda item: item[1])
+    for variant, size in variants:
+        if size >= required:
+            return variant
+    return variants[-1][0]
+
 
 class SVGConverter:
     """SVG→PNG変換クラス"""
@@ -41,95 +92,61 @@ class SVGConverter:
     def generate_hoiban_svg(self, hoiban_data: Dict[str, Any]) -> str:
         """方位盤SVGを生成"""
         try:
-            # 基本設定
-            size = 300
-            center = size // 2
-            radius = 120
-
-            # 方位と位置の対応
-            directions = {
-                '北': (center, center - radius),
-                '北東': (center + radius * 0.7, center - radius * 0.7),
-                '東': (center + radius, center),
-                '南東': (center + radius * 0.7, center + radius * 0.7),
-                '南': (center, center + radius),
-                '南西': (center - radius * 0.7, center + radius * 0.7),
-                '西': (center - radius, center),
-                '北西': (center - radius * 0.7, center - radius * 0.7)
-            }
+            center = BOARD_CENTER
+            center_star = center_star_name(hoiban_data)
+            positions = direction_positions()
 
-            # SVG開始
-            svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
-<svg width="{size}" height="{size}" xmlns="http://www.w3.org/2000/svg">
-    <defs>
-        <style>
-            .direction-text {{ font-family: 'Yu Gothic', Arial, sans-serif; font-size: 14px; text-anchor: middle; dominant-baseline: middle; }}
-            .star-text {{ font-family: 'Yu Gothic', Arial, sans-serif; font-size: 12px; text-anchor: middle; dominant-baseline: middle; fill: #1976d2; font-weight: bold; }}
-            .center-text {{ font-family: 'Yu Gothic', Arial, sans-serif; font-size: 16px; text-anchor: middle; dominant-baseline: middle; fill: #dc004e; font-weight: bold; }}
-        </style>
-    </defs>
+            parts = [self._svg_open(), self._base_plate_svg()]
 
-    <!-- 背景円 -->
-    <circle cx="{center}" cy="{center}" r="{radius + 20}" fill="#f5f5f5" stroke="#1976d2" stroke-width="2"/>
+            # 中央星
+            parts.append(f'    <text x="{center}" y="{center}" class="center-text">{center_star}</text>\n')
 
-    <!-- 中央円 -->
-    <circle cx="{center}" cy="{center}" r="30" fill="#ffffff" stroke="#1976d2" stroke-width="2"/>
-'''
+            # 8方位の年盤星
+            for direction, nenban_star in star_labels(hoiban_data):
+                x, y = positions[direction]
+                parts.append(
+                    f'    <circle cx="{x}" cy="{y}" r="{DIRECTION_RADIUS}" fill="#ffffff" stroke="{LINE_COLOR}" stroke-width="1"/>\n'
+                    f'    <text x="{x}" y="{y-8}" class="direction-text">{direction}</text>\n'
+                    f'    <text x="{x}" y="{y+8}" class="star-text">{nenban_star}</text>\n'
+                )
 
-            # 中央の星を追加
-            center_star = self._get_center_star(hoiban_data)
-            svg_content += f'''
-    <!-- 中央星 -->
-    <text x="{center}" y="{center}" class="center-text">{center_star}</text>
-'''
-
-            # 8方位の星を追加
-            houi_details = hoiban_data.get('houiDetails', [])
-            for detail in houi_details:
-                direction = detail.get('houi', '')
-                if direction in directions:
-                    x, y = directions[direction]
-
-                    # 年盤星
-                    nenban_star = detail.get('nenbanStar', '')
-
-                    # 方位圏
-                    svg_content += f'''
-    <!-- {direction} -->
-    <circle cx="{x}" cy="{y}" r="25" fill="#ffffff" stroke="#e0e0e0" stroke-width="1"/>
-    <text x="{x}" y="{y-8}" class="direction-text">{direction}</text>
-    <text x="{x}" y="{y+8}" class="star-text">{nenban_star}</text>
-'''
+            # 方位線（円・文字の上に描く）
+            parts.append(self._direction_lines_svg())
 
-            # 方位線を追加
-            svg_content += f'''
-    <!-- 方位線 -->
-    <line x1="{center}" y1="{center-radius-20}" x2="{center}" y2="{center+radius+20}" stroke="#e0e0e0" stroke-width="1"/>
-    <line x1="{center-radius-20}" y1="{center}" x2="{center+radius+20}" y2="{center}" stroke="#e0e0e0" stroke-width="1"/>
-    <line x1="{center-radius*0.7-14}" y1="{center-radius*0.7-14}" x2="{center+radius*0.7+14}" y2="{center+radius*0.7+14}" stroke="#e0e0e0" stroke-width="1"/>
-    <line x1="{center+radius*0.7+14}" y1="{center-radius*0.7-14}" x2="{center-radius*0.7-14}" y2="{center+radius*0.7+14}" stroke="#e0e0e0" stroke-width="1"/>
-'''
-
-            # SVG終了
-            svg_content += '''
-</svg>'''
-
-            return svg_content
+            parts.append('</svg>')
+            return "".join(parts)
 
         except Exception as e:
             logger.error(f"方位盤SVG生成エラー: {str(e)}")
             # フォールバック用シンプルSVG
             return self._generate_fallback_svg()
 
-    def _get_center_star(self, hoiban_data: Dict[str, Any]) -> str:
-        """中央の星を取得"""
-        try:
-            # nenbanから中央星を取得
-            nenban = hoiban_data.get('nenban', {})
-            center_qsei = nenban.get('centerQsei', {})
-            return center_qsei.get('name', '五黄土星')
-        except:
-            return '五黄土星'
+    def _svg_open(self) -> str:
+        return f'''<?xml version="1.0" encoding="UTF-8"?>
+<svg width="{BOARD_SIZE}" height="{BOARD_SIZE}" viewBox="0 0 {BOARD_SIZE} {BOARD_SIZE}" xmlns="http://www.w3.org/2000/svg">
+    <defs>
+        <style>
+            .direction-text {{ font-family: 'Yu Gothic', Arial, sans-serif; font-size: {DIRECTION_FONT_SIZE}px; text-anchor: middle; dominant-baseline: middle; }}
+            .star-text {{ font-family: 'Yu Gothic', Arial, sans-serif; font-size: {STAR_FONT_SIZE}px; text-anchor: middle; dominant-baseline: middle; fill: {PRIMARY_COLOR}; font-weight: bold; }}
+            .center-text {{ font-family: 'Yu Gothic', Arial, sans-serif; font-size: {CENTER_FONT_SIZE}px; text-anchor: middle; dominant-baseline: middle; fill: {ACCENT_COLOR}; font-weight: bold; }}
+        </style>
+    </defs>
+'''
+
+    def _base_plate_svg(self) -> str:
+        """盤面に依存しない背景円・中央円"""
+        center = BOARD_CENTER
+        return (
+            f'    <circle cx="{center}" cy="{center}" r="{OUTER_RADIUS}" fill="{PLATE_COLOR}" stroke="{PRIMARY_COLOR}" stroke-width="2"/>\n'
+            f'    <circle cx="{center}" cy="{center}" r="{CENTER_RADIUS}" fill="#ffffff" stroke="{PRIMARY_COLOR}" stroke-width="2"/>\n'
+        )
+
+    def _direction_lines_svg(self) -> str:
+        """方位線（盤面に依存しない）"""
+        return "".join(
+            f'    <line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" stroke="{LINE_COLOR}" stroke-width="1"/>\n'
+            for x1, y1, x2, y2 in direction_lines()
+        )
 
     def _generate_fallback_svg(self) -> str:
         """フォールバック用シンプル方位盤SVG"""
@@ -158,31 +175,230 @@ class SVGConverter:
     <line x1="{center-120}" y1="{center}" x2="{center+120}" y2="{center}" stroke="#e0e0e0" stroke-width="1"/>
 </svg>'''
 
-    def generate_hoiban_image(self, hoiban_data: Dict[str, Any]) -> bytes:
-        """方位盤画像を生成（SVG→PNG）"""
+    def generate_hoiban_image(
+        self,
+        hoiban_data: Dict[str, Any],
+        variant: str = DEFAULT_HOIBAN_VARIANT,
+        palette: bool = False
+    ) -> bytes:
+        """方位盤画像を生成（背景を合成済みのレイヤーから生成し、同じ盤面は再利用）"""
+        size = HOIBAN_VARIANTS[variant]
         try:
-            # SVG生成
-            svg_content = self.generate_hoiban_svg(hoiban_data)
-
-            # PNG変換
-            png_bytes = self.svg_to_png(svg_content, width=400, height=400)
-
-            return png_bytes
+            return hoiban_renderer.render_png(hoiban_data, size, palette=palette)
 
         except Exception as e:
             logger.error(f"方位盤画像生成エラー: {str(e)}")
             # エラー時はフォールバック画像
             fallback_svg = self._generate_fallback_svg()
-            return self.svg_to_png(fallback_svg, width=400, height=400)
+            return self.svg_to_png(fallback_svg, width=size, height=size)
 
 
-def generate_hoiban_image(hoiban_data: Dict[str, Any]) -> bytes:
-    """方位盤画像生成関数（外部API用）"""
-    converter = SVGConverter()
-    return converter.generate_hoiban_image(hoiban_data)
+class HoibanRenderer:
+    """方位盤のレイヤー合成レンダラー
+
+    - 背景レイヤー（背景円・中央円）・方位の円・方位線のレイヤーは盤面に依存しないため、サイズごとに一度だけラスタライズする
+    - 盤面ごとに描くのは中央星・方位名・年盤星の文字のみ（背景レイヤーに合成し、SVGと同じく最後に方位線を重ねる）
+    - 合成結果は正規化した (中央星, 方位ごとの年盤星) とサイズ・パレット化の有無をキーにプロセス内で保持する
+    - 日本語フォントが用意できない環境ではSVG全体をラスタライズする（従来の方法）
+    """
+
+    def __init__(self):
+        self.max_entries = HOIBAN_MEMO_MAX_ENTRIES
+        self.max_bytes = HOIBAN_MEMO_MAX_BYTES
+        self._plates: Dict[int, Image.Image] = {}
+        self._discs: Dict[int, Image.Image] = {}
+        self._lines: Dict[int, Image.Image] = {}
+        self._fonts: Dict[Tuple[int, bool], Tuple[Any, int]] = {}
+        self._boards: "OrderedDict[Tuple[BoardKey, int, bool], bytes]" = OrderedDict()
+        self._board_bytes = 0
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0}
+
+    def render_png(self, hoiban_data: Dict[str, Any], size: int = 400, palette: bool = False) -> bytes:
+        """方位盤PNGを取得（同じ盤面・サイズは合成済みの結果を返す）"""
+        key = (hoiban_board_key(hoiban_data), size, palette)
+
+        with self._lock:
+            png_bytes = self._boards.get(key)
+            if png_bytes is not None:
+                self._boards.move_to_end(key)
+                self._metrics["hits"] += 1
+                return png_bytes
+
+        image = self.render_image(key[0], size)
+        if palette:
+            image = image.quantize(colors=HOIBAN_PALETTE_COLORS)
+        buffer = BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+        png_bytes = buffer.getvalue()
+
+        with self._lock:
+            self._metrics["misses"] += 1
+            previous = self._boards.pop(key, None)
+            if previous is not None:
+                self._board_bytes -= len(previous)
+            self._boards[key] = png_bytes
+            self._board_bytes += len(png_bytes)
+            while len(self._boards) > self.max_entries or (self._board_bytes > self.max_bytes and len(self._boards) > 1):
+                _, evicted = self._boards.popitem(last=False)
+                self._board_bytes -= len(evicted)
+
+        return png_bytes
+
+    def render_image(self, board_key: BoardKey, size: int) -> Image.Image:
+        """正規化したキーの盤面を合成（RGB画像）"""
+        center_star, labels = board_key
+        fonts = self._get_fonts(size)
+        if fonts is None:
+            converter = SVGConverter()
+            svg_content = converter.generate_hoiban_svg({
+                "nenban": {"centerQsei": {"name": center_star}},
+                "houiDetails": [{"houi": direction, "nenbanStar": star} for direction, star in labels],
+            })
+            return Image.open(BytesIO(converter.svg_to_png(svg_content, size, size))).convert("RGB")
+
+        scale = size / BOARD_SIZE
+        image = self._get_plate(size).copy()
+        disc = self._get_disc(size)
+        positions = direction_positions()
+
+        # 方位の円
+        for direction, _ in labels:
+            x, y = positions[direction]
+            offset = (DIRECTION_RADIUS + 1) * scale
+            image.alpha_composite(disc, (round(x * scale - offset), round(y * scale - offset)))
+
+        # 文字
+        draw = ImageDraw.Draw(image)
+
+        def text(position: Tuple[float, float], label: str, name: str, color: str):
+            font, stroke = fonts[name]
+            draw.text(position, label, font=font, fill=color, anchor="mm", stroke_width=stroke, stroke_fill=color)
+
+        text((BOARD_CENTER * scale, BOARD_CENTER * scale), center_star, "center", ACCENT_COLOR)
+        for direction, star in labels:
+            x, y = positions[direction]
+            text((x * scale, (y - 8) * scale), direction, "direction", TEXT_COLOR)
+            if star:
+                text((x * scale, (y + 8) * scale), star, "star", PRIMARY_COLOR)
+
+        # 方位線（円・文字の上に重ねる）
+        image.alpha_composite(self._get_lines(size))
+
+        return image.convert("RGB")
+
+    def _get_plate(self, size: int) -> Image.Image:
+        """背景レイヤー（白背景・背景円・中央円）"""
+        plate = self._plates.get(size)
+        if plate is None:
+            converter = SVGConverter()
+            svg_content = converter._svg_open() + converter._base_plate_svg() + '</svg>'
+            plate = Image.open(BytesIO(converter.svg_to_png(svg_content, size, size))).convert("RGBA")
+            self._plates[size] = plate
+        return plate
+
+    def _get_disc(self, size: int) -> Image.Image:
+        """方位の円（透過背景）"""
+        disc = self._discs.get(size)
+        if disc is None:
+            extent = DIRECTION_RADIUS + 1
+            pixels = round(extent * 2 * size / BOARD_SIZE)
+            svg_content = (
+                f'<svg width="{extent * 2}" height="{extent * 2}" viewBox="{-extent} {-extent} {extent * 2} {extent * 2}" '
+                f'xmlns="http://www.w3.org/2000/svg">'
+                f'<circle cx="0" cy="0" r="{DIRECTION_RADIUS}" fill="#ffffff" stroke="{LINE_COLOR}" stroke-width="1"/></svg>'
+            )
+            png_bytes = cairosvg.svg2png(
+                bytestring=svg_content.encode('utf-8'), output_width=pixels, output_height=pixels
+            )
+            disc = Image.open(BytesIO(png_bytes)).convert("RGBA")
+            self._discs[size] = disc
+        return disc
+
+    def _get_lines(self, size: int) -> Image.Image:
+        """方位線のレイヤー（透過背景）"""
+        lines = self._lines.get(size)
+        if lines is None:
+            converter = SVGConverter()
+            svg_content = converter._svg_open() + converter._direction_lines_svg() + '</svg>'
+            png_bytes = cairosvg.svg2png(
+                bytestring=svg_content.encode('utf-8'), output_width=size, output_height=size
+            )
+            lines = Image.open(BytesIO(png_bytes)).convert("RGBA")
+            self._lines[size] = lines
+        return lines
+
+    def _get_fonts(self, size: int) -> Optional[Dict[str, Tuple[Any, int]]]:
+        """サイズに合わせた日本語フォントと太字にするための縁取り幅（用意できない場合はNone）"""
+        scale = size / BOARD_SIZE
+        try:
+            return {
+                "center": self._load_font(round(CENTER_FONT_SIZE * scale), bold=True),
+                "direction": self._load_font(round(DIRECTION_FONT_SIZE * scale), bold=False),
+                "star": self._load_font(round(STAR_FONT_SIZE * scale), bold=True),
+            }
+        except Exception as e:
+            logger.warning(f"方位盤フォント読み込み失敗: {str(e)} - SVG全体をラスタライズします")
+            return None
+
+    def _load_font(self, pixels: int, bold: bool) -> Tuple[Any, int]:
+        """フォントと縁取り幅（可変フォントの太字が使えない場合は縁取りで太字にする）"""
+        loaded = self._fonts.get((pixels, bold))
+        if loaded is None:
+            font_path = font_manager.get_font_path("NotoSansCJK-Regular")
+            if not font_path:
+                raise FileNotFoundError("NotoSansCJK-Regular")
+            font = ImageFont.truetype(font_path, pixels)
+            stroke = 0
+            if bold:
+                try:
+                    # 可変フォント（NotoSansCJKjp-VF）の太字のインスタンスを使う
+                    font.set_variation_by_name("Bold")
+                except Exception as e:
+                    stroke = max(1, round(pixels * SYNTHETIC_BOLD_STROKE_RATIO))
+                    logger.warning(f"方位盤の太字フォントを使用できません: {str(e)} - 縁取り（{stroke}px）で太字にします")
+            loaded = self._fonts[(pixels, bold)] = (font, stroke)
+        return loaded
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """合成結果のメトリクス（このプロセス分）"""
+        return {"entries": len(self._boards), "size_bytes": self._board_bytes, **self._metrics}
+
+
+# シングルトンインスタンス
+hoiban_renderer = HoibanRenderer()
+
+
+def generate_hoiban_image(
+    hoiban_data: Dict[str, Any],
+    use_cache: bool = True,
+    variant: str = DEFAULT_HOIBAN_VARIANT,
+    palette: bool = False
+) -> bytes:
+    """方位盤画像生成関数（外部API用・同一入力は種別ごとにレンダリングキャッシュから返す）"""
+    if variant not in HOIBAN_VARIANTS:
+        raise ValueError(f"Unknown hoiban variant: {variant}")
+
+    if not use_cache:
+        return SVGConverter().generate_hoiban_image(hoiban_data, variant, palette)
+
+    return render_cache.get_or_render(
+        "hoiban_png",
+        hoiban_cache_inputs(hoiban_data, variant, palette),
+        lambda: SVGConverter().generate_hoiban_image(hoiban_data, variant, palette)
+    )
+
+
+def hoiban_cache_inputs(
+    hoiban_data: Dict[str, Any],
+    variant: str = DEFAULT_HOIBAN_VARIANT,
+    palette: bool = False
+) -> Dict[str, Any]:
+    """方位盤画像のキャッシュキーに含める入力（正規化した盤面・種別・パレット化の有無）"""
+    return {"board": hoiban_board_key(hoiban_data), "variant": variant, "palette": palette}
 
 
 def svg_to_png_simple(svg_content: str, width: int = 400, height: int = 400) -> bytes:
     """シンプルSVG→PNG変換関数"""
     converter = SVGConverter()
-    return converter.svg_to_png(svg_content, width, height)
\ No newline at end of file
+    return converter.svg_to_png(svg_content, width, height)
@@ -0,0 +1,190 @@
+"""
+wkhtmltopdf実行サービス
+HTML→PDF変換をasyncioサブプロセスで実行し、同時実行数を制限する（イベントループをブロックしない）
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WkhtmltopdfError(Exception):
+    """wkhtmltopdfが異常終了した"""
+
+
+class WkhtmltopdfRunner:
+    """wkhtmltopdf実行管理クラス
+
+    - 同時実行数はセマフォで制限し、空きを待つ時間と変換時間をメトリクスとして記録する
+    - タイムアウト・リクエストのキャンセル時は子プロセスを強制終了する
+    - prelaunch > 0 の場合は --read-args-from-stdin で起動済みのプロセスを待機させておき、
+      変換時は引数を標準入力で渡して起動コストを省く（1プロセス1変換で使い捨て、使った分を補充）
+    """
+
+    def __init__(self):
+        self.binary = settings.wkhtmltopdf_path
+        self.concurrency = settings.wkhtmltopdf_concurrency
+        self.timeout = settings.wkhtmltopdf_timeout_seconds
+        self.prelaunch = settings.wkhtmltopdf_prelaunch
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._spares: List[asyncio.subprocess.Process] = []
+        self._refilling = False
+
+        self._waiting = 0
+        self._running = 0
+        self._metrics = {
+            "conversions": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "prelaunched_used": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "total_convert_seconds": 0.0,
+        }
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def convert(self, args: List[str], timeout: Optional[float] = None) -> None:
+        """wkhtmltopdfを引数付きで実行（完了まで待つ）
+
+        Raises:
+            FileNotFoundError: wkhtmltopdfがインストールされていない場合
+            WkhtmltopdfError: 異常終了した場合
+            asyncio.TimeoutError: 制限時間内に完了しなかった場合
+        """
+        timeout = timeout or self.timeout
+
+        # 同時実行数の空きを待つ
+        self._waiting += 1
+        wait_started = time.monotonic()
+        try:
+            await self._get_semaphore().acquire()
+        finally:
+            self._waiting -= 1
+
+        wait_seconds = time.monotonic() - wait_started
+        self._metrics["total_wait_seconds"] += wait_seconds
+        self._metrics["max_wait_seconds"] = max(self._metrics["max_wait_seconds"], wait_seconds)
+
+        self._running += 1
+        started = time.monotonic()
+        try:
+            process, stdin_input = await self._launch(args)
+            try:
+                _stdout, stderr = await asyncio.wait_for(process.communicate(stdin_input), timeout=timeout)
+            except asyncio.TimeoutError:
+                self._metrics["timeouts"] += 1
+                await self._kill(process)
+                raise
+            except asyncio.CancelledError:
+                # リクエストのキャンセル時も子プロセスを残さない
+                self._metrics["cancelled"] += 1
+                await self._kill(process)
+                raise
+
+            if process.returncode != 0:
+                self._metrics["failures"] += 1
+                raise WkhtmltopdfError(stderr.decode("utf-8", errors="replace").strip())
+
+            self._metrics["conversions"] += 1
+
+        finally:
+            self._running -= 1
+            self._metrics["total_convert_seconds"] += time.monotonic() - started
+            self._get_semaphore().release()
+
+    async def _launch(self, args: List[str]):
+        """変換用プロセスを取得（起動済みプロセスがあればそれを使う）"""
+        while self._spares:
+            process = self._spares.pop()
+            if process.returncode is None:
+                self._metrics["prelaunched_used"] += 1
+                self._schedule_refill()
+                return process, (self._format_args(args) + "\n").encode("utf-8")
+
+        self._schedule_refill()
+        process = await asyncio.create_subprocess_exec(
+            self.binary, *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        return process, None
+
+    def _format_args(self, args: List[str]) -> str:
+        """--read-args-from-stdin 用に引数を1行にまとめる（空白・バックスラッシュをエスケープ）"""
+        return " ".join(
+            arg.replace("\\", "\\\\").replace(" ", "\\ ")
+            for arg in args
+        )
+
+    def _schedule_refill(self) -> None:
+        """起動済みプロセスをバックグラウンドで補充"""
+        if self.prelaunch <= 0 or self._refilling:
+            return
+        self._refilling = True
+        asyncio.get_running_loop().create_task(self._refill())
+
+    async def _refill(self) -> None:
+        try:
+            self._spares = [process for process in self._spares if process.returncode is None]
+            while len(self._spares) < self.prelaunch:
+                process = await asyncio.create_subprocess_exec(
+                    self.binary, "--read-args-from-stdin",
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                self._spares.append(process)
+        except FileNotFoundError:
+            # 未インストール環境では補充しない
+            self.prelaunch = 0
+        except Exception as e:
+            logger.warning(f"wkhtmltopdf prelaunch failed: {e}")
+        finally:
+            self._refilling = False
+
+    async def _kill(self, process: asyncio.subprocess.Process) -> None:
+        """子プロセスを強制終了して回収"""
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+        await process.wait()
+
+    async def shutdown(self) -> None:
+        """待機中の起動済みプロセスを終了"""
+        spares, self._spares = self._spares, []
+        for process in spares:
+            await self._kill(process)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """待ち時間・変換時間のメトリクス"""
+        finished = self._metrics["conversions"] + self._metrics["failures"] + self._metrics["timeouts"]
+        started = finished + self._metrics["cancelled"]
+        return {
+            "concurrency": self.concurrency,
+            "waiting": self._waiting,
+            "running": self._running,
+            "prelaunched": len(self._spares),
+            **{
+                name: value for name, value in self._metrics.items()
+                if name not in ("total_wait_seconds", "total_convert_seconds")
+            },
+            "avg_wait_seconds": round(self._metrics["total_wait_seconds"] / started, 3) if started else 0.0,
+            "avg_convert_seconds": round(self._metrics["total_convert_seconds"] / started, 3) if started else 0.0,
+        }
+
+
+# シングルトンインスタンス
+wkhtmltopdf_runner = WkhtmltopdfRunner()
@@ -11,7 +11,14 @@ from docx.oxml import parse_xml
 from docx.oxml.ns import nsdecls
 from io import BytesIO
 from typing import Dict, Any, List, Optional
-from datetime import datetime
+from datetime import date, datetime, time
+import zipfile
+
+from app.core.config import settings
+from app.services.render_cache import render_cache, render_date
+
+# 方位盤画像の表示幅（インチ）
+HOIBAN_WIDTH_INCHES = 4
 
 
 class WordDocumentGenerator:
@@ -24,8 +31,13 @@ class WordDocumentGenerator:
     TEXT_DARK = RGBColor(66, 66, 66)            # #424242
     TEXT_GRAY = RGBColor(117, 117, 117)         # #757575
 
-    def __init__(self):
+    # 決定的出力モードで使用するzipエントリの固定日時（文書プロパティの日時は生成日）
+    ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+
+    def __init__(self, deterministic: bool = False):
         self.doc = Document()
+        # 同一入力から同一バイト列を生成するモード
+        self.deterministic = deterministic
         self._setup_document_styles()
 
     def _setup_document_styles(self):
@@ -91,7 +103,7 @@ class WordDocumentGenerator:
 
         return para
 
-    def create_client_info_table(self, form_data: Dict[str, Any]):
+    def create_client_info_table(self, form_data: Dict[str, Any], target_date: str):
         """基本情報テーブル作成"""
         table = self.doc.add_table(rows=2, cols=4)
         table.style = 'Table Grid'
@@ -108,7 +120,7 @@ class WordDocumentGenerator:
         cells[0].text = "生年月日:"
         cells[1].text = form_data.get('birthDate', '')
         cells[2].text = "鑑定日:"
-        cells[3].text = datetime.now().strftime('%Y年%m月%d日')
+        cells[3].text = target_date
 
         # テーブルスタイル設定
         for row in table.rows:
@@ -229,10 +241,20 @@ class WordDocumentGenerator:
 
         return table
 
+    def add_logo_image(self, image_bytes: bytes):
+        """ロゴ画像追加（Word用に縮小済みの画像を想定）"""
+        try:
+            self.doc.add_picture(BytesIO(image_bytes), height=Inches(0.6))
+            last_paragraph = self.doc.paragraphs[-1]
+            last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        except Exception:
+            # ロゴが読めない場合は省略
+            pass
+
     def add_hoiban_image(self, image_bytes: bytes):
         """方位盤画像追加"""
         try:
-            self.doc.add_picture(BytesIO(image_bytes), width=Inches(4))
+            self.doc.add_picture(BytesIO(image_bytes), width=Inches(HOIBAN_WIDTH_INCHES))
             # 中央揃え
             last_paragraph = self.doc.paragraphs[-1]
             last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -273,7 +295,11 @@ class WordDocumentGenerator:
     def generate_document(self, data: Dict[str, Any]) -> bytes:
         """Word文書生成メイン処理"""
         try:
+            target_date = document_date(data)
+
             # 1. ヘッダー
+            if data.get('logoImage'):
+                self.add_logo_image(data['logoImage'])
             self.add_header_with_divider("総合鑑定書", level=1)
             subtitle_para = self.doc.add_paragraph("九星気学・姓名判断による詳細鑑定")
             subtitle_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -284,7 +310,7 @@ class WordDocumentGenerator:
             subtitle_para.paragraph_format.space_after = Pt(16)
 
             # 2. 基本情報
-            self.create_client_info_table(data.get('formData', {}))
+            self.create_client_info_table(data.get('formData', {}), target_date)
             self.doc.add_paragraph()  # スペース
 
             # 3. 九星気学結果
@@ -354,19 +380,83 @@ class WordDocumentGenerator:
                     run.font.color.rgb = self.TEXT_DARK
 
             # 9. フッター
-            self.add_footer(data.get('targetDate', datetime.now().strftime('%Y年%m月%d日')))
+            self.add_footer(target_date)
 
             # Word文書をバイト列として返却
+            if self.deterministic:
+                self._fix_core_properties()
+
             buffer = BytesIO()
             self.doc.save(buffer)
             buffer.seek(0)
+
+            if self.deterministic:
+                return self._normalize_zip(buffer.getvalue())
             return buffer.getvalue()
 
         except Exception as e:
             raise Exception(f"Word文書生成エラー: {str(e)}")
 
-
-def generate_word_document(data: Dict[str, Any]) -> bytes:
-    """Word文書生成関数（外部API用）"""
-    generator = WordDocumentGenerator()
-    return generator.generate_document(data)
\ No newline at end of file
+    def _fix_core_properties(self):
+        """文書プロパティの日時（生成日の0時）・改訂番号を固定"""
+        timestamp = datetime.combine(date.fromisoformat(render_date()), time.min)
+        core_properties = self.doc.core_properties
+        core_properties.author = '運命織'
+        core_properties.last_modified_by = '運命織'
+        core_properties.created = timestamp
+        core_properties.modified = timestamp
+        core_properties.last_printed = timestamp
+        core_properties.revision = 1
+
+    def _normalize_zip(self, docx_bytes: bytes) -> bytes:
+        """zipエントリのタイムスタンプ・属性を固定して再パッケージ"""
+        output = BytesIO()
+        with zipfile.ZipFile(BytesIO(docx_bytes)) as source, \
+                zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+            for info in source.infolist():
+                entry = zipfile.ZipInfo(info.filename, date_time=self.ZIP_TIMESTAMP)
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                entry.external_attr = 0o644 << 16
+                target.writestr(entry, source.read(info.filename))
+        return output.getvalue()
+
+
+def generate_word_document(data: Dict[str, Any], use_cache: bool = True) -> bytes:
+    """Word文書生成関数（外部API用・同一入力はレンダリングキャッシュから返す）"""
+    deterministic = settings.render_deterministic
+    data = with_document_date(data)
+    if not use_cache:
+        return WordDocumentGenerator(deterministic).generate_document(data)
+
+    return render_cache.get_or_render(
+        "docx",
+        document_cache_inputs(data),
+        lambda: WordDocumentGenerator(deterministic).generate_document(data)
+    )
+
+
+def document_date(data: Dict[str, Any]) -> str:
+    """文書に記載する鑑定日（targetDate未指定時は生成日）"""
+    return data.get('targetDate') or date.fromisoformat(render_date()).strftime('%Y年%m月%d日')
+
+
+def with_document_date(data: Dict[str, Any]) -> Dict[str, Any]:
+    """鑑定日を確定したデータ（キャッシュキーの計算と生成の間に日付が変わっても内容とキーが一致する）"""
+    if data.get('targetDate'):
+        return data
+    return {**data, 'targetDate': document_date(data)}
+
+
+def hoiban_variant_for_docx() -> str:
+    """Word文書に埋め込む方位盤画像の種別（表示幅で設定の解像度を満たす最小のもの）"""
+    from app.services.svg_converter import hoiban_variant_for
+    return hoiban_variant_for(HOIBAN_WIDTH_INCHES, settings.docx_image_dpi)
+
+
+def document_cache_inputs(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Word文書のキャッシュキーに含める入力（鑑定日・フッターに記載される日付を含む）"""
+    return {
+        "data": data,
+        "deterministic": settings.render_deterministic,
+        "date": document_date(data),
+    }
\ No newline at end of file
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+鑑定件数カウンター照合スクリプト
+kantei_user_stats のドリフトを実テーブルの集計値で修正する（cron / Cloud Scheduler から定期実行）
+"""
+
+import argparse
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.services.kantei_stats import kantei_stats_service
+
+
+def reconcile_kantei_stats(user_id: int = None) -> int:
+    """カウンターを照合して修正件数を返す"""
+    db: Session = SessionLocal()
+
+    try:
+        fixed = kantei_stats_service.reconcile(db, user_id=user_id)
+        print(f"✅ カウンター照合完了 - 修正件数: {fixed}")
+        return fixed
+
+    except Exception as e:
+        print(f"❌ カウンター照合エラー: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="鑑定件数カウンター照合")
+    parser.add_argument("--user-id", type=int, default=None, help="対象ユーザーID（省略時は全ユーザー）")
+    args = parser.parse_args()
+
+    try:
+        reconcile_kantei_stats(args.user_id)
+    except Exception:
+        exit(1)
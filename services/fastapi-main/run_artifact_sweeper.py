@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+生成済みPDFのスイープ
+ストレージインデックスへの既存ファイルの登録（--backfill）と、容量上限に基づく削除を実行する
+"""
+
+import argparse
+import asyncio
+import logging
+from app.core.database import SessionLocal
+from app.services.artifact_lifecycle import artifact_lifecycle_service
+from app.services.pdf import pdf_service
+
+
+def backfill() -> None:
+    """インデックス未登録の既存PDFを登録"""
+    db = SessionLocal()
+    try:
+        registered = artifact_lifecycle_service.backfill(db, pdf_service.output_dir)
+        usage = artifact_lifecycle_service.get_usage(db)
+        print(f"✅ 既存PDFを登録 - {registered}件（合計 {usage['count']}件, {usage['size_bytes']} bytes）")
+    finally:
+        db.close()
+
+
+def sweep_until_done() -> None:
+    """上限以下になるまでスイープを繰り返す"""
+    total = 0
+    while True:
+        processed = artifact_lifecycle_service.sweep_once()
+        total += processed
+        if processed < artifact_lifecycle_service.batch_size:
+            break
+    print(f"✅ スイープ完了 - 処理件数: {total}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成済みPDFのスイープ")
+    parser.add_argument("--backfill", action="store_true", help="インデックス未登録の既存PDFを登録")
+    parser.add_argument("--daemon", action="store_true", help="常駐して一定間隔でスイープ")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.backfill:
+        backfill()
+
+    if args.daemon:
+        try:
+            asyncio.run(artifact_lifecycle_service.run_sweeper())
+        except KeyboardInterrupt:
+            print("スイープ停止")
+    else:
+        sweep_until_done()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+PDF生成ジョブワーカー
+pdf_jobs テーブルのジョブを処理する専用ワーカープロセス（APIプロセスとは別に常駐させる場合に使用）
+"""
+
+import argparse
+import asyncio
+import logging
+from app.services.pdf_jobs import pdf_job_service
+from app.services.render_pool import render_pool
+
+
+async def run_pdf_worker(workers: int) -> None:
+    """指定数のワーカーでジョブを処理し続ける"""
+    render_pool.start()
+    print(f"✅ PDF生成ジョブワーカー起動 - ワーカー数: {workers}")
+
+    try:
+        await asyncio.gather(*(pdf_job_service.run_worker() for _ in range(workers)))
+    finally:
+        render_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF生成ジョブワーカー")
+    parser.add_argument("--workers", type=int, default=2, help="同時に処理するジョブ数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        asyncio.run(run_pdf_worker(args.workers))
+    except KeyboardInterrupt:
+        print("PDF生成ジョブワーカー停止")
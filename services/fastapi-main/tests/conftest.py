@@ -0,0 +1,63 @@
+"""
+テスト共通設定
+データベースを使うテストは TEST_DATABASE_URL（テスト専用のPostgreSQL）を指定した場合のみ実行する
+"""
+
+import os
+import sys
+
+import pytest
+from dotenv import load_dotenv
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # アプリのエンジンをテスト用データベースに向ける（app のインポートより前に設定する）
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+# 環境変数を.env.localから読み込み
+load_dotenv('.env.local')
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(autouse=True)
+def render_cache_dir(tmp_path, monkeypatch):
+    """レンダリングキャッシュはテストごとの一時ディレクトリに書き込む（リポジトリ内に作らない）"""
+    from app.services.render_cache import render_cache
+
+    cache_dir = tmp_path / "render_cache"
+    monkeypatch.setattr(render_cache, "cache_dir", str(cache_dir))
+    monkeypatch.setattr(render_cache, "_size", None)
+    return cache_dir
+
+
+@pytest.fixture
+def db():
+    """テスト用データベースのセッション（テスト後に全テーブルを空にする）"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    from sqlalchemy import text
+    from app.core.database import SessionLocal, engine
+    from app.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        with engine.begin() as conn:
+            conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+
+@pytest.fixture
+def user(db):
+    """テスト用ユーザー"""
+    from app.models import User
+
+    test_user = User(email="test@example.com", hashed_password="x")
+    db.add(test_user)
+    db.commit()
+    return test_user
@@ -0,0 +1,178 @@
+"""
+生成済み成果物のライフサイクル管理のテスト（TEST_DATABASE_URL 指定時のみ実行）
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import GeneratedArtifact, KanteiRecord, KanteiUserStats
+from app.services.artifact_lifecycle import ArtifactLifecycleService
+from app.services.kantei_stats import kantei_stats_service
+
+
+class TestArtifactLifecycleService:
+    """作り直されたPDFの削除・容量超過時のLRU削除のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db, user, tmp_path):
+        self.db = db
+        self.user = user
+        self.tmp_path = tmp_path
+        self.service = ArtifactLifecycleService()
+        # バックグラウンドのスイープは起動しない
+        self.service.sweep_interval = 0
+        self.service.batch_size = 10
+
+    def write_file(self, name, size=100):
+        path = str(self.tmp_path / name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return path
+
+    def add_record(self, pdf_path=None):
+        record = KanteiRecord(
+            user_id=self.user.id,
+            client_surname="山田",
+            client_given_name="太郎",
+            client_birth_date="1990-01-01",
+            pdf_generated=pdf_path is not None,
+            pdf_path=pdf_path
+        )
+        self.db.add(record)
+        kantei_stats_service.increment(
+            self.db, self.user.id, total_records=1, pdf_generated_count=1 if pdf_path else 0
+        )
+        self.db.commit()
+        return record
+
+    def register(self, path, record=None, minutes_ago=0):
+        self.service.register(
+            self.db,
+            path,
+            kantei_record_id=record.id if record else None,
+            user_id=self.user.id,
+            accessed_at=datetime.now(timezone.utc) - timedelta(minutes=minutes_ago),
+            content_hash="0" * 64
+        )
+        self.db.commit()
+
+    def indexed_paths(self):
+        self.db.expire_all()
+        return sorted(path for (path,) in self.db.query(GeneratedArtifact.path))
+
+    def test_superseded_pdf_is_removed(self):
+        """鑑定記録のPDFが作り直されたら、参照されなくなった古いファイルを削除する"""
+        old_path = self.write_file("kantei_1_old.pdf")
+        new_path = self.write_file("kantei_1_new.pdf")
+        record = self.add_record(pdf_path=old_path)
+        self.register(old_path, record)
+
+        record.pdf_path = new_path
+        self.db.commit()
+        self.register(new_path, record)
+
+        self.service.sweep_once()
+
+        assert not os.path.exists(old_path)
+        assert os.path.exists(new_path)
+        assert self.indexed_paths() == [new_path]
+        assert self.service.get_metrics()["superseded_removed"] == 1
+
+    def test_shared_pdf_is_kept_without_owner(self):
+        """他の鑑定記録から参照されているPDFは削除せず、所有者なしとして残す"""
+        path = self.write_file("kantei_shared.pdf")
+        record = self.add_record(pdf_path=path)
+        self.register(path, record)
+        self.add_record(pdf_path=path)
+
+        record.pdf_path = None
+        self.db.commit()
+
+        self.service.sweep_once()
+
+        assert os.path.exists(path)
+        self.db.expire_all()
+        artifact = self.db.query(GeneratedArtifact).filter(GeneratedArtifact.path == path).one()
+        assert artifact.kantei_record_id is None
+
+    def test_lru_eviction_clears_records_and_stats(self):
+        """容量超過時は最終アクセス日時の古い順に削除し、参照する鑑定記録のPDF情報とカウンターを戻す"""
+        self.service.quota_bytes = 250
+        self.service.low_water_ratio = 0.6
+
+        paths = []
+        records = []
+        for i, minutes_ago in enumerate([30, 10, 20]):
+            path = self.write_file(f"kantei_{i}.pdf")
+            record = self.add_record(pdf_path=path)
+            self.register(path, record, minutes_ago=minutes_ago)
+            paths.append(path)
+            records.append(record)
+
+        self.service.sweep_once()
+
+        # 300 bytes > 250 → 150 bytes（上限の60%）以下になるまで、最終アクセスの古い kantei_0, kantei_2 の順に削除
+        assert not os.path.exists(paths[0])
+        assert not os.path.exists(paths[2])
+        assert os.path.exists(paths[1])
+        assert self.indexed_paths() == [paths[1]]
+
+        self.db.expire_all()
+        evicted = self.db.get(KanteiRecord, records[0].id)
+        assert evicted.pdf_generated is False
+        assert evicted.pdf_path is None
+        assert self.db.get(KanteiRecord, records[1].id).pdf_path == paths[1]
+        assert self.db.get(KanteiUserStats, self.user.id).pdf_generated_count == 1
+
+        metrics = self.service.get_metrics()
+        assert metrics["evicted"] == 2
+        assert metrics["evicted_bytes"] == 200
+
+    def test_within_quota_is_not_evicted(self):
+        """合計サイズが上限以内なら何も削除しない"""
+        self.service.quota_bytes = 1000
+        path = self.write_file("kantei_1.pdf")
+        self.register(path, self.add_record(pdf_path=path))
+
+        assert self.service.sweep_once() == 0
+        assert os.path.exists(path)
+
+    def test_sweeper_runs_off_event_loop(self, monkeypatch):
+        """スイープはイベントループのスレッド外で実行される"""
+        sweep_threads = []
+
+        def sweep_once():
+            sweep_threads.append(threading.get_ident())
+            raise asyncio.CancelledError()
+
+        monkeypatch.setattr(self.service, "sweep_once", sweep_once)
+
+        async def run():
+            with pytest.raises(asyncio.CancelledError):
+                await self.service.run_sweeper()
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+
+        assert sweep_threads and loop_thread not in sweep_threads
+
+    def test_register_with_known_size_skips_storage(self, monkeypatch):
+        """保存直後でハッシュとサイズが分かっていればストレージに問い合わせない"""
+        from app.services import artifact_lifecycle
+
+        def storage_for(path):
+            raise AssertionError("storage accessed")
+
+        monkeypatch.setattr(artifact_lifecycle, "storage_for", storage_for)
+
+        path = str(self.tmp_path / "kantei_saved.pdf")
+        self.service.register(self.db, path, user_id=self.user.id, content_hash="0" * 64, size_bytes=123)
+        self.db.commit()
+
+        self.db.expire_all()
+        artifact = self.db.query(GeneratedArtifact).filter(GeneratedArtifact.path == path).one()
+        assert artifact.size_bytes == 123
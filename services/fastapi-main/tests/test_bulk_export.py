@@ -0,0 +1,121 @@
+"""
+一括エクスポートサービスのテスト
+"""
+
+import asyncio
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+from dotenv import load_dotenv
+
+# 環境変数を.env.localから読み込み
+load_dotenv('.env.local')
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.bulk_export import BulkExportService
+from app.services.render_pool import render_pool
+
+
+class TestBulkExport:
+    """ZIPの逐次生成・冊子PDFの一時ファイルのテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        self.service = BulkExportService()
+        self.service.concurrency = 2
+        self.running = 0
+        self.max_running = 0
+        self.completed = []
+
+        async def render_one(kantei_id, template_settings, file_format):
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            try:
+                # 後のIDほど早く終わるようにして、完了順ではなくID順に格納されることを確かめる
+                await asyncio.sleep(0.05 / kantei_id)
+            finally:
+                self.running -= 1
+            self.completed.append(kantei_id)
+
+            if kantei_id == 3:
+                return f"{kantei_id}.{file_format}", None, "render error"
+            if kantei_id == 4:
+                # 生成中に削除された記録
+                return None
+            return f"{kantei_id}.{file_format}", f"content-{kantei_id}".encode(), None
+
+        monkeypatch.setattr(self.service, "_render_one", render_one)
+
+    def collect_zip(self, record_ids):
+        async def run():
+            return b"".join([chunk async for chunk in self.service.iter_zip(record_ids, {}, "pdf")])
+
+        return zipfile.ZipFile(io.BytesIO(asyncio.run(run())))
+
+    def test_zip_entries_are_in_id_order(self):
+        """生成の完了順に関係なくID順にZIPへ格納され、同時実行数は上限以内"""
+        archive = self.collect_zip([1, 2, 5, 6])
+
+        assert archive.namelist() == ["1.pdf", "2.pdf", "5.pdf", "6.pdf"]
+        assert archive.read("5.pdf") == b"content-5"
+        assert self.max_running == 2
+
+    def test_failures_are_listed_in_errors_txt(self):
+        """生成に失敗した鑑定書は errors.txt に記録され、削除済みの記録は省かれる"""
+        archive = self.collect_zip([1, 3, 4, 5])
+
+        assert archive.namelist() == ["1.pdf", "5.pdf", "errors.txt"]
+        assert archive.read("errors.txt").decode("utf-8") == "3.pdf: render error"
+
+    def test_disconnect_cancels_pending_renders(self):
+        """送信途中で中断された場合は生成中のジョブを取り消す"""
+        async def run():
+            stream = self.service.iter_zip([1, 2, 5, 6], {}, "pdf")
+            await stream.__anext__()
+            await stream.aclose()
+            # 取り消されていなければこの間に残りの生成が完了する
+            await asyncio.sleep(0.2)
+            return list(self.completed), self.running
+
+        completed, running = asyncio.run(run())
+
+        assert completed == [2, 1]
+        assert running == 0
+
+    def test_booklet_file_is_unlinked_before_streaming(self, monkeypatch):
+        """冊子PDFの一時ファイルは開いた時点でパスが削除され、送信されなくても残らない"""
+        paths = []
+
+        async def render_booklet(items, template_settings, output_path):
+            paths.append(output_path)
+            with open(output_path, "wb") as f:
+                f.write(b"%PDF-booklet")
+            return 3
+
+        monkeypatch.setattr(render_pool, "render_booklet", render_booklet)
+
+        booklet, page_count = asyncio.run(self.service.build_booklet([], {}))
+
+        assert page_count == 3
+        assert not os.path.exists(paths[0])
+        assert b"".join(self.service.iter_file(booklet)) == b"%PDF-booklet"
+        assert booklet.closed
+
+    def test_booklet_file_is_removed_on_failure(self, monkeypatch):
+        """冊子PDFの生成に失敗した場合も一時ファイルは削除される"""
+        paths = []
+
+        async def render_booklet(items, template_settings, output_path):
+            paths.append(output_path)
+            raise RuntimeError("render failed")
+
+        monkeypatch.setattr(render_pool, "render_booklet", render_booklet)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(self.service.build_booklet([], {}))
+
+        assert not os.path.exists(paths[0])
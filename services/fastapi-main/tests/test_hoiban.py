@@ -0,0 +1,148 @@
+"""
+方位盤描画のテスト
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# 環境変数を.env.localから読み込み
+load_dotenv('.env.local')
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from reportlab.graphics.shapes import Line, String
+
+from app.services.hoiban import (
+    BOARD_SIZE, DEFAULT_CENTER_STAR, center_star_name, direction_positions, hoiban_drawing, star_labels
+)
+
+
+def get_test_hoiban_data():
+    """テスト用方位盤データ"""
+    stars = ["一白", "二黒", "三碧", "四緑", "六白", "七赤", "八白", "九紫"]
+    return {
+        "nenban": {"centerQsei": {"name": "五黄土星"}},
+        "houiDetails": [
+            {"houi": direction, "nenbanStar": star}
+            for direction, star in zip(direction_positions(), stars)
+        ] + [{"houi": "中央", "nenbanStar": "五黄"}],
+    }
+
+
+def collect_strings(node):
+    """描画ツリーに含まれる文字列"""
+    if isinstance(node, String):
+        return [node.text]
+    texts = []
+    for child in getattr(node, "contents", []):
+        texts.extend(collect_strings(child))
+    return texts
+
+
+class TestHoibanDrawing:
+    """方位盤ベクター描画のテストクラス"""
+
+    def test_labels(self):
+        """中央星と8方位の年盤星（未知の方位は除外）"""
+        hoiban_data = get_test_hoiban_data()
+
+        assert center_star_name(hoiban_data) == "五黄土星"
+        assert center_star_name({}) == DEFAULT_CENTER_STAR
+        assert len(star_labels(hoiban_data)) == 8
+
+    def test_drawing_is_scaled_vector(self):
+        """指定幅に縮尺したベクター描画に中央星・方位・年盤星の文字が含まれる"""
+        drawing = hoiban_drawing(get_test_hoiban_data(), 150, "Helvetica")
+
+        assert drawing.width == drawing.height == 150
+        board = drawing.contents[0]
+        assert board.transform[0] == 150 / BOARD_SIZE
+
+        texts = collect_strings(drawing)
+        assert "五黄土星" in texts
+        assert "北" in texts and "一白" in texts
+        assert "中央" not in texts
+
+    def test_direction_lines_are_drawn_on_top(self):
+        """方位線はSVG版と同じく円・文字の上（最後）に描かれる"""
+        board = hoiban_drawing(get_test_hoiban_data(), 150, "Helvetica").contents[0]
+
+        kinds = [isinstance(node, Line) for node in board.contents]
+        assert kinds[-4:] == [True] * 4
+        assert not any(kinds[:-4])
+
+
+class TestHoibanRenderer:
+    """方位盤レイヤー合成レンダラーのテストクラス"""
+
+    def test_board_key_is_canonical(self):
+        """描画に影響しない項目・方位の並び順の違いは同じキーになる"""
+        from app.services.svg_converter import hoiban_board_key
+
+        hoiban_data = get_test_hoiban_data()
+        reordered = {
+            "nenban": {"centerQsei": {"name": "五黄土星", "id": 5}},
+            "houiDetails": [dict(detail, kichiKyo="吉") for detail in reversed(hoiban_data["houiDetails"])],
+            "targetYear": 2026,
+        }
+
+        assert hoiban_board_key(reordered) == hoiban_board_key(hoiban_data)
+        assert hoiban_board_key({"nenban": {"centerQsei": {"name": "一白水星"}}}) != hoiban_board_key(hoiban_data)
+
+    def test_same_board_is_rendered_once(self):
+        """同じ盤面・サイズは合成済みのPNGを返す"""
+        from app.services.svg_converter import HoibanRenderer
+
+        renderer = HoibanRenderer()
+        first = renderer.render_png(get_test_hoiban_data(), 200)
+        second = renderer.render_png(get_test_hoiban_data(), 200)
+
+        assert first is second
+        assert first.startswith(b"\x89PNG")
+        assert renderer.get_metrics()["hits"] == 1
+        assert renderer.get_metrics()["misses"] == 1
+
+    def test_variants_are_sized_and_cached_separately(self):
+        """種別ごとのサイズで生成し、パレット化の有無も別々に保持する"""
+        from io import BytesIO
+
+        from PIL import Image
+
+        from app.services.svg_converter import HOIBAN_VARIANTS, HoibanRenderer
+
+        renderer = HoibanRenderer()
+        for size in HOIBAN_VARIANTS.values():
+            image = Image.open(BytesIO(renderer.render_png(get_test_hoiban_data(), size)))
+            assert image.size == (size, size)
+
+        paletted = Image.open(BytesIO(renderer.render_png(get_test_hoiban_data(), 400, palette=True)))
+        assert paletted.mode == "P"
+        assert renderer.get_metrics()["misses"] == len(HOIBAN_VARIANTS) + 1
+
+    def test_bold_falls_back_to_stroke_for_static_font(self, monkeypatch, caplog):
+        """可変フォントでない場合は太字の文字を縁取りで太くし、警告を出す"""
+        import reportlab
+
+        from app.services import svg_converter
+
+        static_font = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+        monkeypatch.setattr(svg_converter.font_manager, "get_font_path", lambda name: static_font)
+
+        renderer = svg_converter.HoibanRenderer()
+        _, bold_stroke = renderer._load_font(48, bold=True)
+        _, regular_stroke = renderer._load_font(48, bold=False)
+
+        assert bold_stroke == 2
+        assert regular_stroke == 0
+        assert "縁取り" in caplog.text
+
+    def test_variant_for_target_dpi(self):
+        """表示幅と解像度を満たす最小の種別を選ぶ"""
+        from app.services.svg_converter import hoiban_variant_for
+
+        assert hoiban_variant_for(4, 300) == "print"
+        assert hoiban_variant_for(4, 96) == "screen"
+        assert hoiban_variant_for(1, 150) == "thumbnail"
+        assert hoiban_variant_for(8, 300) == "print"
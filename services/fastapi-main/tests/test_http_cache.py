@@ -0,0 +1,93 @@
+"""
+HTTPキャッシュユーティリティのテスト
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.http_cache import (
+    make_etag, etag_matches, content_etag, content_addressed_url, is_current_version,
+    not_modified_since, parse_range, RangeNotSatisfiable
+)
+
+
+class TestHttpCache:
+    """ETag・条件付きGETユーティリティのテストクラス"""
+
+    def test_make_etag_is_stable_and_quoted(self):
+        """同じ構成要素からは同じ強いETagが生成される"""
+        updated_at = datetime(2025, 9, 27, 0, 42, 19, 123456)
+        etag = make_etag("kantei", 63, updated_at)
+
+        assert etag == make_etag("kantei", 63, updated_at)
+        assert etag.startswith('"') and etag.endswith('"')
+        assert not etag.startswith("W/")
+
+    def test_make_etag_changes_with_version(self):
+        """更新日時が変わればETagも変わる"""
+        before = make_etag("kantei", 63, datetime(2025, 9, 27, 0, 42, 19))
+        after = make_etag("kantei", 63, datetime(2025, 9, 27, 0, 42, 20))
+
+        assert before != after
+
+    def test_etag_matches(self):
+        """If-None-Matchの一致判定"""
+        etag = make_etag("kantei", 1)
+
+        assert etag_matches(etag, etag) is True
+        assert etag_matches(f'"other", {etag}', etag) is True
+        assert etag_matches(f"W/{etag}", etag) is True
+        assert etag_matches("*", etag) is True
+        assert etag_matches('"other"', etag) is False
+        assert etag_matches(None, etag) is False
+
+    def test_content_etag_and_url(self):
+        """内容のハッシュからETagとバージョン付きURLを作成"""
+        content_hash = "ab" * 32
+
+        assert content_etag(content_hash) == f'"{content_hash[:32]}"'
+        assert content_addressed_url("/api/pdf/download/1", content_hash) == f"/api/pdf/download/1?v={content_hash[:32]}"
+        assert content_addressed_url("/api/pdf/download/1", None) == "/api/pdf/download/1"
+        assert is_current_version(content_hash[:32], content_hash) is True
+        assert is_current_version("stale", content_hash) is False
+        assert is_current_version(None, content_hash) is False
+        assert is_current_version(content_hash[:32], None) is False
+
+    def test_not_modified_since(self):
+        """If-Modified-Sinceの判定（秒未満は切り捨て）"""
+        mtime = datetime(2025, 9, 27, 0, 42, 19).timestamp() + 0.5
+        header = "Sat, 27 Sep 2025 00:42:19 GMT"
+        mtime_utc = datetime.fromisoformat("2025-09-27T00:42:19+00:00").timestamp() + 0.5
+
+        assert not_modified_since(header, mtime_utc) is True
+        assert not_modified_since(header, mtime_utc + 1) is False
+        assert not_modified_since("invalid date", mtime) is False
+        assert not_modified_since(None, mtime) is False
+
+    def test_parse_range(self):
+        """Rangeヘッダーの解析"""
+        assert parse_range("bytes=0-99", 1000) == (0, 99)
+        assert parse_range("bytes=900-", 1000) == (900, 999)
+        assert parse_range("bytes=-100", 1000) == (900, 999)
+        assert parse_range("bytes=-5000", 1000) == (0, 999)
+        assert parse_range("bytes=500-5000", 1000) == (500, 999)
+
+    def test_parse_range_falls_back_to_full(self):
+        """解釈できない・複数範囲の指定は全体を返す（None）"""
+        assert parse_range(None, 1000) is None
+        assert parse_range("items=0-1", 1000) is None
+        assert parse_range("bytes=0-1,5-9", 1000) is None
+        assert parse_range("bytes=9-1", 1000) is None
+        assert parse_range("bytes=abc", 1000) is None
+
+    def test_parse_range_not_satisfiable(self):
+        """ファイルサイズ外の範囲は416用の例外"""
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range("bytes=1000-", 1000)
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range("bytes=-0", 1000)
@@ -0,0 +1,109 @@
+"""
+Idempotency-Keyサービスのテスト（TEST_DATABASE_URL 指定時のみ実行）
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.core.database import SessionLocal
+from app.models import IdempotencyKey
+from app.services.idempotency import IdempotencyService, REPLAY_HEADER
+
+
+class TestIdempotencyService:
+    """Idempotency-Keyの再送・競合のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db):
+        self.db = db
+        self.service = IdempotencyService()
+        self.calls = 0
+
+    async def handler(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return {"id": self.calls}
+
+    def run(self, db, payload, handler=None, key="key-1"):
+        return self.service.run(
+            db,
+            scope="user:1",
+            idempotency_key=key,
+            endpoint="POST /api/kantei/calculate",
+            payload=payload,
+            handler=handler or self.handler
+        )
+
+    def test_completed_key_is_replayed(self):
+        """完了済みのキーは再実行せずに保存済みレスポンスを返す"""
+        first = asyncio.run(self.run(self.db, {"name": "山田"}))
+        second = asyncio.run(self.run(self.db, {"name": "山田"}))
+
+        assert self.calls == 1
+        assert second.body == first.body == b'{"id":1}'
+        assert second.headers[REPLAY_HEADER] == "true"
+
+    def test_payload_mismatch_is_rejected(self):
+        """同じキーで内容の異なるリクエストは422"""
+        asyncio.run(self.run(self.db, {"name": "山田"}))
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(self.run(self.db, {"name": "田中"}))
+
+        assert exc_info.value.status_code == 422
+        assert self.calls == 1
+
+    def test_concurrent_request_waits_for_first(self):
+        """同時に届いた重複リクエストは最初の実行の完了を待って同じレスポンスを返す"""
+        async def both():
+            other = SessionLocal()
+            try:
+                return await asyncio.gather(
+                    self.run(self.db, {"name": "山田"}),
+                    self.run(other, {"name": "山田"})
+                )
+            finally:
+                other.close()
+
+        first, second = asyncio.run(both())
+
+        assert self.calls == 1
+        assert first.body == second.body
+        assert second.headers.get(REPLAY_HEADER) == "true"
+
+    def test_in_progress_elsewhere_times_out(self):
+        """他のインスタンスで実行中のキーは待ち時間を過ぎると409"""
+        self.service.wait_seconds = 0.3
+        asyncio.run(self.service._acquire(self.db, "user:1", "key-1", "POST /api/kantei/calculate", "x"))
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(self.service._acquire(self.db, "user:1", "key-1", "POST /api/kantei/calculate", "x"))
+
+        assert exc_info.value.status_code == 409
+
+    def test_failed_handler_releases_key(self):
+        """ハンドラーが失敗したキーは解放され、再送で再実行できる"""
+        async def failing():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(self.run(self.db, {"name": "山田"}, handler=failing))
+
+        asyncio.run(self.run(self.db, {"name": "山田"}))
+        assert self.calls == 1
+
+    def test_streaming_response_is_not_stored(self):
+        """ストリーミングレスポンスは保存せずにキーを解放する（実行中のまま残さない）"""
+        async def streaming():
+            self.calls += 1
+            return StreamingResponse(iter([b"%PDF"]), media_type="application/pdf")
+
+        response = asyncio.run(self.run(self.db, {"id": 1}, handler=streaming))
+        assert isinstance(response, StreamingResponse)
+        assert self.db.query(IdempotencyKey).count() == 0
+
+        asyncio.run(self.run(self.db, {"id": 1}, handler=streaming))
+        assert self.calls == 2
@@ -0,0 +1,113 @@
+"""
+鑑定結果再利用サービスのテスト（TEST_DATABASE_URL 指定時のみ実行）
+"""
+
+import json
+
+import orjson
+import pytest
+
+from app.api.kantei import _reuse_kantei
+from app.models import KanteiLookup, KanteiRecord, KanteiUserStats, User
+from app.services.kantei_lookup import KanteiLookupService
+
+
+def add_record(db, user, surname="山田", kyusei=True, seimei=True):
+    record = KanteiRecord(
+        user_id=user.id,
+        client_surname=surname,
+        client_given_name="太郎",
+        client_birth_date="1990-01-01",
+        kyusei_result=json.dumps({"honmei": "一白水星"}, ensure_ascii=False) if kyusei else None,
+        seimei_result=json.dumps({"total": 33}) if seimei else None,
+        combined_result=json.dumps({"summary": "統合鑑定結果"}, ensure_ascii=False),
+        kantei_comment="コメント",
+        pdf_generated=True,
+        pdf_path="generated_pdfs/kantei_1.pdf"
+    )
+    db.add(record)
+    db.flush()
+    return record
+
+
+class TestKanteiLookupService:
+    """既存鑑定の登録・検索・再利用のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db, user):
+        self.db = db
+        self.user = user
+        self.service = KanteiLookupService()
+
+    def register(self, record):
+        self.service.register(self.db, record)
+        self.db.commit()
+
+    def test_find_registered_record(self):
+        """登録した鑑定を前後の空白を無視して検索できる"""
+        record = add_record(self.db, self.user)
+        self.register(record)
+
+        found = self.service.find(self.db, self.user.id, " 山田 ", "太郎 ", "1990-01-01")
+
+        assert found.id == record.id
+        assert self.service.find(self.db, self.user.id, "田中", "太郎", "1990-01-01") is None
+
+    def test_incomplete_results_are_not_registered(self):
+        """九星気学・姓名判断のどちらかが欠けた鑑定は再利用対象にしない"""
+        self.register(add_record(self.db, self.user, seimei=False))
+        self.register(add_record(self.db, self.user, surname="田中", kyusei=False))
+
+        assert self.db.query(KanteiLookup).count() == 0
+
+    def test_upsert_points_to_latest_record(self):
+        """同じクライアントの再登録は最新の鑑定に付け替える（行は1件のまま）"""
+        first = add_record(self.db, self.user)
+        self.register(first)
+        second = add_record(self.db, self.user)
+        self.register(second)
+
+        assert self.db.query(KanteiLookup).count() == 1
+        assert self.service.find(self.db, self.user.id, "山田", "太郎", "1990-01-01").id == second.id
+
+    def test_other_users_records_are_not_found(self):
+        """他のユーザーの鑑定は再利用しない"""
+        self.register(add_record(self.db, self.user))
+        other = User(email="other@example.com", hashed_password="x")
+        self.db.add(other)
+        self.db.commit()
+
+        assert self.service.find(self.db, other.id, "山田", "太郎", "1990-01-01") is None
+
+    def test_copy_record_copies_results_only(self):
+        """コピーは計算結果のみを引き継ぎ、コメント・PDFは引き継がない"""
+        source = add_record(self.db, self.user)
+
+        copied = self.service.copy_record(self.db, source)
+
+        assert copied.id != source.id
+        assert copied.seimei_result == source.seimei_result
+        assert copied.kantei_comment is None
+        assert copied.pdf_generated is False and copied.pdf_path is None
+
+    def test_reuse_link_returns_existing_record(self):
+        """reuse=link は既存の鑑定記録をそのまま返す"""
+        source = add_record(self.db, self.user)
+        self.register(source)
+
+        response = _reuse_kantei(source, "link", None, self.user, self.db)
+
+        assert orjson.loads(response.body)["id"] == source.id
+        assert self.db.query(KanteiRecord).count() == 1
+
+    def test_reuse_copy_creates_counted_record(self):
+        """reuse=copy は新しい鑑定記録を作成し、件数カウンターと検索インデックスを更新する"""
+        source = add_record(self.db, self.user)
+        self.register(source)
+
+        response = _reuse_kantei(source, "copy", None, self.user, self.db)
+
+        copied_id = orjson.loads(response.body)["id"]
+        assert copied_id != source.id
+        assert self.db.get(KanteiUserStats, self.user.id).total_records == 2
+        assert self.service.find(self.db, self.user.id, "山田", "太郎", "1990-01-01").id == copied_id
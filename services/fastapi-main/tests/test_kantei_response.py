@@ -0,0 +1,182 @@
+"""
+鑑定レスポンス事前シリアライズのテスト
+"""
+
+import json
+from datetime import datetime
+
+import orjson
+import pytest
+
+from app.api.kantei import _get_response_body
+from app.models import KanteiRecord
+from app.services.kantei_response import KanteiResponseSerializer
+
+
+def add_record(db, user, **values):
+    record = KanteiRecord(
+        user_id=user.id,
+        client_surname="山田",
+        client_given_name="太郎",
+        client_birth_date="1990-01-01",
+        kyusei_result=json.dumps({"honmei": "一白水星"}, ensure_ascii=False),
+        seimei_result=json.dumps({"total": 33, "heaven": 8}, ensure_ascii=False),
+        **values
+    )
+    db.add(record)
+    db.commit()
+    return record
+
+
+class TestKanteiResponseSerializer:
+    """保存済みレスポンスの生成・遅延生成のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db, user):
+        self.db = db
+        self.user = user
+        self.serializer = KanteiResponseSerializer()
+
+    def test_refresh_stores_serialized_response(self):
+        """refresh() は詳細レスポンスと同じバイト列を保存する"""
+        record = add_record(self.db, self.user)
+
+        body = self.serializer.refresh(record)
+
+        assert record.response_body == body
+        response = orjson.loads(body)
+        assert response["id"] == record.id
+        assert response["client_info"]["surname"] == "山田"
+        assert response["kyusei_result"] == {"honmei": "一白水星"}
+
+    def test_missing_body_is_generated_once(self):
+        """未生成の既存レコードは初回取得時に生成して保存し、更新日時は変えない"""
+        record = add_record(self.db, self.user)
+        assert record.response_body is None
+        updated_at = record.updated_at
+
+        body = _get_response_body(self.db, record.id, self.user.id)
+
+        self.db.expire_all()
+        stored = self.db.get(KanteiRecord, record.id)
+        assert bytes(stored.response_body) == body
+        assert stored.updated_at == updated_at
+        assert orjson.loads(body)["seimei_result"]["total"] == 33
+
+        # 2回目は保存済みのバイト列をそのまま返す
+        self.db.query(KanteiRecord).update({KanteiRecord.response_body: b'{"stored":true}'})
+        self.db.commit()
+        assert _get_response_body(self.db, record.id, self.user.id) == b'{"stored":true}'
+
+    def test_refresh_after_comment_change(self):
+        """コメント変更後の refresh() で保存済みレスポンスに反映される"""
+        record = add_record(self.db, self.user)
+        self.serializer.refresh(record)
+        self.db.commit()
+
+        record.kantei_comment = "良い年になります"
+        self.serializer.refresh(record)
+        self.db.commit()
+
+        assert orjson.loads(_get_response_body(self.db, record.id, self.user.id))["kantei_comment"] == "良い年になります"
+
+    def test_other_users_record_is_not_found(self):
+        """他のユーザーの鑑定記録は取得できない"""
+        from fastapi import HTTPException
+
+        record = add_record(self.db, self.user)
+
+        with pytest.raises(HTTPException) as exc_info:
+            _get_response_body(self.db, record.id, self.user.id + 1)
+        assert exc_info.value.status_code == 404
+
+
+class TestSparseFields:
+    """fields= による返却フィールド選択のテストクラス"""
+
+    serializer = KanteiResponseSerializer()
+
+    def test_parse_paths_and_presets(self):
+        """ドット区切りのパス・プリセット名を解析し、親パスはサブツリー全体を含む"""
+        assert self.serializer.parse_fields(None) is None
+        assert self.serializer.parse_fields("id,seimei_result.total") == {"id": None, "seimei_result": {"total": None}}
+        assert self.serializer.parse_fields("seimei_result,seimei_result.total") == {"seimei_result": None}
+
+        compact = self.serializer.parse_fields("compact")
+        assert set(compact["seimei_result"]) == {"total", "heaven", "earth", "personality"}
+
+    def test_unknown_field_is_rejected(self):
+        """未知のフィールドは ValueError"""
+        with pytest.raises(ValueError):
+            self.serializer.parse_fields("id,password")
+        with pytest.raises(ValueError):
+            self.serializer.parse_fields("seimei_result.")
+
+    def test_projection_before_serialization(self):
+        """指定したサブツリーだけを取り出してシリアライズする"""
+        record = KanteiRecord(
+            id=1,
+            client_surname="山田",
+            client_given_name="太郎",
+            client_birth_date="1990-01-01",
+            seimei_result=json.dumps({"total": 33, "original_response": {"detail": "x" * 1000}})
+        )
+        tree = self.serializer.parse_fields("id,client_info,seimei_result.total")
+
+        response = orjson.loads(self.serializer.serialize_record_fields(record, tree))
+
+        assert response == {
+            "id": 1,
+            "client_info": {"surname": "山田", "given_name": "太郎", "birth_date": "1990-01-01"},
+            "seimei_result": {"total": 33},
+        }
+
+    def test_client_info_has_one_shape(self):
+        """client_info は全体・フィールド指定のどちらでも同じ形"""
+        record = KanteiRecord(
+            id=1,
+            client_surname="山田",
+            client_given_name="太郎",
+            client_birth_date="1990-01-01",
+            pdf_generated=False,
+            created_at=datetime.now()
+        )
+        tree = self.serializer.parse_fields("client_info")
+
+        full = orjson.loads(self.serializer.serialize(self.serializer.build(record)))
+        sparse = orjson.loads(self.serializer.serialize_record_fields(record, tree))
+
+        assert full["client_info"] == sparse["client_info"]
+
+    def test_unselected_columns_are_not_loaded(self, db, user):
+        """指定フィールドに不要なJSON列は読み込まない"""
+        record_id = add_record(db, user).id
+        db.expunge_all()
+
+        tree = self.serializer.parse_fields("id,kyusei_result")
+        loaded = db.query(KanteiRecord).options(*self.serializer.load_options(tree)).filter(
+            KanteiRecord.id == record_id
+        ).one()
+
+        assert "kyusei_result" in loaded.__dict__
+        assert "seimei_result" not in loaded.__dict__
+
+    def test_history_results_default_to_compact(self, db, user):
+        """履歴一覧で鑑定結果を含める場合は compact が既定"""
+        import asyncio
+
+        from app.api.kantei import get_history
+
+        add_record(db, user)
+        history = asyncio.run(get_history(
+            page=1, per_page=10, with_results=True, fields=None, current_user=user, db=db
+        ))
+
+        results = history.items[0].results
+        assert results["seimei_result"] == {"total": 33, "heaven": 8}
+        assert "kantei_comment" in results
+
+        history = asyncio.run(get_history(
+            page=1, per_page=10, with_results=False, fields=None, current_user=user, db=db
+        ))
+        assert history.items[0].results is None
@@ -0,0 +1,118 @@
+"""
+ユーザー別鑑定件数カウンターのテスト（TEST_DATABASE_URL 指定時のみ実行）
+"""
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import SessionLocal
+from app.models import EmailHistory, KanteiRecord, KanteiUserStats
+from app.services.kantei_stats import KanteiStatsService
+
+
+def add_record(db, user, pdf_generated=False):
+    record = KanteiRecord(
+        user_id=user.id,
+        client_surname="山田",
+        client_given_name="太郎",
+        client_birth_date="1990-01-01",
+        pdf_generated=pdf_generated
+    )
+    db.add(record)
+    return record
+
+
+class TestKanteiStatsService:
+    """カウンターの加算・照合のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db, user):
+        self.db = db
+        self.user = user
+        self.service = KanteiStatsService()
+
+    def get_stats(self):
+        self.db.expire_all()
+        return self.db.get(KanteiUserStats, self.user.id)
+
+    def test_first_increment_counts_from_source(self):
+        """カウンター行がない場合は今回の書き込みを含めて実数で作成する"""
+        add_record(self.db, self.user)
+        self.db.commit()
+
+        add_record(self.db, self.user, pdf_generated=True)
+        self.service.increment(self.db, self.user.id, total_records=1, pdf_generated_count=1)
+        self.db.commit()
+
+        stats = self.get_stats()
+        assert stats.total_records == 2
+        assert stats.pdf_generated_count == 1
+
+    def test_increment_adds_to_existing_row(self):
+        """カウンター行がある場合は加算する"""
+        add_record(self.db, self.user)
+        self.service.increment(self.db, self.user.id, total_records=1)
+        self.db.commit()
+
+        add_record(self.db, self.user)
+        self.service.increment(self.db, self.user.id, total_records=1)
+        self.service.increment(self.db, self.user.id, email_sent_count=1)
+        self.db.commit()
+
+        stats = self.get_stats()
+        assert stats.total_records == 2
+        assert stats.email_sent_count == 1
+
+    def test_reconcile_fixes_drift(self):
+        """ドリフトしたカウンターを実テーブルの集計値に戻す"""
+        record = add_record(self.db, self.user, pdf_generated=True)
+        self.service.increment(self.db, self.user.id, total_records=1, pdf_generated_count=1)
+        self.db.flush()
+        self.db.add(EmailHistory(kantei_record_id=record.id, email_address="a@example.com", subject="鑑定書"))
+        self.db.query(KanteiUserStats).update({KanteiUserStats.total_records: 10})
+        self.db.commit()
+
+        assert self.service.reconcile(self.db, self.user.id) == 1
+
+        stats = self.get_stats()
+        assert stats.total_records == 1
+        assert stats.pdf_generated_count == 1
+        assert stats.email_sent_count == 1
+        assert stats.reconciled_at is not None
+        assert self.service.reconcile(self.db, self.user.id) == 0
+
+    def test_reconcile_creates_missing_rows(self):
+        """カウンター行のないユーザーは作成する"""
+        add_record(self.db, self.user)
+        self.db.commit()
+
+        assert self.service.reconcile(self.db) == 1
+        assert self.get_stats().total_records == 1
+
+    def test_reconcile_locks_before_aggregating(self):
+        """集計中はカウンター行がロックされている（集計とロックの間の加算を失わない）"""
+        add_record(self.db, self.user)
+        self.service.increment(self.db, self.user.id, total_records=1)
+        self.db.commit()
+
+        locked_during_aggregate = []
+        aggregate = self.service._aggregate
+
+        def checking_aggregate(db, user_id=None):
+            other = SessionLocal()
+            try:
+                other.query(KanteiUserStats).filter(
+                    KanteiUserStats.user_id == self.user.id
+                ).with_for_update(nowait=True).all()
+                locked_during_aggregate.append(False)
+            except OperationalError:
+                locked_during_aggregate.append(True)
+            finally:
+                other.rollback()
+                other.close()
+            return aggregate(db, user_id)
+
+        self.service._aggregate = checking_aggregate
+        self.service.reconcile(self.db, self.user.id)
+
+        assert locked_during_aggregate == [True]
@@ -0,0 +1,110 @@
+"""
+ロゴ画像サービスのテスト
+"""
+
+import asyncio
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+from dotenv import load_dotenv
+from PIL import Image
+
+# 環境変数を.env.localから読み込み
+load_dotenv('.env.local')
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.logo import LogoService, LogoTooLarge, LOGO_VARIANTS, MAX_LOGO_BYTES
+
+
+class FakeUploadFile:
+    """UploadFile.read(size) 互換のテスト用ファイル"""
+
+    def __init__(self, content: bytes):
+        self._buffer = io.BytesIO(content)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._buffer.read(size)
+
+
+class TestLogoService:
+    """ロゴ画像サービスのテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self):
+        """テスト用の一時アップロードディレクトリを使用"""
+        self.upload_dir = tempfile.mkdtemp(prefix="logo_test_")
+        self.logo_service = LogoService()
+        self.logo_service.upload_dir = self.upload_dir
+
+        yield
+
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+    def create_png(self, width: int = 2000, height: int = 1000) -> bytes:
+        buffer = io.BytesIO()
+        Image.new("RGB", (width, height), (25, 118, 210)).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def test_upload_is_saved(self):
+        """アップロードがストリーミングで保存される"""
+        content = self.create_png()
+        logo_path = asyncio.run(self.logo_service.save_upload(FakeUploadFile(content), "logo_1.png"))
+
+        with open(logo_path, "rb") as f:
+            assert f.read() == content
+
+    def test_upload_too_large_is_rejected(self):
+        """上限を超えるアップロードは中断され、ファイルが残らない"""
+        content = b"x" * (MAX_LOGO_BYTES + 1)
+
+        with pytest.raises(LogoTooLarge):
+            asyncio.run(self.logo_service.save_upload(FakeUploadFile(content), "logo_1.png"))
+
+        assert os.listdir(self.upload_dir) == []
+
+    def test_variants_are_resized_and_cached(self):
+        """派生画像は種別ごとの最大サイズに収まり、2回目はキャッシュから返す"""
+        logo_path = asyncio.run(self.logo_service.save_upload(FakeUploadFile(self.create_png()), "logo_1.png"))
+        self.logo_service.build_variants(logo_path)
+
+        for variant, (max_width, max_height) in LOGO_VARIANTS.items():
+            logo = self.logo_service.get_variant(logo_path, variant)
+            assert logo is not None
+            assert logo.width <= max_width and logo.height <= max_height
+            assert self.logo_service.get_variant(logo_path, variant) is logo
+
+    def test_unmanaged_path_is_ignored(self):
+        """アップロードディレクトリ外のファイルは読み込まない"""
+        assert self.logo_service.get_variant(__file__, "pdf") is None
+
+    def test_mtime_is_cached_until_invalidated(self, monkeypatch):
+        """更新日時の問い合わせは stat_ttl 秒間使い回し、invalidate で破棄される"""
+        logo_path = asyncio.run(self.logo_service.save_upload(FakeUploadFile(self.create_png()), "logo_1.png"))
+        storage = self.logo_service.storage
+        stat = storage.stat
+        calls = []
+
+        def record_stat(locator):
+            calls.append(locator)
+            return stat(locator)
+
+        monkeypatch.setattr(storage, "stat", record_stat)
+
+        mtime = self.logo_service.get_mtime(logo_path)
+        assert mtime is not None
+        assert self.logo_service.is_managed_path(logo_path)
+        assert self.logo_service.get_mtime(logo_path) == mtime
+        assert calls == [logo_path]
+
+        self.logo_service.invalidate(logo_path)
+        self.logo_service.get_mtime(logo_path)
+        assert calls == [logo_path, logo_path]
+
+        self.logo_service.stat_ttl = 0
+        self.logo_service.get_mtime(logo_path)
+        assert len(calls) == 3
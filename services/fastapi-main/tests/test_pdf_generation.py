@@ -12,13 +12,17 @@ PDF生成サービスの日本語対応テスト
 """
 
 import pytest
+import asyncio
+import io
 import os
 import sys
+import threading
 from datetime import datetime, date
 from typing import Dict, Any
 import tempfile
 import shutil
 from dotenv import load_dotenv
+from PIL import Image
 
 # 環境変数を.env.localから読み込み
 load_dotenv('.env.local')
@@ -26,7 +30,10 @@ load_dotenv('.env.local')
 # パスを追加してアプリのモジュールをインポート
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+from app.services import pdf as pdf_module
 from app.services.pdf import PDFGeneratorService, setup_japanese_fonts
+from app.services.logo import logo_service
+from app.services.wkhtmltopdf import wkhtmltopdf_runner
 
 
 class TestPDFGeneration:
@@ -61,6 +68,17 @@ class TestPDFGeneration:
         assert hasattr(self.pdf_service, 'font_name')
         assert self.pdf_service.font_name in ['Japanese', 'Helvetica']
 
+    def test_japanese_font_setup_is_cached(self):
+        """フォント登録が2回目以降フォントファイルを解析しないことのテスト"""
+        from unittest import mock
+
+        first_result = setup_japanese_fonts()
+
+        with mock.patch('app.services.pdf.TTFont') as ttfont:
+            assert setup_japanese_fonts() == first_result
+            PDFGeneratorService()
+            ttfont.assert_not_called()
+
     def get_test_client_data(self, name: str, use_special_chars: bool = False) -> Dict[str, Any]:
         """テスト用クライアントデータ生成"""
         return {
@@ -245,6 +263,199 @@ class TestPDFGeneration:
         file_size = os.path.getsize(pdf_path)
         assert 2_000 <= file_size <= 100_000
 
+    def test_optimized_pdf_size(self, monkeypatch):
+        """サイズ最適化モードで最適化なしより小さくなることのテスト（ロゴのJPEG化・ASCII85の省略）"""
+        monkeypatch.setattr(logo_service, "upload_dir", self.test_output_dir)
+        logo = Image.new("RGBA", (800, 200))
+        logo.putdata([(x % 256, (x * y) % 256, y % 256, 255) for y in range(200) for x in range(800)])
+        buffer = io.BytesIO()
+        logo.save(buffer, format="PNG")
+        logo_url = logo_service.storage.save("logo_size_test.png", buffer.getvalue())
+
+        kantei_data = self.create_full_kantei_data("田中太郎")
+        template_settings = self.pdf_service.build_template_settings({
+            **self.get_test_template_settings(),
+            "include_logo": True,
+            "logo_url": logo_url
+        })
+
+        default = self.pdf_service.generate_kantei_report(kantei_data, template_settings, use_cache=False).getvalue()
+        optimized = self.pdf_service.generate_kantei_report(
+            kantei_data, template_settings, optimize=True, use_cache=False
+        ).getvalue()
+
+        assert optimized.startswith(b"%PDF")
+        assert b"/DCTDecode" in optimized
+        assert b"/ASCII85Decode" not in optimized
+        assert len(optimized) < len(default) // 2
+        assert len(optimized) < 200 * 1024
+
+        # ロゴなしでもストリームのエンコード分は小さくなる
+        template_settings = self.pdf_service.build_template_settings(self.get_test_template_settings())
+        default = self.pdf_service.generate_kantei_report(kantei_data, template_settings, use_cache=False).getvalue()
+        optimized = self.pdf_service.generate_kantei_report(
+            kantei_data, template_settings, optimize=True, use_cache=False
+        ).getvalue()
+        assert len(optimized) < len(default)
+
+    def test_deterministic_pdf_output(self):
+        """決定的出力モードで同一入力から同一バイト列が生成されることのテスト"""
+        self.pdf_service.deterministic = True
+        kantei_data = self.create_full_kantei_data("田中太郎")
+        template_settings = self.pdf_service.build_template_settings({
+            **self.get_test_template_settings(),
+            "document_date": "2025年9月27日"
+        })
+
+        first = self.pdf_service.generate_kantei_report(kantei_data, template_settings, use_cache=False).getvalue()
+        second = self.pdf_service.generate_kantei_report(kantei_data, template_settings, use_cache=False).getvalue()
+
+        assert first == second
+
+    def test_deterministic_pdf_uses_render_date(self, monkeypatch):
+        """決定的出力モードの作成・更新日時は生成日（render_date）の0時になることのテスト"""
+        monkeypatch.setattr(pdf_module, "render_date", lambda: "2024-02-03")
+        self.pdf_service.deterministic = True
+        kantei_data = self.create_full_kantei_data("田中太郎")
+        template_settings = self.pdf_service.build_template_settings(self.get_test_template_settings())
+
+        pdf_bytes = self.pdf_service.generate_kantei_report(kantei_data, template_settings, use_cache=False).getvalue()
+
+        assert pdf_bytes.count(b"D:20240203000000+00'00'") == 2
+        assert b"D:20000101" not in pdf_bytes
+
+    def test_template_context_is_reused(self):
+        """同一テンプレート設定ではコンパイル済みコンテキストを再利用し、更新時に破棄されることのテスト"""
+        template_settings = self.pdf_service.build_template_settings(self.get_test_template_settings())
+
+        first = self.pdf_service.get_template_context(template_settings)
+        second = self.pdf_service.get_template_context(dict(template_settings))
+        assert first is second
+
+        # 設定が変われば別のコンテキスト
+        other = self.pdf_service.get_template_context({**template_settings, "color_theme": "red"})
+        assert other is not first
+
+        # 破棄後は作り直される
+        self.pdf_service.invalidate_template_contexts()
+        assert self.pdf_service.get_template_context(template_settings) is not first
+
+        # コンテキストを共有しても続けて生成できる
+        for name in ("田中太郎", "佐藤花子"):
+            pdf_buffer = self.pdf_service.generate_kantei_report(
+                self.create_full_kantei_data(name), template_settings, use_cache=False
+            )
+            assert pdf_buffer.getvalue().startswith(b"%PDF")
+
+    def test_comment_edit_is_rendered(self):
+        """コメントだけを変更した再生成で、キャッシュではなく編集後の内容が出力されることのテスト"""
+        template_settings = self.pdf_service.build_template_settings(self.get_test_template_settings())
+        kantei_data = self.create_full_kantei_data("田中太郎")
+        kantei_data["kantei_comment"] = "最初のコメント"
+
+        first = self.pdf_service.generate_kantei_report(kantei_data, template_settings)
+
+        # コメントのみ変更して再生成
+        edited = {**kantei_data, "kantei_comment": "編集後のコメント\n2行目"}
+        second = self.pdf_service.generate_kantei_report(edited, template_settings)
+
+        assert second.getvalue().startswith(b"%PDF")
+        assert second.getvalue() != first.getvalue()
+
+    def test_hoiban_is_embedded_as_vector(self):
+        """方位盤は画像ではなくベクター図形としてPDFに埋め込まれることのテスト"""
+        template_settings = self.pdf_service.build_template_settings(self.get_test_template_settings())
+        kantei_data = self.create_full_kantei_data("田中太郎")
+        kantei_data["kyusei_hoiban"] = {
+            "nenban": {"centerQsei": {"name": "五黄土星"}},
+            "houiDetails": [
+                {"houi": "北", "nenbanStar": "一白"},
+                {"houi": "南", "nenbanStar": "九紫"},
+            ]
+        }
+
+        pdf_buffer = self.pdf_service.generate_kantei_report(kantei_data, template_settings, use_cache=False)
+
+        content = pdf_buffer.getvalue()
+        assert content.startswith(b"%PDF")
+        assert b"/Subtype /Image" not in content
+
+    def test_booklet_generation(self):
+        """複数の鑑定書を1冊にまとめたPDF（しおり付き）の生成テスト"""
+        template_settings = self.pdf_service.build_template_settings(self.get_test_template_settings())
+        items = [
+            {"title": name, "kantei_data": self.create_full_kantei_data(name)}
+            for name in ("田中太郎", "佐藤花子", "鈴木一郎")
+        ]
+        output_path = os.path.join(self.test_output_dir, "booklet.pdf")
+
+        page_count = self.pdf_service.build_booklet(items, template_settings, output_path)
+
+        assert page_count >= len(items)
+        with open(output_path, "rb") as f:
+            content = f.read()
+        assert content.startswith(b"%PDF")
+        assert b"/Outlines" in content
+
+    def test_static_forms_are_shared_in_booklet(self):
+        """ヘッダー・フッターは冊子の件数によらずフォームXObjectとして1回ずつだけ出力されることのテスト"""
+        template_settings = self.pdf_service.build_template_settings(self.get_test_template_settings())
+        items = [
+            {"title": name, "kantei_data": self.create_full_kantei_data(name)}
+            for name in ("田中太郎", "佐藤花子", "鈴木一郎")
+        ]
+        output_path = os.path.join(self.test_output_dir, "booklet_forms.pdf")
+
+        page_count = self.pdf_service.build_booklet(items, template_settings, output_path, optimize=False)
+
+        with open(output_path, "rb") as f:
+            content = f.read()
+        assert page_count > len(items)
+        assert content.count(b"/Subtype /Form") == 2
+
+    def test_static_parts_are_laid_out_once_in_booklet(self, monkeypatch):
+        """冊子ではヘッダー・フッターの組版が件数によらず1回だけであることのテスト"""
+        from reportlab.platypus import Paragraph
+
+        template_settings = self.pdf_service.build_template_settings(self.get_test_template_settings())
+        static_texts = [template_settings["business_name"], template_settings["operator_name"], "鑑定書"]
+        items = [
+            {"title": name, "kantei_data": self.create_full_kantei_data(name)}
+            for name in ("田中太郎", "佐藤花子", "鈴木一郎")
+        ]
+
+        wrapped = []
+        wrap = Paragraph.wrap
+
+        def record_wrap(paragraph, *args):
+            wrapped.append(paragraph.text)
+            return wrap(paragraph, *args)
+
+        monkeypatch.setattr(Paragraph, "wrap", record_wrap)
+
+        def count_static_wraps(booklet_items):
+            self.pdf_service.invalidate_template_contexts()
+            wrapped.clear()
+            output_path = os.path.join(self.test_output_dir, "booklet_layout.pdf")
+            self.pdf_service.build_booklet(booklet_items, template_settings, output_path, optimize=False)
+            return [wrapped.count(text) for text in static_texts] + [
+                len([text for text in wrapped if text.startswith("作成日")])
+            ]
+
+        single = count_static_wraps(items[:1])
+        assert all(single)
+        assert count_static_wraps(items) == single
+
+    def test_single_report_draws_static_parts_directly(self):
+        """1件だけの鑑定書ではヘッダー・フッターをフォームにせず直接描画することのテスト"""
+        template_settings = self.pdf_service.build_template_settings(self.get_test_template_settings())
+
+        pdf_bytes = self.pdf_service.generate_kantei_report(
+            self.create_full_kantei_data("田中太郎"), template_settings, use_cache=False
+        ).getvalue()
+
+        assert b"/Subtype /Form" not in pdf_bytes
+
     def test_multiple_color_themes(self):
         """複数カラーテーマでのPDF生成テスト"""
         base_kantei_data = self.create_full_kantei_data("佐藤一郎")
@@ -361,8 +572,10 @@ class TestPDFGeneration:
             pdf_path = self.pdf_service.generate_kantei_pdf(kantei_data, template_settings)
             assert os.path.exists(pdf_path)
 
-        # 生成されたファイル数確認
-        pdf_files = [f for f in os.listdir(self.test_output_dir) if f.endswith('.pdf')]
+        # 生成されたファイル数確認（ハッシュで分散したサブディレクトリに保存される）
+        pdf_files = [
+            f for _, _, files in os.walk(self.test_output_dir) for f in files if f.endswith('.pdf')
+        ]
         assert len(pdf_files) >= 3
 
         # クリーンアップ実行（0日で即座に削除）
@@ -432,6 +645,31 @@ class TestPDFGeneration:
         assert os.path.exists(pdf_path)
         assert os.path.getsize(pdf_path) > 2_000
 
+    def test_preview_fallback_runs_off_event_loop(self, monkeypatch):
+        """wkhtmltopdfが使えない場合のフォールバックPDFはイベントループ外で生成されることのテスト"""
+        async def missing_wkhtmltopdf(args):
+            raise FileNotFoundError("wkhtmltopdf")
+
+        monkeypatch.setattr(wkhtmltopdf_runner, "convert", missing_wkhtmltopdf)
+
+        fallback_threads = []
+        generate_fallback = self.pdf_service.generate_simple_fallback_pdf
+
+        def record_thread(kantei_id):
+            fallback_threads.append(threading.get_ident())
+            return generate_fallback(kantei_id)
+
+        monkeypatch.setattr(self.pdf_service, "generate_simple_fallback_pdf", record_thread)
+
+        async def run():
+            locator = await self.pdf_service.generate_pdf_from_print_preview(1, "http://localhost/preview/1")
+            return threading.get_ident(), locator
+
+        loop_thread, locator = asyncio.run(run())
+
+        assert fallback_threads and loop_thread not in fallback_threads
+        assert os.path.getsize(locator) > 0
+
 if __name__ == "__main__":
     # テスト実行
     pytest.main([__file__, "-v", "--tb=short"])
\ No newline at end of file
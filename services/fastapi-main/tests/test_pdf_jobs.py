@@ -0,0 +1,184 @@
+"""
+PDF非同期生成ジョブサービスのテスト（TEST_DATABASE_URL 指定時のみ実行）
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.database import SessionLocal
+from app.models import KanteiRecord, PDFJob
+from app.services.pdf_jobs import PDFJobService, build_pdf_data
+
+
+class TestPDFJobService:
+    """ジョブの取得・再試行・失敗・再投入のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db, user):
+        self.db = db
+        self.user = user
+        self.service = PDFJobService()
+        # APIプロセス内のワーカーは起動しない
+        self.service.workers = 0
+        self.service.max_attempts = 3
+        self.service.retry_base = 10
+
+        self.record = KanteiRecord(
+            user_id=user.id,
+            client_surname="山田",
+            client_given_name="太郎",
+            client_birth_date="1990-01-01"
+        )
+        db.add(self.record)
+        db.commit()
+
+    def add_job(self, status="queued", attempts=0, next_run_at=None, started_at=None):
+        job = PDFJob(
+            user_id=self.user.id,
+            kantei_record_id=self.record.id,
+            template_settings="{}",
+            status=status,
+            attempts=attempts,
+            max_attempts=self.service.max_attempts,
+            next_run_at=next_run_at or datetime.now(timezone.utc) - timedelta(seconds=1),
+            started_at=started_at
+        )
+        self.db.add(job)
+        self.db.commit()
+        return job.id
+
+    def get_job(self, job_id):
+        self.db.expire_all()
+        return self.db.get(PDFJob, job_id)
+
+    def test_claim_marks_job_running(self):
+        """実行予定日時を過ぎたジョブを古い順に取得し、実行中にして試行回数を増やす"""
+        later = self.add_job(next_run_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        earlier = self.add_job(next_run_at=datetime.now(timezone.utc) - timedelta(seconds=60))
+        self.add_job(next_run_at=datetime.now(timezone.utc) + timedelta(hours=1))
+
+        assert self.service._claim_next() == earlier
+        assert self.service._claim_next() == later
+        assert self.service._claim_next() is None
+
+        job = self.get_job(earlier)
+        assert job.status == "running"
+        assert job.attempts == 1
+        assert job.started_at is not None
+
+    def test_claim_skips_locked_job(self):
+        """他のワーカーが行ロック中のジョブは飛ばして次のジョブを取得する"""
+        first = self.add_job(next_run_at=datetime.now(timezone.utc) - timedelta(seconds=60))
+        second = self.add_job()
+
+        other_worker = SessionLocal()
+        try:
+            locked = other_worker.query(PDFJob).filter(PDFJob.id == first).with_for_update().one()
+            assert locked.status == "queued"
+
+            assert self.service._claim_next() == second
+
+            other_worker.rollback()
+        finally:
+            other_worker.close()
+
+        assert self.get_job(first).status == "queued"
+        assert self.service._claim_next() == first
+
+    def test_failure_is_retried_with_backoff(self):
+        """試行回数が残っていれば指数バックオフ後に再実行される"""
+        job_id = self.add_job(status="running", attempts=2)
+
+        before = datetime.now(timezone.utc)
+        self.service._fail(self.db, job_id, "render error")
+
+        job = self.get_job(job_id)
+        assert job.status == "queued"
+        assert job.error == "render error"
+        assert job.finished_at is None
+        # 2回目の失敗: retry_base * 2
+        assert job.next_run_at >= before + timedelta(seconds=20)
+
+    def test_failure_after_max_attempts(self):
+        """試行回数を使い切るか再試行しない失敗では failed になる"""
+        exhausted = self.add_job(status="running", attempts=3)
+        no_retry = self.add_job(status="running", attempts=1)
+
+        self.service._fail(self.db, exhausted, "render error")
+        self.service._fail(self.db, no_retry, "Kantei record not found", retry=False)
+
+        for job_id in (exhausted, no_retry):
+            job = self.get_job(job_id)
+            assert job.status == "failed"
+            assert job.finished_at is not None
+
+    def test_postpone_does_not_count_attempt(self):
+        """待ち行列が満杯で後回しにしたジョブは試行回数に数えない"""
+        job_id = self.add_job(status="running", attempts=1)
+
+        self.service._postpone(self.db, job_id)
+
+        job = self.get_job(job_id)
+        assert job.status == "queued"
+        assert job.attempts == 0
+        assert job.next_run_at > datetime.now(timezone.utc)
+
+    @pytest.mark.parametrize("optimize", [False, True])
+    def test_job_renders_with_requested_optimize(self, monkeypatch, tmp_path, optimize):
+        """登録時に指定したサイズ最適化モードでPDFを生成する（未指定時は最適化しない）"""
+        from app.services.pdf import pdf_service
+        from app.services.render_pool import render_pool
+
+        rendered = []
+
+        async def render_pdf(kantei_data, template_settings, optimize=False):
+            rendered.append(optimize)
+            return b"%PDF-job"
+
+        monkeypatch.setattr(render_pool, "render_pdf", render_pdf)
+        monkeypatch.setattr(pdf_service, "save_kantei_pdf", lambda data, pdf_bytes: str(tmp_path / "kantei.pdf"))
+
+        job = self.service.enqueue(self.db, self.record, {}, user_id=self.user.id, optimize=optimize)
+        default_job = self.service.enqueue(self.db, self.record, {}, user_id=self.user.id)
+
+        asyncio.run(self.service._process(job.id))
+
+        assert rendered == [optimize]
+        assert self.get_job(job.id).status == "completed"
+        assert self.get_job(default_job.id).optimize is False
+
+    def test_start_recovers_stale_jobs(self):
+        """起動時に実行中のまま放置されたジョブを再投入（試行回数を使い切ったものは failed）"""
+        long_ago = datetime.now(timezone.utc) - self.service.stale_after - timedelta(minutes=1)
+        stale = self.add_job(status="running", attempts=1, started_at=long_ago)
+        exhausted = self.add_job(status="running", attempts=3, started_at=long_ago)
+        active = self.add_job(status="running", attempts=1, started_at=datetime.now(timezone.utc))
+
+        asyncio.run(self.service.start())
+
+        assert self.get_job(stale).status == "queued"
+        assert self.get_job(exhausted).status == "failed"
+        assert self.get_job(active).status == "running"
+        assert self.service._tasks == []
+
+
+class TestBuildPDFData:
+    """鑑定記録からのPDF生成用データ作成のテストクラス"""
+
+    def test_hoiban_is_not_built_from_record(self):
+        """保存された九星気学の結果は鑑定書に使い、方位盤（クライアントのみが指定）は含めない"""
+        kyusei_result = {"birth": {"year": {"index": 1, "name": "一白水星"}}}
+        record = KanteiRecord(
+            client_surname="山田",
+            client_given_name="太郎",
+            client_birth_date="1990-01-01",
+            kyusei_result=json.dumps(kyusei_result, ensure_ascii=False)
+        )
+
+        pdf_data = build_pdf_data(record)
+
+        assert pdf_data["kyusei_kigaku"] == kyusei_result
+        assert "kyusei_hoiban" not in pdf_data
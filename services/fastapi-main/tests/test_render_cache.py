@@ -0,0 +1,98 @@
+"""
+レンダリング成果物キャッシュのテスト
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+from dotenv import load_dotenv
+
+# 環境変数を.env.localから読み込み
+load_dotenv('.env.local')
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.render_cache import RenderCache
+
+
+class TestRenderCache:
+    """レンダリングキャッシュのテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self):
+        """テスト用の一時キャッシュディレクトリを使用"""
+        self.cache_dir = tempfile.mkdtemp(prefix="render_cache_test_")
+        self.cache = RenderCache()
+        self.cache.enabled = True
+        self.cache.cache_dir = self.cache_dir
+
+        yield
+
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_key_is_canonical(self):
+        """辞書のキー順序に依存しないキーが作成される"""
+        key1 = self.cache.make_key("pdf", {"a": 1, "b": {"c": 2, "d": 3}})
+        key2 = self.cache.make_key("pdf", {"b": {"d": 3, "c": 2}, "a": 1})
+
+        assert key1 == key2
+        assert key1 != self.cache.make_key("docx", {"a": 1, "b": {"c": 2, "d": 3}})
+        assert key1 != self.cache.make_key("pdf", {"a": 1, "b": {"c": 2, "d": 4}})
+
+    def test_get_or_render_hit(self):
+        """2回目は生成処理を呼ばずにキャッシュから返す"""
+        calls = []
+
+        def render():
+            calls.append(1)
+            return b"%PDF-test"
+
+        assert self.cache.get_or_render("pdf", {"id": 1}, render) == b"%PDF-test"
+        assert self.cache.get_or_render("pdf", {"id": 1}, render) == b"%PDF-test"
+
+        assert len(calls) == 1
+        metrics = self.cache.get_metrics()
+        assert metrics["hits"] == 1
+        assert metrics["misses"] == 1
+        assert metrics["stores"] == 1
+
+    def test_lru_eviction(self):
+        """上限超過時は最終利用日時の古いものから削除される"""
+        self.cache.max_bytes = 350
+
+        keys = []
+        for i in range(3):
+            key = self.cache.make_key("hoiban_png", {"id": i})
+            self.cache.put("hoiban_png", key, b"x" * 100)
+            path = self.cache._path("hoiban_png", key)
+            os.utime(path, (1000 + i, 1000 + i))
+            keys.append(key)
+
+        # 最も古いエントリを利用して最終利用日時を更新
+        assert self.cache.get("hoiban_png", keys[0]) is not None
+
+        key = self.cache.make_key("hoiban_png", {"id": 3})
+        self.cache.put("hoiban_png", key, b"x" * 100)
+
+        assert self.cache.get("hoiban_png", keys[0]) is not None
+        assert self.cache.get("hoiban_png", keys[1]) is None
+        assert self.cache.get("hoiban_png", key) is not None
+        assert self.cache.get_metrics()["evictions"] >= 1
+
+    def test_size_is_tracked_without_rescanning(self, monkeypatch):
+        """合計サイズは最初の保存時のみ走査し、以降（同じキーの上書きを含む）は差分で更新される"""
+        scans = []
+        scan_size = self.cache._scan_size
+        monkeypatch.setattr(self.cache, "_scan_size", lambda: scans.append(1) or scan_size())
+
+        key = self.cache.make_key("pdf", {"id": 1})
+        self.cache.put("pdf", key, b"x" * 100)
+        self.cache.put("pdf", key, b"x" * 40)
+        self.cache.put("pdf", self.cache.make_key("pdf", {"id": 2}), b"x" * 10)
+
+        assert len(scans) == 1
+        assert self.cache.get_metrics()["size_bytes"] == 50
+        assert scan_size() == 50
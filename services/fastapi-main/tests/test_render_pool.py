@@ -0,0 +1,158 @@
+"""
+レンダリングワーカープールのテスト
+"""
+
+import asyncio
+import importlib
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.services.render_cache import RenderCache
+from app.services.render_pool import RenderPool, RenderPoolBusy, RenderTimeout
+
+# app.services はシングルトンの render_pool を再エクスポートしているためモジュールは明示的に取得する
+render_pool_module = importlib.import_module("app.services.render_pool")
+
+
+def echo(value):
+    return value
+
+
+def sleep_and_echo(seconds, value):
+    time.sleep(seconds)
+    return value
+
+
+def crash():
+    # ワーカープロセスの異常終了（メモリ不足によるkillなど）を再現
+    os._exit(1)
+
+
+class TestRenderPool:
+    """待ち行列・タイムアウト・ワーカー異常終了からの復旧のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self):
+        self.pool = RenderPool()
+        self.pool.workers = 1
+        self.pool.queue_size = 0
+        self.pool.timeout = 30
+
+        yield
+
+        self.pool.shutdown(wait=False)
+
+    def test_warm_up_starts_workers(self):
+        """起動時の初期化で全ワーカーが起動済みになる"""
+        self.pool.workers = 2
+        asyncio.run(self.pool.warm_up())
+
+        assert self.pool.get_metrics()["running"] is True
+        assert len(self.pool._executor._processes) == 2
+
+    def test_full_queue_is_rejected(self):
+        """実行中 + 待機中が上限に達していれば即座に RenderPoolBusy"""
+        async def run():
+            slow = asyncio.ensure_future(self.pool.submit(sleep_and_echo, 1.0, "slow"))
+            await asyncio.sleep(0.1)
+            with pytest.raises(RenderPoolBusy):
+                await self.pool.submit(echo, "rejected")
+            return await slow
+
+        assert asyncio.run(run()) == "slow"
+        assert self.pool.get_metrics()["rejected"] == 1
+
+    def test_timeout_restarts_pool(self):
+        """制限時間を超えたジョブは RenderTimeout になり、プールを作り直して次のジョブを処理する"""
+        async def run():
+            with pytest.raises(RenderTimeout):
+                await self.pool.submit(sleep_and_echo, 30, "stuck", timeout=1.0)
+            return await self.pool.submit(echo, "next")
+
+        assert asyncio.run(run()) == "next"
+        metrics = self.pool.get_metrics()
+        assert metrics["timeouts"] == 1
+        assert metrics["restarts"] == 1
+        assert metrics["in_flight"] == 0
+
+    def test_broken_pool_recovers(self):
+        """ワーカーが異常終了してもプールを作り直し、以降のジョブは処理できる"""
+        async def run():
+            with pytest.raises(BrokenProcessPool):
+                await self.pool.submit(crash)
+            return await self.pool.submit(echo, "recovered")
+
+        assert asyncio.run(run()) == "recovered"
+        assert self.pool.get_metrics()["restarts"] >= 1
+
+    def test_cached_render_io_runs_off_event_loop(self, monkeypatch, tmp_path):
+        """レンダリングキャッシュの読み書きはイベントループのスレッド外で行われ、2回目はワーカーに投入しない"""
+        cache = RenderCache()
+        cache.enabled = True
+        cache.cache_dir = str(tmp_path)
+        monkeypatch.setattr(render_pool_module, "render_cache", cache)
+
+        io_threads = []
+        for name in ("get", "put"):
+            method = getattr(cache, name)
+
+            def record(*args, _method=method):
+                io_threads.append(threading.get_ident())
+                return _method(*args)
+
+            monkeypatch.setattr(cache, name, record)
+
+        async def run():
+            loop_thread = threading.get_ident()
+            first = await self.pool._submit_cached("hoiban_png", {"id": 1}, echo, b"png")
+            second = await self.pool._submit_cached("hoiban_png", {"id": 1}, echo, b"png")
+            return loop_thread, first, second
+
+        loop_thread, first, second = asyncio.run(run())
+
+        assert first == second == b"png"
+        assert len(io_threads) == 3
+        assert loop_thread not in io_threads
+        assert self.pool.get_metrics()["completed"] == 1
+
+    def test_logo_mtime_is_pinned_for_worker(self, monkeypatch):
+        """ロゴの更新日時は親プロセスで1回だけ確定し、キャッシュキーとワーカーに同じ値を渡す"""
+        from app.services.logo import logo_service
+
+        mtimes = iter([100.0, 200.0])
+        monkeypatch.setattr(logo_service, "get_mtime", lambda logo_path: next(mtimes))
+
+        submitted = []
+
+        async def submit_cached(kind, inputs, func, *args):
+            submitted.append((inputs, args))
+            return b"%PDF"
+
+        monkeypatch.setattr(self.pool, "_submit_cached", submit_cached)
+
+        asyncio.run(self.pool.render_pdf({}, {"include_logo": True, "logo_url": "uploaded_logos/logo_1.png"}))
+
+        inputs, (kantei_data, template_settings, optimize) = submitted[0]
+        assert inputs["logo_mtime"] == 100.0
+        assert template_settings["logo_mtime"] == 100.0
+
+    def test_worker_uses_pinned_logo_mtime(self, monkeypatch):
+        """ワーカー側の描画では確定済みの更新日時を使い、ストレージに問い合わせない"""
+        from app.services.logo import logo_service
+
+        def get_mtime(logo_path):
+            raise AssertionError("logo stat in worker")
+
+        monkeypatch.setattr(logo_service, "get_mtime", get_mtime)
+
+        pdf_bytes = render_pool_module._render_pdf(
+            {"client_info": {"surname": "山田", "given_name": "太郎", "birth_date": "1990-01-01"}},
+            {"include_logo": True, "logo_url": "uploaded_logos/logo_1.png", "logo_mtime": None},
+            False
+        )
+
+        assert pdf_bytes.startswith(b"%PDF")
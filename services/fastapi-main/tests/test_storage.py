@@ -0,0 +1,147 @@
+"""
+成果物ストレージのテスト
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+import pytest
+from dotenv import load_dotenv
+
+# 環境変数を.env.localから読み込み
+load_dotenv('.env.local')
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.config import settings
+from app.services.storage import LocalStorage, S3Storage, shard_name, storage_for
+
+
+class TestLocalStorage:
+    """ローカルストレージのテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self):
+        """テスト用の一時ディレクトリを使用"""
+        self.root = tempfile.mkdtemp(prefix="storage_test_")
+        self.storage = LocalStorage(self.root)
+
+        yield
+
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_save_is_sharded(self):
+        """ファイル名のハッシュで2階層のサブディレクトリに保存される"""
+        locator = self.storage.save("kantei_1.pdf", b"%PDF-1.4")
+
+        assert locator == os.path.join(self.root, *shard_name("kantei_1.pdf").split("/"))
+        assert self.storage.locate("kantei_1.pdf") == locator
+        assert self.storage.read(locator) == b"%PDF-1.4"
+
+    def test_save_stream_and_stat(self):
+        """ストリームからの保存とサイズ取得"""
+        content = os.urandom(300_000)
+        locator = self.storage.save_stream("kantei_2.pdf", io.BytesIO(content))
+
+        assert self.storage.stat(locator)["size"] == len(content)
+        assert b"".join(self.storage.iter_chunks(locator, 64 * 1024)) == content
+
+    def test_iter_range(self):
+        """指定範囲のみを読み出す（終了位置を含む）"""
+        content = bytes(range(256)) * 1000
+        locator = self.storage.save("kantei_range.pdf", content)
+
+        assert b"".join(self.storage.iter_range(locator, 100, 199)) == content[100:200]
+        assert b"".join(self.storage.iter_range(locator, 1000, len(content) - 1, 4096)) == content[1000:]
+
+    def test_failed_write_leaves_no_file(self):
+        """書き込み途中で失敗した場合は一時ファイルも残らない"""
+
+        class BrokenStream:
+            def read(self, size=-1):
+                raise IOError("broken")
+
+        with pytest.raises(IOError):
+            self.storage.save_stream("kantei_3.pdf", BrokenStream())
+
+        assert list(self.storage.list()) == []
+        assert not self.storage.exists(self.storage.locate("kantei_3.pdf"))
+
+    def test_legacy_flat_file_is_located(self):
+        """分散配置の導入前に直下へ保存されたファイルも参照できる"""
+        legacy_path = os.path.join(self.root, "legacy.pdf")
+        with open(legacy_path, "wb") as f:
+            f.write(b"legacy")
+
+        assert self.storage.locate("legacy.pdf") == legacy_path
+
+    def test_list_and_delete(self):
+        """一覧取得と削除"""
+        locators = {self.storage.save(f"kantei_{i}.pdf", b"x" * i) for i in range(1, 4)}
+
+        assert {path for path, _, _ in self.storage.list()} == locators
+
+        locator = locators.pop()
+        assert storage_for(locator).delete(locator) is True
+        assert storage_for(locator).delete(locator) is False
+        assert {path for path, _, _ in self.storage.list()} == locators
+
+    def test_owns(self):
+        """保存先ルート配下のロケーターのみ自分のものと判定する"""
+        locator = self.storage.save("logo_1.png", b"png")
+
+        assert self.storage.owns(locator) is True
+        assert self.storage.owns(__file__) is False
+        assert self.storage.owns(os.path.join(self.root, "..", "outside.png")) is False
+        assert self.storage.owns("s3://bucket/logo_1.png") is False
+
+
+@pytest.mark.skipif(
+    not os.getenv("S3_TEST_ENDPOINT"),
+    reason="S3_TEST_ENDPOINT（MinIO等のS3互換サーバー）が未設定"
+)
+class TestS3Storage:
+    """S3互換ストレージのテストクラス（S3_TEST_ENDPOINT・S3_TEST_BUCKET で接続先を指定）"""
+
+    @pytest.fixture(autouse=True)
+    def setup_and_teardown(self, monkeypatch):
+        """テスト用のプレフィックスを使用し、終了時に削除"""
+        pytest.importorskip("boto3")
+        from botocore.exceptions import ClientError
+
+        monkeypatch.setattr(settings, "s3_endpoint_url", os.environ["S3_TEST_ENDPOINT"])
+        monkeypatch.setattr(settings, "s3_bucket", os.getenv("S3_TEST_BUCKET", "kantei-test"))
+        monkeypatch.setattr(settings, "s3_prefix", "")
+        monkeypatch.setattr(settings, "s3_region", os.getenv("S3_TEST_REGION", "us-east-1"))
+        monkeypatch.setattr(settings, "s3_access_key_id", os.getenv("S3_TEST_ACCESS_KEY_ID", "minioadmin"))
+        monkeypatch.setattr(settings, "s3_secret_access_key", os.getenv("S3_TEST_SECRET_ACCESS_KEY", "minioadmin"))
+
+        self.storage = S3Storage(f"storage-test-{uuid.uuid4().hex}")
+        try:
+            self.storage.client.create_bucket(Bucket=settings.s3_bucket)
+        except ClientError:
+            pass
+
+        yield
+
+        for locator, _, _ in list(self.storage.list()):
+            self.storage.delete(locator)
+
+    def test_round_trip(self):
+        """保存・読み出し・一覧・削除"""
+        content = os.urandom(200_000)
+        locator = self.storage.save_stream("kantei_1.pdf", io.BytesIO(content))
+
+        assert locator == f"s3://{settings.s3_bucket}/{self.storage.prefix}/{shard_name('kantei_1.pdf')}"
+        assert self.storage.owns(locator) is True
+        assert self.storage.stat(locator)["size"] == len(content)
+        assert self.storage.read(locator) == content
+        assert [path for path, _, _ in self.storage.list()] == [locator]
+
+        assert self.storage.delete(locator) is True
+        assert self.storage.stat(locator) is None
+        assert self.storage.delete(locator) is False
@@ -0,0 +1,102 @@
+"""
+テンプレートAPI（ロゴアップロード）のテスト
+"""
+
+import io
+import os
+import sys
+
+import pytest
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from starlette.formparsers import MultiPartParser
+
+# 環境変数を.env.localから読み込み
+load_dotenv('.env.local')
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.api import template
+from app.api.auth import get_current_user
+from app.core.database import get_db
+from app.models import User
+from app.services.logo import MAX_LOGO_BYTES
+
+
+class TestLogoUpload:
+    """ロゴアップロードのサイズ制限のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        app = FastAPI()
+        app.include_router(template.router, prefix="/api/template")
+        app.dependency_overrides[get_current_user] = lambda: User(id=1, email="test@example.com")
+        app.dependency_overrides[get_db] = lambda: None
+        self.client = TestClient(app)
+
+        # 保存処理（= フォーム解析後のエンドポイント本体）が呼ばれたかを記録する
+        self.saved = []
+
+        async def save_upload(upload_file, filename):
+            self.saved.append(filename)
+            raise RuntimeError("stop after save")
+
+        monkeypatch.setattr(template.logo_service, "save_upload", save_upload)
+
+        # multipartの解析が始まったかを記録する
+        self.parsed = []
+        parse = MultiPartParser.parse
+
+        async def record_parse(parser):
+            self.parsed.append(1)
+            return await parse(parser)
+
+        monkeypatch.setattr(MultiPartParser, "parse", record_parse)
+
+    def multipart_body(self, content: bytes) -> bytes:
+        return (
+            b"--boundary\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="logo.png"\r\n'
+            b"Content-Type: image/png\r\n\r\n" + content + b"\r\n--boundary--\r\n"
+        )
+
+    def post(self, body):
+        return self.client.post(
+            "/api/template/upload-logo",
+            content=body,
+            headers={"Content-Type": "multipart/form-data; boundary=boundary"}
+        )
+
+    def test_oversized_content_length_is_rejected_before_parsing(self):
+        """Content-Lengthが上限を超えていればフォームを解析せずに拒否する"""
+        response = self.post(self.multipart_body(b"x" * (MAX_LOGO_BYTES + 128 * 1024)))
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "File too large. Maximum size is 2MB."
+        assert self.parsed == []
+        assert self.saved == []
+
+    def test_oversized_chunked_upload_is_rejected(self):
+        """Content-Lengthのない送信も受信バイト数が上限を超えた時点で拒否する"""
+        body = self.multipart_body(b"x" * (MAX_LOGO_BYTES + 128 * 1024))
+
+        def chunks():
+            for start in range(0, len(body), 64 * 1024):
+                yield body[start:start + 64 * 1024]
+
+        response = self.post(chunks())
+
+        assert response.status_code == 400
+        assert self.saved == []
+
+    def test_small_upload_reaches_endpoint(self):
+        """上限以内のアップロードはエンドポイントまで届く"""
+        buffer = io.BytesIO()
+        Image.new("RGB", (10, 10)).save(buffer, format="PNG")
+
+        response = self.post(self.multipart_body(buffer.getvalue()))
+
+        assert response.status_code == 200
+        assert self.saved == ["logo_1.png"]
@@ -0,0 +1,89 @@
+"""
+Word文書生成のテスト
+"""
+
+import io
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+from docx import Document
+from dotenv import load_dotenv
+
+# 環境変数を.env.localから読み込み
+load_dotenv('.env.local')
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services import word_generator
+from app.services.word_generator import WordDocumentGenerator
+
+
+class TestWordGenerator:
+    """Word文書生成のテストクラス"""
+
+    def create_data(self, **overrides):
+        data = {
+            "formData": {"name": "田中太郎", "gender": "male", "birthDate": "1990年1月1日"},
+            "kyuseiResult": {"honmei": "一白水星", "getsusei": "九紫火星", "nissei": "五黄土星"},
+            "kanteiComment": "良い一年になります。\n健康に留意してください。",
+        }
+        data.update(overrides)
+        return data
+
+    def read_dates(self, docx_bytes: bytes):
+        """基本情報テーブルの鑑定日とフッターの日付を取り出す"""
+        document = Document(io.BytesIO(docx_bytes))
+        table_date = document.tables[0].rows[1].cells[3].text
+        footer_date = document.sections[0].footer.tables[0].cell(0, 0).text
+        return table_date, footer_date
+
+    def test_target_date_is_rendered(self):
+        """鑑定日・フッターにtargetDateが記載される"""
+        docx_bytes = WordDocumentGenerator().generate_document(self.create_data(targetDate="2025年9月27日"))
+
+        assert self.read_dates(docx_bytes) == ("2025年9月27日", "2025年9月27日")
+
+    def test_render_date_is_used_without_target_date(self, monkeypatch):
+        """targetDate未指定時は鑑定日・フッターともに生成日（render_date）が記載される"""
+        monkeypatch.setattr(word_generator, "render_date", lambda: "2024-02-03")
+
+        docx_bytes = WordDocumentGenerator().generate_document(self.create_data())
+
+        assert self.read_dates(docx_bytes) == ("2024年02月03日", "2024年02月03日")
+
+    @pytest.mark.parametrize("target_date", ["2025年9月27日", None])
+    def test_deterministic_docx_output(self, monkeypatch, target_date):
+        """決定的出力モードで同一入力から同一バイト列が生成される"""
+        monkeypatch.setattr(word_generator, "render_date", lambda: "2024-02-03")
+        data = self.create_data(targetDate=target_date)
+
+        first = WordDocumentGenerator(deterministic=True).generate_document(data)
+        second = WordDocumentGenerator(deterministic=True).generate_document(data)
+
+        assert first == second
+
+    def test_deterministic_docx_uses_render_date(self, monkeypatch):
+        """決定的出力モードの作成・更新日時は生成日（render_date）の0時になる"""
+        monkeypatch.setattr(word_generator, "render_date", lambda: "2024-02-03")
+
+        docx_bytes = WordDocumentGenerator(deterministic=True).generate_document(self.create_data())
+
+        core_properties = Document(io.BytesIO(docx_bytes)).core_properties
+        assert core_properties.created == datetime(2024, 2, 3, tzinfo=timezone.utc)
+        assert core_properties.modified == datetime(2024, 2, 3, tzinfo=timezone.utc)
+
+    def test_cache_inputs_pin_document_date(self, monkeypatch):
+        """キャッシュキーの日付と生成される文書の日付は同じ値から作られる"""
+        monkeypatch.setattr(word_generator, "render_date", lambda: "2024-02-03")
+        data = word_generator.with_document_date(self.create_data())
+        inputs = word_generator.document_cache_inputs(data)
+
+        # キー計算後に日付が変わっても、確定済みの鑑定日で生成される
+        monkeypatch.setattr(word_generator, "render_date", lambda: "2024-02-04")
+        docx_bytes = WordDocumentGenerator().generate_document(data)
+
+        assert inputs["date"] == "2024年02月03日"
+        assert self.read_dates(docx_bytes) == ("2024年02月03日", "2024年02月03日")
+        assert word_generator.with_document_date(data) is data